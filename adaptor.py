@@ -1,12 +1,15 @@
-from typing import List, Optional
+import random
+from typing import Callable, Iterable, List, Optional, Tuple, Union
 
 from cards import Queen
 from evaluate import MoveQueen, EvaluateAttack
 from game import Game
 from hand import Hand
+from moves import Command, compile_command
 from player import Player, PlayerState
 from positions import Position, HandPosition, SleepingQueenPosition, AwokenQueenPosition, QueenCollection
-from piles import DrawingAndTrashPile, Strategy1
+from piles import DrawingAndTrashPile, StrategyInterface, Strategy1
+from snapshot import Goals, standard_goals
 
 
 class GamePlayerInterface:
@@ -18,9 +21,17 @@ class GameAdaptor(GamePlayerInterface):
     """
     Composes game and its components.
     """
-    def __init__(self, number_of_players: int):
-        self.observable = GameObservable(number_of_players)
-        pile = DrawingAndTrashPile(Strategy1())
+    def __init__(self, number_of_players: int, seed: Optional[int] = None,
+                 observable: Optional['GameObservable'] = None, strategy: Optional[StrategyInterface] = None,
+                 game_finished: Optional['GameFinishedStrategy'] = None):
+        """
+        A game with a seed has its own random generator and is reproducible,
+        otherwise the random module is used. The rules default to Strategy1 and GameFinished.
+        """
+        self.seed = seed
+        rng = random.Random(seed) if seed is not None else None
+        self.observable = observable if observable is not None else GameObservable(number_of_players)
+        pile = DrawingAndTrashPile(strategy if strategy is not None else Strategy1(), rng)
         sleeping_queens = QueenCollection()
         if number_of_players not in range(2, 6):
             number_of_players = 2
@@ -33,42 +44,77 @@ class GameAdaptor(GamePlayerInterface):
             player_state = PlayerState()
             players.append(Player(hand, awoken_queens, move_queen, eval_attack, player_state))
             hand.draw_new_cards()
-        self.game = Game(number_of_players, self.observable, pile, sleeping_queens, players, GameFinished())
+        self.game = Game(number_of_players, self.observable, pile, sleeping_queens, players,
+                         game_finished if game_finished is not None else GameFinished(), rng)
         self.finished: Optional[int] = None
 
+    def reset(self, seed: Optional[int] = None) -> None:
+        """
+        Starts a new game in the same objects, observers are removed.
+        """
+        self.seed = seed
+        self.observable.clear()
+        self.game.reset(seed)
+        self.finished = None
+
     def play(self, player: str, cards: str):
         """
         Evaluates commands from the input and calls method play with correct card positions.
+        Returns None for malformed commands and indices out of range.
+        """
+        command = compile_command(cards)
+        if command is None or not player.isdecimal():
+            return None
+        return self.play_command(int(player) - 1, command)      # playerID n. 1 is at index 0 in the list of players
+
+    def play_command(self, player_index: int, command: Command) -> Optional[bool]:
+        """
+        Plays a compiled command.
         """
-        player_index: int = int(player) - 1         # playerID n. 1 is at index 0 in the list of players
-        player1: Player = self.game.players[player_index]
+        players = self.game.players
+        if not 0 <= player_index < len(players):
+            return None
+        hand, sleeping, awoken = command
+        cards = players[player_index].hand.get_cards()
         positions: List[Position] = []
-        commands: List[str] = cards.split()         # commands are separated by spaces
-        for command in commands:
-            card_type = command[0]
-            if card_type == 'h':        # card from hand ... for example 'h3' means 3. card from playerID's hand
-                card_num: int = int(command[1]) - 1
-                card = player1.hand.get_cards()[card_num]
-                card_pos = HandPosition(card, player_index)
-                positions.append(card_pos)
-            elif card_type == 'a':      # awoken queen ... for example 'a21' means 1. awoken queen from playerID 2
-                player2_num: int = int(command[1]) - 1
-                player2: Player = self.game.players[player2_num]
-                a_queen_num: int = int(command[2]) - 1
-                a_queen: Optional[Queen] = player2.awoken_queens[a_queen_num]
-                if a_queen is None:
-                    return None
-                a_queen_pos = AwokenQueenPosition(a_queen, player2_num)
-                positions.append(a_queen_pos)
-            elif card_type == 's':      # sleeping queen ... for example 's8' means 8. sleeping queen
-                s_queen_num: int = int(command[1]) - 1
-                s_queen: Optional[Queen] = self.game.sleeping_queens[s_queen_num]
-                if s_queen is None:
-                    return None
-                s_queen_pos: SleepingQueenPosition = SleepingQueenPosition(s_queen)
-                positions.append(s_queen_pos)
-        result = self.game.play(player_index, positions)
-        return result
+        for card_num in hand:           # card from hand ... for example 'h3' means 3. card from playerID's hand
+            if card_num >= len(cards):
+                return None
+            positions.append(HandPosition(cards[card_num], player_index))
+        for player2_num, a_queen_num in awoken:     # 'a21' means 1. awoken queen from playerID 2
+            if player2_num >= len(players):
+                return None
+            queens = players[player2_num].awoken_queens.get_queens()
+            a_queen: Optional[Queen] = queens[a_queen_num] if a_queen_num < len(queens) else None
+            if a_queen is None:
+                return None
+            positions.append(AwokenQueenPosition(a_queen, player2_num))
+        for s_queen_num in sleeping:        # 's8' means 8. sleeping queen
+            queens = self.game.sleeping_queens.get_queens()
+            s_queen: Optional[Queen] = queens[s_queen_num] if s_queen_num < len(queens) else None
+            if s_queen is None:
+                return None
+            positions.append(SleepingQueenPosition(s_queen))
+        return self.game.play(player_index, positions)
+
+    def play_many(self, moves: Iterable[Tuple[str, str]]) -> List[Optional[bool]]:
+        """
+        Plays (player, cards) commands one after another, returns the result of every command.
+        """
+        compiled = compile_command
+        play_command = self.play_command
+        results: List[Optional[bool]] = []
+        for player, cards in moves:
+            command = compiled(cards)
+            if command is None or not player.isdecimal():
+                results.append(None)
+            else:
+                results.append(play_command(int(player) - 1, command))
+        return results
+
+
+# message or a function that makes it, it is called only when somebody listens
+Message = Union[str, Callable[[], str]]
 
 
 class GameObserver:
@@ -78,6 +124,7 @@ class GameObserver:
 
 class GameObservable:
     def __init__(self, number_of_players) -> None:
+        self.number_of_players = number_of_players
         self.observers: List[Optional[GameObserver]] = [None for _ in range(number_of_players)]
         self.players: List[int] = []
 
@@ -88,10 +135,29 @@ class GameObservable:
         self.players.append(player_id)
         self.observers[player_id] = observer        # observer for each playerID will be at the same index as playerID
 
-    def notify_all(self, message: str) -> None:
-        for x in self.observers:
-            if x:
-                x.notify(message)
+    def clear(self) -> None:
+        self.observers[:] = [None] * self.number_of_players
+        self.players.clear()
+
+    def remove(self, observer: GameObserver) -> None:
+        """
+        Players' places stay in the list, other observers are removed.
+        """
+        for i in reversed(range(len(self.observers))):
+            if self.observers[i] is observer:
+                if i < self.number_of_players:
+                    self.observers[i] = None
+                    if i in self.players:
+                        self.players.remove(i)
+                else:
+                    del self.observers[i]
+
+    def notify_all(self, message: Message) -> None:
+        observers = [x for x in self.observers if x]
+        if observers and callable(message):
+            message = message()
+        for x in observers:
+            x.notify(message)
 
 
 class GameFinishedStrategy:
@@ -99,25 +165,63 @@ class GameFinishedStrategy:
     def is_finished(game) -> Optional[int]:
         pass
 
+    def goals(self, number_of_players: int) -> Optional[Goals]:
+        """
+        Points and queens that win, snapshots of the game decide by them. None for the standard goals.
+        """
+        return None
+
 
 class GameFinished(GameFinishedStrategy):
+    """
+    Decides from counters in the game state that are updated by queen moves. Only players whose points
+    or queens changed since the previous check can reach the goal, other players are not checked.
+    Once the game is decided every check returns the winner's score.
+    """
     @staticmethod
     def is_finished(game) -> Optional[int]:
-        if game.get_number_of_players() in (2, 3):
-            desired_points, desired_queens = 50, 5
-        else:
-            desired_points, desired_queens = 40, 4
-        score = [player.count_points() for player in game.players]
-        if game.sleeping_queens.is_empty():
+        desired_points, desired_queens = standard_goals(game.game_state.number_of_players)
+        return GameFinished.finish(game, desired_points, desired_queens)
+
+    def goals(self, number_of_players: int) -> Goals:
+        return standard_goals(number_of_players)
+
+    @staticmethod
+    def finish(game, desired_points: int, desired_queens: int) -> Optional[int]:
+        state = game.game_state
+        score = state.points
+        if game.winner is not None:         # decided by an earlier check
+            return score[game.players.index(game.winner)]
+        changed = state.changed_players
+        if not state.sleeping_count:
+            changed.clear()
             max_score = max(score)
             i = score.index(max_score)
-            game.observable.notify_all(f"Game finished, winner: {i + 1}")
+            game.observable.notify_all(lambda i=i: f"Game finished, winner: {i + 1}")
             game.winner = game.players[i]
             return max_score
-        for i, player in enumerate(game.players):
-            queen_count = player.count_queens()
-            if score[i] >= desired_points or queen_count >= desired_queens:
-                game.observable.notify_all(f"Game finished, winner: {i + 1}")
-                game.winner = player
+        if not changed:
+            return None
+        players = sorted(changed) if len(changed) > 1 else list(changed)
+        changed.clear()
+        for i in players:
+            if score[i] >= desired_points or state.queen_counts[i] >= desired_queens:
+                game.observable.notify_all(lambda i=i: f"Game finished, winner: {i + 1}")
+                game.winner = game.players[i]
                 return score[i]
         return None
+
+
+class GameFinishedAt(GameFinishedStrategy):
+    """
+    Same rules as GameFinished with other goals, for any number of players.
+    """
+    def __init__(self, desired_points: int, desired_queens: int) -> None:
+        self.desired_points = desired_points
+        self.desired_queens = desired_queens
+
+    def is_finished(self, game) -> Optional[int]:
+        return GameFinished.finish(game, self.desired_points, self.desired_queens)
+
+    def goals(self, number_of_players: int) -> Goals:
+        return self.desired_points, self.desired_queens
@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+import argparse
+import math
+import time
+from collections import Counter
+from multiprocessing import Pool, cpu_count
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from cards import CardType
+from changes import Change, HandRedrawn, QueenMoved
+from simulator import MovePolicy, play_game, policies
+
+
+class GameOutcome(NamedTuple):
+    seed: int
+    number_of_players: int
+    winner: Optional[int]               # seat, None if the game did not finish
+    moves: int
+    deciding_queen: Optional[str]       # name of the last queen that came to the winner
+    knight_attacks: int
+    knights_blocked: int                # by a dragon
+    potion_attacks: int
+    potions_blocked: int                # by a wand
+
+
+class _OutcomeRecorder:
+    """
+    Listens to changes of a game. Knights and potions are discarded only by attacks, dragons and wands
+    only by the victims of blocked attacks.
+    """
+    def __init__(self) -> None:
+        self.discarded: Counter = Counter()         # single cards discarded by a move
+        self.queens: List[QueenMoved] = []          # moved during the current move
+        self.last_queens: List[QueenMoved] = []     # moved during the last finished move
+
+    def apply(self, change: Change) -> None:
+        if type(change) == HandRedrawn:
+            if len(change.discarded) == 1:
+                self.discarded[change.discarded[0].type] += 1
+        elif type(change) == QueenMoved:
+            self.queens.append(change)
+        else:
+            self.last_queens, self.queens = self.queens, []
+
+
+def play_outcome(number_of_players: int, seat_policies: List[MovePolicy], seed: int,
+                 max_moves: int = 1000) -> GameOutcome:
+    """
+    Plays a game by simulator.play_game and records what decided it.
+    """
+    recorder = _OutcomeRecorder()
+    result = play_game(number_of_players, seat_policies, seed, max_moves, listeners=[recorder.apply])
+    deciding_queen = None           # stays None when the last move gave the winner no queen
+    for change in recorder.last_queens if result.winner is not None else ():
+        if change.destination == result.winner:
+            deciding_queen = change.queen.name
+    discarded = recorder.discarded
+    return GameOutcome(seed, number_of_players, result.winner, result.moves, deciding_queen,
+                       discarded[CardType.KNIGHT], discarded[CardType.DRAGON],
+                       discarded[CardType.POTION], discarded[CardType.WAND])
+
+
+def outcomes(games: int, number_of_players: int = 2, policy_names: Iterable[str] = ('random',), seed: int = 0,
+             max_moves: int = 1000) -> Iterator[GameOutcome]:
+    """
+    Generator of outcomes of games with seeds seed, seed + 1, ...
+    """
+    seat_policies = [policies[name]() for name in policy_names]
+    for game_seed in range(seed, seed + games):
+        yield play_outcome(number_of_players, seat_policies, game_seed, max_moves)
+
+
+class Histogram:
+    """
+    Counts of integer values in bins of equal width, values above the last bin are counted in it.
+    """
+    def __init__(self, width: int = 10, bins: int = 100) -> None:
+        self.width = width
+        self.counts: List[int] = [0] * bins
+
+    def add(self, value: int, count: int = 1) -> None:
+        self.counts[min(max(value, 0) // self.width, len(self.counts) - 1)] += count
+
+    def merge(self, other: Histogram) -> Histogram:
+        if (other.width, len(other.counts)) != (self.width, len(self.counts)):
+            raise ValueError('histograms have different bins')
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        return self
+
+    def total(self) -> int:
+        return sum(self.counts)
+
+    def bins(self) -> Iterator[Tuple[int, int]]:
+        """
+        Non-empty bins as (lowest value of the bin, count).
+        """
+        return ((i * self.width, count) for i, count in enumerate(self.counts) if count)
+
+
+class QuantileSketch:
+    """
+    Quantiles of positive values with relative error at most alpha (the DDSketch idea): values are counted
+    in logarithmic buckets, so memory grows with the range of values, not with their number.
+    Sketches with the same alpha merge by adding bucket counts.
+    """
+    def __init__(self, alpha: float = 0.01) -> None:
+        self.alpha = alpha
+        self._gamma = (1 + alpha) / (1 - alpha)
+        self._log_gamma = math.log(self._gamma)
+        self.buckets: Dict[int, int] = {}
+        self.zeros = 0          # values <= 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float, count: int = 1) -> None:
+        self.count += count
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if value <= 0:
+            self.zeros += count
+            return
+        key = math.ceil(math.log(value) / self._log_gamma)
+        self.buckets[key] = self.buckets.get(key, 0) + count
+
+    def merge(self, other: QuantileSketch) -> QuantileSketch:
+        if other.alpha != self.alpha:
+            raise ValueError('sketches have different accuracy')
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+        self.zeros += other.zeros
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return math.nan
+        rank = q * (self.count - 1)
+        if rank < self.zeros:
+            return self.min
+        seen = self.zeros
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if seen > rank:
+                value = 2 * self._gamma ** key / (self._gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+
+class OutcomeStats:
+    """
+    Streaming aggregates of game outcomes, memory does not grow with the number of games.
+    Stats of parallel workers are combined by merge.
+    """
+    def __init__(self, alpha: float = 0.01) -> None:
+        self.games: Counter = Counter()             # by number of players
+        self.unfinished: Counter = Counter()
+        self.wins: Counter = Counter()              # by (number of players, seat)
+        self.lengths: Dict[int, Histogram] = {}
+        self.length_quantiles: Dict[int, QuantileSketch] = {}
+        self.deciding_queens: Counter = Counter()
+        self.attacks: Counter = Counter()           # 'knight', 'knight blocked', 'potion', 'potion blocked'
+        self.alpha = alpha
+
+    def add(self, outcome: GameOutcome) -> None:
+        n = outcome.number_of_players
+        self.games[n] += 1
+        if outcome.winner is None:
+            self.unfinished[n] += 1
+        else:
+            self.wins[n, outcome.winner] += 1
+        if n not in self.lengths:
+            self.lengths[n] = Histogram()
+            self.length_quantiles[n] = QuantileSketch(self.alpha)
+        self.lengths[n].add(outcome.moves)
+        self.length_quantiles[n].add(outcome.moves)
+        if outcome.deciding_queen is not None:
+            self.deciding_queens[outcome.deciding_queen] += 1
+        self.attacks.update({'knight': outcome.knight_attacks, 'knight blocked': outcome.knights_blocked,
+                             'potion': outcome.potion_attacks, 'potion blocked': outcome.potions_blocked})
+
+    def consume(self, records: Iterable[GameOutcome]) -> OutcomeStats:
+        for outcome in records:
+            self.add(outcome)
+        return self
+
+    def merge(self, other: OutcomeStats) -> OutcomeStats:
+        self.games.update(other.games)
+        self.unfinished.update(other.unfinished)
+        self.wins.update(other.wins)
+        for n, histogram in other.lengths.items():
+            if n in self.lengths:
+                self.lengths[n].merge(histogram)
+                self.length_quantiles[n].merge(other.length_quantiles[n])
+            else:
+                self.lengths[n] = Histogram(histogram.width, len(histogram.counts)).merge(histogram)
+                self.length_quantiles[n] = QuantileSketch(self.alpha).merge(other.length_quantiles[n])
+        self.deciding_queens.update(other.deciding_queens)
+        self.attacks.update(other.attacks)
+        return self
+
+    def win_rate(self, number_of_players: int, seat: int) -> float:
+        games = self.games[number_of_players]
+        return self.wins[number_of_players, seat] / games if games else 0.0
+
+    def block_rate(self, attack: str) -> float:
+        """
+        Share of 'knight' or 'potion' attacks that were blocked.
+        """
+        return self.attacks[attack + ' blocked'] / self.attacks[attack] if self.attacks[attack] else 0.0
+
+    def __repr__(self) -> str:
+        lines = []
+        for n in sorted(self.games):
+            rates = ', '.join(f'{self.win_rate(n, seat):.3f}' for seat in range(n))
+            sketch = self.length_quantiles[n]
+            lines.append(f'{n} players: {self.games[n]} games, {self.unfinished[n]} unfinished, '
+                         f'win rates by seat: {rates}')
+            lines.append(f'  moves p50: {sketch.quantile(0.5):.0f}, p90: {sketch.quantile(0.9):.0f}, '
+                         f'p99: {sketch.quantile(0.99):.0f}, max: {sketch.max:.0f}')
+        lines.append('knight blocked by dragon: {:.3f}, potion blocked by wand: {:.3f}'.format(
+            self.block_rate('knight'), self.block_rate('potion')))
+        queens = sum(self.deciding_queens.values())
+        lines.extend(f'deciding queen {name}: {count / queens:.3f}'
+                     for name, count in self.deciding_queens.most_common())
+        return '\n'.join(lines)
+
+
+def _stats_chunk(args: Tuple[int, List[str], List[int], int]) -> OutcomeStats:
+    number_of_players, policy_names, seeds, max_moves = args
+    seat_policies = [policies[name]() for name in policy_names]
+    return OutcomeStats().consume(play_outcome(number_of_players, seat_policies, seed, max_moves) for seed in seeds)
+
+
+def analyze(games: int, number_of_players: int = 2, policy_names: Iterable[str] = ('random',),
+            processes: Optional[int] = None, seed: int = 0, max_moves: int = 1000,
+            chunk_size: int = 200) -> OutcomeStats:
+    """
+    Plays games on a pool of processes, every chunk of games is aggregated by its worker
+    and only the aggregates are sent back and merged.
+    """
+    policy_names = list(policy_names)
+    for name in policy_names:
+        if name not in policies:
+            raise ValueError(f'unknown policy: {name}')
+    tasks = [(number_of_players, policy_names, list(range(start, min(start + chunk_size, seed + games))), max_moves)
+             for start in range(seed, seed + games, chunk_size)]
+    stats = OutcomeStats()
+    processes = processes or cpu_count()
+    if processes == 1:
+        for task in tasks:
+            stats.merge(_stats_chunk(task))
+    else:
+        with Pool(processes) as pool:
+            for partial in pool.imap_unordered(_stats_chunk, tasks):
+                stats.merge(partial)
+    return stats
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description='Aggregates outcomes of simulated games.')
+    parser.add_argument('-n', '--games', type=int, default=1000)
+    parser.add_argument('-p', '--players', type=int, default=2, choices=range(2, 6))
+    parser.add_argument('--policy', nargs='+', default=['random'], choices=sorted(policies))
+    parser.add_argument('-j', '--processes', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-moves', type=int, default=1000)
+    args = parser.parse_args(argv)
+    start = time.perf_counter()
+    print(analyze(args.games, args.players, args.policy, args.processes, args.seed, args.max_moves))
+    print(f'time: {time.perf_counter() - start:.2f} s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,339 @@
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from adaptor import GameAdaptor
+from cards import CardType, queens
+from game import Game
+from piles import deck
+from moves import Move
+from simulator import MovePolicy, play_moves
+
+HAND_SIZE = 5
+QUEEN_SLOTS = len(queens)
+EMPTY = -1
+
+NUMBER, KING, KNIGHT, POTION, DRAGON, WAND = (card_type.value for card_type in CardType)
+
+deck_codes = np.array([card.code for card in deck], dtype=np.int16)
+queen_codes = np.array([queen.code for queen in queens], dtype=np.int16)
+queen_points = np.array([queen.get_points() for queen in queens] + [0], dtype=np.int16)    # index -1 is empty slot
+
+# every non-empty subset of hand positions, bigger subsets first, the greedy policy plays the first valid one
+subset_masks = np.array(sorted(range(1, 1 << HAND_SIZE), key=lambda m: (-bin(m).count('1'), m)), dtype=np.int16)
+subsets = (subset_masks[:, None] >> np.arange(HAND_SIZE)) & 1 == 1           # (31, 5) picked positions
+subset_sizes = subsets.sum(axis=1)
+subset_matrix = subsets.T.astype(np.int16)                                   # (5, 31) for sums over subsets
+earlier = np.tri(HAND_SIZE, HAND_SIZE, -1, dtype=bool)                       # earlier[i, j] == j < i
+
+
+def _first(mask: np.ndarray) -> np.ndarray:
+    """
+    Index of the first True along the last axis, -1 if there is none.
+    """
+    return np.where(mask.any(axis=-1), mask.argmax(axis=-1), -1)
+
+
+class BatchEngine:
+    """
+    Plays many independent games in lockstep, every array is indexed by game first.
+    Games follow the rules of Player.play, EvaluateAttack.evaluate, Strategy1 and GameFinished,
+    every player uses the greedy policy (see greedy_move).
+    With compatible=True game g is shuffled by random.Random(seeds[g]) exactly like GameAdaptor
+    after random.seed(seeds[g]), so it can be cross-checked with the object engine.
+    Otherwise all games share one NumPy generator, which is much faster but plays different games.
+    """
+    def __init__(self, number_of_players: int, seeds: Sequence[int], max_moves: int = 1000,
+                 compatible: bool = True) -> None:
+        n = len(seeds)
+        p = number_of_players
+        self.number_of_players = p
+        self.max_moves = max_moves
+        self.rngs = [random.Random(seed) for seed in seeds] if compatible else []
+        self.generator = np.random.default_rng(list(seeds))
+        self.pile = np.zeros((n, len(deck)), dtype=np.int16)
+        self.pile_size = np.full(n, len(deck), dtype=np.int32)
+        self.trash = np.zeros((n, len(deck)), dtype=np.int16)
+        self.trash_size = np.zeros(n, dtype=np.int32)
+        self.hands = np.zeros((n, p, HAND_SIZE), dtype=np.int16)
+        self.sleeping = np.zeros((n, QUEEN_SLOTS), dtype=np.int16)
+        self.awoken = np.full((n, p, QUEEN_SLOTS), EMPTY, dtype=np.int16)
+        self.on_turn = np.zeros(n, dtype=np.int32)
+        self.moves = np.zeros(n, dtype=np.int32)
+        self.winner = np.full(n, EMPTY, dtype=np.int32)
+        self.stuck = np.zeros(n, dtype=bool)
+        self.done = np.zeros(n, dtype=bool)
+        if p in (2, 3):
+            self.desired_points, self.desired_queens = 50, 5
+        else:
+            self.desired_points, self.desired_queens = 40, 4
+
+        if compatible:
+            order = list(range(len(deck)))
+            queen_order = list(range(QUEEN_SLOTS))
+            for g, rng in enumerate(self.rngs):
+                rng.shuffle(order)
+                self.pile[g] = deck_codes[order]
+                rng.shuffle(queen_order)
+                self.sleeping[g] = queen_codes[queen_order]
+                order.sort()
+                queen_order.sort()
+        else:
+            self.pile[:] = deck_codes[self.generator.random((n, len(deck))).argsort(axis=1)]
+            self.sleeping[:] = queen_codes[self.generator.random((n, QUEEN_SLOTS)).argsort(axis=1)]
+        for i in range(p):          # every player draws 5 cards from the top
+            self.pile_size -= HAND_SIZE
+            self.hands[:, i] = self.pile[:, len(deck) - HAND_SIZE * (i + 1):len(deck) - HAND_SIZE * i]
+
+    def run(self) -> BatchEngine:
+        while self.step():
+            pass
+        return self
+
+    def step(self) -> int:
+        """
+        Every unfinished game makes one move, returns the number of games that moved.
+        """
+        games = np.flatnonzero(~self.done)
+        if not len(games):
+            return 0
+        p = self.number_of_players
+        on_turn = self.on_turn[games]
+        hand = self.hands[games, on_turn]
+        types = hand >> 4
+        values = hand & 15
+
+        first_king = _first(types == KING)
+        first_knight = _first(types == KNIGHT)
+        first_potion = _first(types == POTION)
+        first_sleeping = _first(self.sleeping[games] != EMPTY)
+        awoken = self.awoken[games] != EMPTY
+        awoken[np.arange(len(games)), on_turn] = False          # only other players are attacked
+        target = _first(awoken.reshape(len(games), -1))
+        target_player, target_slot = target // QUEEN_SLOTS, target % QUEEN_SLOTS
+
+        values = np.where(types == NUMBER, values, 0)
+        not_numbered = (types != NUMBER).astype(np.int16) @ subset_matrix                 # (games, 31)
+        biggest = np.zeros(not_numbered.shape, dtype=np.int16)
+        for h in range(HAND_SIZE):
+            np.maximum(biggest, values[:, h, None] * subset_matrix[h], out=biggest)
+        valid = (not_numbered == 0) & ((subset_sizes == 1) | (2 * biggest == values @ subset_matrix))
+        best_subset = _first(valid)
+
+        king = (first_king >= 0) & (first_sleeping >= 0)
+        knight = ~king & (first_knight >= 0) & (target >= 0)
+        potion = ~king & ~knight & (first_potion >= 0) & (target >= 0)
+        numbers = ~king & ~knight & ~potion & (best_subset >= 0)
+        stuck = ~(king | knight | potion | numbers)
+        self.stuck[games[stuck]] = True
+        self.done[games[stuck]] = True
+
+        picked = np.zeros(hand.shape, dtype=bool)
+        rows = np.arange(len(games))
+        picked[rows[king], first_king[king]] = True
+        picked[rows[knight], first_knight[knight]] = True
+        picked[rows[potion], first_potion[potion]] = True
+        picked[numbers] = subsets[best_subset[numbers]]
+
+        # waking a queen with a king
+        g, s = games[king], first_sleeping[king]
+        self._add_queens(g, on_turn[king], self.sleeping[g, s])
+        self.sleeping[g, s] = EMPTY
+
+        # attacks, the victim defends with the first dragon or wand
+        for attack, defense in ((knight, DRAGON), (potion, WAND)):
+            g, victim, slot = games[attack], target_player[attack], target_slot[attack]
+            victim_types = self.hands[g, victim] >> 4
+            defended = (victim_types == defense).any(axis=1)
+            first_defense = _first(victim_types == defense)
+            gd = g[defended]
+            defense_picked = np.zeros((len(gd), HAND_SIZE), dtype=bool)
+            defense_picked[np.arange(len(gd)), first_defense[defended]] = True
+            self._discard_and_redraw(gd, victim[defended], defense_picked)
+            g, victim, slot = g[~defended], victim[~defended], slot[~defended]
+            queen = self.awoken[g, victim, slot]
+            self.awoken[g, victim, slot] = EMPTY
+            if defense == DRAGON:
+                self._add_queens(g, on_turn[attack][~defended], queen)
+            else:
+                self._sleep_queens(g, queen)
+
+        moved = ~stuck
+        self._discard_and_redraw(games[moved], on_turn[moved], picked[moved])
+        g = games[moved]
+        self.on_turn[g] = (on_turn[moved] + 1) % p
+        self.moves[g] += 1
+        self._check_finished(g)
+        return len(games)
+
+    def _add_queens(self, games: np.ndarray, players: np.ndarray, queen: np.ndarray) -> None:
+        """
+        Puts queens to the first empty slot of players' collections, like QueenCollection.add_queen.
+        """
+        slot = _first(self.awoken[games, players] == EMPTY)
+        self.awoken[games, players, slot] = queen
+
+    def _sleep_queens(self, games: np.ndarray, queen: np.ndarray) -> None:
+        slot = _first(self.sleeping[games] == EMPTY)
+        self.sleeping[games, slot] = queen
+
+    def _discard_and_redraw(self, games: np.ndarray, players: np.ndarray, picked: np.ndarray) -> None:
+        """
+        Hand.remove_picked_cards_and_redraw for one player in each of the games.
+        Picked cards are removed by value (first equal card in the hand), like list.remove does,
+        and discarded in the order of picked positions.
+        """
+        if not len(games):
+            return
+        hand = self.hands[games, players]
+        count = picked.sum(axis=1)
+        rows = np.arange(len(games))
+
+        equal = hand[:, :, None] == hand[:, None, :]
+        removed = (equal & earlier).sum(axis=2) < (equal & picked[:, None, :]).sum(axis=2)
+
+        trash_index = self.trash_size[games, None] + np.cumsum(picked, axis=1) - 1
+        self.trash[np.broadcast_to(games[:, None], picked.shape)[picked], trash_index[picked]] = hand[picked]
+        self.trash_size[games] += count
+
+        drawn = np.zeros(hand.shape, dtype=np.int16)
+        enough = self.pile_size[games] > count
+        g = games[enough]
+        draw_index = self.pile_size[g, None] - count[enough, None] + np.arange(HAND_SIZE)
+        drawn[enough] = self.pile[g[:, None], np.clip(draw_index, 0, len(deck) - 1)]
+        self.pile_size[g] -= count[enough]
+        for i in np.flatnonzero(~enough):
+            drawn[i, :count[i]] = self._reshuffle_and_draw(games[i], count[i])
+
+        kept = hand[rows[:, None], np.argsort(removed, axis=1, kind='stable')]
+        position = np.arange(HAND_SIZE) - (HAND_SIZE - count[:, None])
+        self.hands[games, players] = np.where(position >= 0, drawn[rows[:, None], np.clip(position, 0, None)], kept)
+
+    def _reshuffle_and_draw(self, game: int, count: int) -> np.ndarray:
+        """
+        Strategy1: draw what is left, shuffle the trash pile into the draw pile and draw the rest.
+        """
+        in_pile = self.pile_size[game]
+        drawn = list(self.pile[game, :in_pile])
+        size = self.trash_size[game]
+        if self.rngs:
+            order = list(range(size))
+            self.rngs[game].shuffle(order)
+        else:
+            order = self.generator.permutation(size)
+        self.pile[game, :size] = self.trash[game, order]
+        self.trash_size[game] = 0
+        rest = count - in_pile
+        drawn.extend(self.pile[game, size - rest:size] if rest > 0 else [])
+        self.pile_size[game] = size - max(rest, 0)
+        return np.array(drawn, dtype=np.int16)
+
+    def _check_finished(self, games: np.ndarray) -> None:
+        if not len(games):
+            return
+        awoken = self.awoken[games]
+        score = queen_points[awoken].sum(axis=2)
+        queen_count = (awoken != EMPTY).sum(axis=2)
+        no_sleeping = (self.sleeping[games] == EMPTY).all(axis=1)
+        reached = (score >= self.desired_points) | (queen_count >= self.desired_queens)
+        winner = np.where(no_sleeping, score.argmax(axis=1), _first(reached))
+        self.winner[games] = winner
+        self.done[games] = (winner != EMPTY) | (self.moves[games] >= self.max_moves)
+
+
+def greedy_move(game: Game, player_id: int) -> Optional[Move]:
+    """
+    The policy of BatchEngine for the object engine: wake the first sleeping queen with the first king,
+    attack the first awoken queen of another player with the first knight or potion,
+    or throw away the biggest valid set of numbered cards.
+    """
+    cards = game.players[player_id].hand.get_cards()
+    types = [card.type for card in cards]
+    sleeping = [i for i, queen in enumerate(game.sleeping_queens.get_queens()) if queen]
+    if CardType.KING in types and sleeping:
+        return Move((types.index(CardType.KING),), sleeping=sleeping[0])
+    target = next(((i, index) for i, player in enumerate(game.players) if i != player_id
+                   for index, queen in enumerate(player.awoken_queens.get_queens()) if queen), None)
+    for attack in (CardType.KNIGHT, CardType.POTION):
+        if attack in types and target:
+            return Move((types.index(attack),), awoken=target)
+    for subset in subsets:
+        picked = [h for h in range(len(cards)) if subset[h]]
+        values = [cards[h].get_points() for h in picked]
+        if (all(cards[h].type == CardType.NUMBER for h in picked)
+                and (len(values) == 1 or 2 * max(values) == sum(values))):
+            return Move(tuple(picked))
+    return None
+
+
+class GreedyBatchPolicy(MovePolicy):
+    def choose(self, game: Game, player_id: int) -> Optional[str]:
+        move = greedy_move(game, player_id)
+        return move.command() if move is not None else None
+
+
+def play_object_game(number_of_players: int, seed: int, max_moves: int = 1000) -> GameAdaptor:
+    """
+    Plays the same game as BatchEngine with the object engine.
+    """
+    random.seed(seed)
+    adaptor = GameAdaptor(number_of_players)
+    play_moves(adaptor, [GreedyBatchPolicy()], max_moves)
+    return adaptor
+
+
+def cross_check(number_of_players: int, seeds: Sequence[int], max_moves: int = 1000) -> BatchEngine:
+    """
+    Replays seeded games with the object engine and asserts that both engines end in the same state.
+    """
+    engine = BatchEngine(number_of_players, seeds, max_moves).run()
+    for g, seed in enumerate(seeds):
+        game = play_object_game(number_of_players, seed, max_moves).game
+        winner = game.players.index(game.winner) if game.winner is not None else EMPTY
+        assert winner == engine.winner[g], f'seed {seed}: winner {winner} != {engine.winner[g]}'
+        assert game.game_state.on_turn == engine.on_turn[g], f'seed {seed}: player on turn differs'
+        sleeping = [EMPTY if q is None else q.code for q in game.sleeping_queens.get_queens()]
+        assert sleeping == engine.sleeping[g].tolist(), f'seed {seed}: sleeping queens differ'
+        for i, player in enumerate(game.players):
+            awoken = [EMPTY if q is None else q.code for q in player.awoken_queens.get_queens()]
+            awoken += [EMPTY] * (QUEEN_SLOTS - len(awoken))
+            assert awoken == engine.awoken[g, i].tolist(), f'seed {seed}: awoken queens of player {i} differ'
+            hand = [card.code for card in player.hand.get_cards()]
+            assert hand == engine.hands[g, i].tolist(), f'seed {seed}: hand of player {i} differs'
+        pile = [card.code for card in game.pile.draw_pile]
+        assert pile == engine.pile[g, :engine.pile_size[g]].tolist(), f'seed {seed}: draw pile differs'
+    return engine
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description='Plays many games in lockstep with NumPy.')
+    parser.add_argument('-n', '--games', type=int, default=10000)
+    parser.add_argument('-p', '--players', type=int, default=2, choices=range(2, 6))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-moves', type=int, default=1000)
+    parser.add_argument('--fast-shuffle', action='store_true',
+                        help='shuffle with NumPy, games are not comparable with the object engine')
+    parser.add_argument('--check', type=int, default=0, metavar='N',
+                        help='replay the first N games with the object engine and compare outcomes')
+    args = parser.parse_args(argv)
+    seeds = range(args.seed, args.seed + args.games)
+    start = time.perf_counter()
+    engine = BatchEngine(args.players, seeds, args.max_moves, not args.fast_shuffle).run()
+    seconds = time.perf_counter() - start
+    moves = int(engine.moves.sum())
+    print(f'games: {args.games}, unfinished: {int((engine.winner == EMPTY).sum())}, moves: {moves}')
+    print(f'time: {seconds:.2f} s, {moves / seconds:.0f} moves/s, {args.games / seconds:.0f} games/s')
+    for i in range(args.players):
+        print(f'seat {i + 1}: {(engine.winner == i).mean():.3f}')
+    if args.check:
+        cross_check(args.players, seeds[:args.check], args.max_moves)
+        print(f'cross-check of {args.check} games passed')
+
+
+if __name__ == '__main__':
+    main()
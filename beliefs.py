@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+from functools import lru_cache
+from math import comb
+from typing import Dict, List, Tuple, Union
+
+from cards import Card, CardType
+from changes import Change, HandRedrawn
+from game import Game
+from piles import deck
+
+# distinct cards of the deck, a count vector has one count for every kind in this order
+kinds: Tuple[Card, ...] = tuple(dict.fromkeys(deck))
+kind_index: Dict[Card, int] = {card: i for i, card in enumerate(kinds)}
+deck_counts: Tuple[int, ...] = tuple(deck.count(card) for card in kinds)
+kinds_of_type: Dict[CardType, Tuple[int, ...]] = {
+    card_type: tuple(i for i, card in enumerate(kinds) if card.type == card_type) for card_type in CardType}
+BITS = 8            # width of the field of one kind in bitset
+
+CardQuery = Union[Card, CardType]
+
+
+@lru_cache(maxsize=1 << 16)
+def none_probability(total: int, successes: int, draws: int) -> float:
+    """
+    Probability that draws cards taken without replacement from total cards, successes of them good,
+    contain no good card.
+    """
+    if draws > total:
+        return 0.0 if successes else 1.0
+    return comb(total - successes, draws) / comb(total, draws)
+
+
+@lru_cache(maxsize=1 << 16)
+def hypergeometric(total: int, successes: int, draws: int) -> Tuple[float, ...]:
+    """
+    Probabilities of 0, 1, ... good cards among draws cards.
+    """
+    draws = min(draws, total)
+    all_draws = comb(total, draws)
+    return tuple(comb(successes, k) * comb(total - successes, draws - k) / all_draws
+                 for k in range(min(successes, draws) + 1))
+
+
+class BeliefTracker:
+    """
+    What one player knows about cards: their own hand and the trash pile are seen, every other card is unseen
+    and lies in the draw pile or in a hand of another player. The tracker listens to changes of the game
+    and updates the unseen counts per discarded or drawn card, a reshuffle recounts them.
+    Probabilities assume that every unseen card is equally likely at every unseen place, what the order
+    of other players' draws could reveal is not used. After the game is modified without changes
+    (set_cards, restore) call rebuild, reset removes the tracker from the game.
+    """
+    def __init__(self, game: Game, playerID: int) -> None:
+        self.game = game
+        self.playerID = playerID
+        self.unseen: List[int] = []
+        self.total = 0
+        self.rebuild()
+        game.listeners.append(self.apply)
+
+    def close(self) -> None:
+        if self.apply in self.game.listeners:
+            self.game.listeners.remove(self.apply)
+
+    def rebuild(self) -> None:
+        unseen = list(deck_counts)
+        for card in self.game.players[self.playerID].hand.get_cards():
+            unseen[kind_index[card]] -= 1
+        for card in self.game.pile.trash_pile:
+            unseen[kind_index[card]] -= 1
+        self.unseen = unseen
+        self.total = sum(unseen)
+        self._trash_buffer = self.game.pile.trash_pile
+
+    def apply(self, change: Change) -> None:
+        if type(change) != HandRedrawn:
+            return
+        if self.game.pile.trash_pile is not self._trash_buffer:     # reshuffled, the trash went back to the deck
+            self.rebuild()
+            return
+        unseen = self.unseen
+        if change.playerID == self.playerID:
+            for card in change.drawn:
+                unseen[kind_index[card]] -= 1
+            self.total -= len(change.drawn)
+        else:
+            for card in change.discarded:       # came from an unseen hand
+                unseen[kind_index[card]] -= 1
+            self.total -= len(change.discarded)
+
+    def counts(self) -> List[int]:
+        """
+        Unseen cards as a count vector in the order of kinds.
+        """
+        return self.unseen[:]
+
+    def bitset(self) -> int:
+        """
+        Unseen cards as a bitset, the field of kind i starts at bit BITS * i and has its lowest count bits set.
+        """
+        bits = 0
+        for i, count in enumerate(self.unseen):
+            bits |= ((1 << count) - 1) << BITS * i
+        return bits
+
+    def count(self, query: CardQuery) -> int:
+        """
+        Unseen cards equal to a card or of a type.
+        """
+        if isinstance(query, Card):
+            return self.unseen[kind_index[query]]
+        unseen = self.unseen
+        return sum(unseen[i] for i in kinds_of_type[query])
+
+    def probability_in_hand(self, playerID: int, query: CardQuery) -> float:
+        """
+        Probability that another player holds at least one such card.
+        """
+        if playerID == self.playerID:
+            cards = self.game.players[playerID].hand.get_cards()
+            return 1.0 if any(card is query or card.type == query for card in cards) else 0.0
+        hand_size = len(self.game.players[playerID].hand.get_cards())
+        return 1.0 - none_probability(self.total, self.count(query), hand_size)
+
+    def probability_to_draw(self, query: CardQuery, k: int) -> float:
+        """
+        Probability of drawing at least one such card within the next k cards of the draw pile.
+        """
+        return 1.0 - none_probability(self.total, self.count(query), k)
+
+    def distribution(self, query: CardQuery, k: int) -> Tuple[float, ...]:
+        """
+        Probabilities of 0, 1, ... such cards among k unseen cards (a hand of another player or k draws).
+        """
+        return hypergeometric(self.total, self.count(query), k)
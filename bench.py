@@ -0,0 +1,331 @@
+from __future__ import annotations
+
+import argparse
+import fnmatch
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import codec
+from adaptor import GameAdaptor, GameFinished
+from cards import Card, CardType
+from game import Game
+from moves import Move, compile_command
+from piles import DrawingAndTrashPile, StrategyInterface, Strategy1, Strategy2, deck
+from simulator import RandomPolicy, play_moves
+
+# a benchmark gets the number of operations to run and returns the seconds spent in them,
+# setup that is not part of the operation is not timed
+Benchmark = Callable[[int], float]
+
+benchmarks: Dict[str, Benchmark] = {}
+
+
+def benchmark(name: str) -> Callable[[Benchmark], Benchmark]:
+    def register(function: Benchmark) -> Benchmark:
+        benchmarks[name] = function
+        return function
+    return register
+
+
+def recorded_game(number_of_players: int, seed: int) -> List[Tuple[bytearray, int, Move]]:
+    """
+    Plays a seeded game with random legal moves, returns the encoded state before every move
+    with the player and the move.
+    """
+    game = GameAdaptor(number_of_players, seed).game
+    rng = random.Random(seed)
+    record = []
+    while game.winner is None:
+        player = game.game_state.on_turn
+        moves = game.legal_moves(player)
+        if not moves:
+            break
+        move = rng.choice(moves)
+        record.append((codec.encode(game), player, move))
+        game.play(player, move.positions(game, player))
+    return record
+
+
+def play_random_game(adaptor: GameAdaptor, rng: random.Random) -> int:
+    """
+    Plays random legal moves through GameAdaptor.play until the game ends, returns the number of moves.
+    """
+    return play_moves(adaptor, [RandomPolicy(rng)])
+
+
+def _commands(seed: int = 0) -> List[Tuple[str, str]]:
+    return [(str(player + 1), move.command()) for _, player, move in recorded_game(3, seed)]
+
+
+@benchmark('adaptor.parse')
+def _parse(n: int) -> float:
+    commands = [command for _, command in _commands()]
+    parse = compile_command.__wrapped__         # the parser without its cache
+    start = time.perf_counter()
+    for i in range(n):
+        parse(commands[i % len(commands)])
+    return time.perf_counter() - start
+
+
+@benchmark('adaptor.play')
+def _adaptor_play(n: int) -> float:
+    seed = 0
+    adaptor = GameAdaptor(3, seed)
+    commands = _commands(seed)
+    elapsed = 0.0
+    while n > 0:
+        adaptor.reset(seed)
+        batch = commands[:n]
+        start = time.perf_counter()
+        for player, cards in batch:
+            adaptor.play(player, cards)
+        elapsed += time.perf_counter() - start
+        n -= len(batch)
+    return elapsed
+
+
+@benchmark('player.play')
+def _player_play(n: int) -> float:
+    record = recorded_game(3, 1)
+    game = codec.decode(record[0][0])
+    elapsed = 0.0
+    for i in range(n):
+        state, player, move = record[i % len(record)]
+        codec.decode_into(game, state)
+        positions = move.positions(game, player)
+        start = time.perf_counter()
+        game.players[player].play(positions)
+        elapsed += time.perf_counter() - start
+    return elapsed
+
+
+@benchmark('player.evaluate_numbered_cards')
+def _evaluate_numbered(n: int) -> float:
+    player = GameAdaptor(2, 0).game.players[0]
+    rng = random.Random(0)
+    picks = [[Card(CardType.NUMBER, rng.randint(1, 10)) for _ in range(rng.randint(1, 5))] for _ in range(64)]
+    evaluate = player.evaluate_numbered_cards
+    start = time.perf_counter()
+    for i in range(n):
+        player.picked_numbered_cards = picks[i & 63]
+        evaluate()
+    return time.perf_counter() - start
+
+
+def _redraw(strategy: StrategyInterface, n: int) -> float:
+    """
+    Discards and redraws two cards of a hand, the draw pile runs out every 28 operations.
+    """
+    pile = DrawingAndTrashPile(strategy, random.Random(0))
+    hand = pile.deal_cards(5)
+    start = time.perf_counter()
+    for i in range(n):
+        hand[i % 4:i % 4 + 2] = pile.discard_and_redraw(hand[i % 4:i % 4 + 2])
+    return time.perf_counter() - start
+
+
+def _reshuffle(strategy: StrategyInterface, n: int) -> float:
+    """
+    Only redraws that run out of cards, three cards are discarded when two are left in the draw pile.
+    """
+    pile = DrawingAndTrashPile.from_cards(strategy, deck[:2], deck[2:-3], random.Random(0))
+    hand = list(deck[-3:])
+    elapsed = 0.0
+    for _ in range(n):
+        pile.trash_pile.extend(pile.draw(len(pile.draw_pile) - 2))
+        start = time.perf_counter()
+        hand = pile.discard_and_redraw(hand)
+        elapsed += time.perf_counter() - start
+    return elapsed
+
+
+benchmark('pile.discard_and_redraw.strategy1')(lambda n: _redraw(Strategy1(), n))
+benchmark('pile.discard_and_redraw.strategy2')(lambda n: _redraw(Strategy2(), n))
+benchmark('pile.reshuffle.strategy1')(lambda n: _reshuffle(Strategy1(), n))
+benchmark('pile.reshuffle.strategy2')(lambda n: _reshuffle(Strategy2(), n))
+
+
+def _midgame(number_of_players: int) -> Game:
+    state = recorded_game(number_of_players, 2)
+    return codec.decode(state[len(state) // 2][0])
+
+
+@benchmark('game.update_game_state')
+def _update_game_state(n: int) -> float:
+    game = _midgame(4)
+    start = time.perf_counter()
+    for _ in range(n):
+        game.update_game_state()
+    return time.perf_counter() - start
+
+
+@benchmark('game.is_finished')
+def _is_finished(n: int) -> float:
+    game = _midgame(4)
+    is_finished = GameFinished.is_finished
+    changed = game.game_state.changed_players
+    start = time.perf_counter()
+    for i in range(n):
+        changed.add(i & 3)          # like after a move, one player's queens changed and is checked
+        is_finished(game)
+    return time.perf_counter() - start
+
+
+def _full_games(number_of_players: int, n: int) -> float:
+    adaptor = GameAdaptor(number_of_players, 0)
+    start = time.perf_counter()
+    for seed in range(n):
+        adaptor.reset(seed)
+        play_random_game(adaptor, random.Random(seed))
+    return time.perf_counter() - start
+
+
+for _players in range(2, 6):
+    benchmark(f'game.full.{_players}p')(lambda n, players=_players: _full_games(players, n))
+
+
+def peak_memory(number_of_players: int, games: int = 5) -> int:
+    """
+    Greatest peak of traced memory while a new game is created and played to the end, in bytes.
+    """
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    peak = 0
+    try:
+        for seed in range(games):
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            adaptor = GameAdaptor(number_of_players, seed)
+            play_random_game(adaptor, random.Random(seed))
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - base)
+            del adaptor
+    finally:
+        if not tracing:
+            tracemalloc.stop()
+    return peak
+
+
+class Result(NamedTuple):
+    name: str
+    ops: int                # operations in one round
+    rounds: int
+    ns_per_op: float        # of the fastest round
+    peak_bytes: Optional[int] = None
+
+
+def measure(name: str, min_time: float = 0.2, rounds: int = 5) -> Result:
+    """
+    Doubles the number of operations until a round takes min_time, then runs rounds and keeps the fastest.
+    """
+    function = benchmarks[name]
+    n = 1
+    while True:
+        elapsed = function(n)
+        if elapsed >= min_time or n >= 1 << 24:
+            break
+        n = n * 2 if elapsed < min_time / 8 else int(n * min_time / elapsed) + 1
+    best = elapsed
+    for _ in range(rounds - 1):
+        best = min(best, function(n))
+    peak = None
+    if name.startswith('game.full.'):
+        peak = peak_memory(int(name[len('game.full.'):-1]))
+    return Result(name, n, rounds, best / n * 1e9, peak)
+
+
+def run(patterns: Optional[List[str]] = None, min_time: float = 0.2, rounds: int = 5,
+        progress: Optional[Callable[[Result], None]] = None) -> List[Result]:
+    results = []
+    for name in benchmarks:
+        if patterns and not any(fnmatch.fnmatch(name, pattern) for pattern in patterns):
+            continue
+        result = measure(name, min_time, rounds)
+        results.append(result)
+        if progress is not None:
+            progress(result)
+    return results
+
+
+def to_json(results: List[Result]) -> dict:
+    return {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': {result.name: result._asdict() for result in results},
+    }
+
+
+class Regression(NamedTuple):
+    name: str
+    metric: str             # 'ns_per_op' or 'peak_bytes'
+    baseline: float
+    current: float
+
+    def ratio(self) -> float:
+        return self.current / self.baseline
+
+    def __repr__(self) -> str:
+        return f'{self.name} {self.metric}: {self.baseline:.0f} -> {self.current:.0f} ({self.ratio() - 1:+.1%})'
+
+
+def compare(results: List[Result], baseline: dict, threshold: float = 0.1) -> List[Regression]:
+    """
+    Lists benchmarks that are slower (or use more memory) than in the baseline by more than threshold,
+    benchmarks missing in the baseline are skipped.
+    """
+    regressions = []
+    stored = baseline.get('results', {})
+    for result in results:
+        old = stored.get(result.name)
+        if old is None:
+            continue
+        for metric in ('ns_per_op', 'peak_bytes'):
+            current, previous = getattr(result, metric), old.get(metric)
+            if current is not None and previous and current > previous * (1 + threshold):
+                regressions.append(Regression(result.name, metric, previous, current))
+    return regressions
+
+
+def _print(result: Result) -> None:
+    line = f'{result.name:40} {result.ns_per_op:12.0f} ns/op {result.ops:9} ops'
+    if result.peak_bytes is not None:
+        line += f' {result.peak_bytes / 1024:8.0f} KiB peak'
+    print(line, flush=True)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Measures hot paths of the game engine.')
+    parser.add_argument('patterns', nargs='*', help='run only benchmarks matching the glob patterns')
+    parser.add_argument('--min-time', type=float, default=0.2, help='seconds of one round')
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--json', default=None, help='file for the results, - for standard output')
+    parser.add_argument('--baseline', default=None, help='results of an earlier run to compare with')
+    parser.add_argument('--threshold', type=float, default=0.1, help='allowed slowdown, 0.1 is 10 %%')
+    parser.add_argument('--list', action='store_true')
+    args = parser.parse_args(argv)
+    if args.list:
+        print('\n'.join(benchmarks))
+        return 0
+    results = run(args.patterns, args.min_time, args.rounds, None if args.json == '-' else _print)
+    if args.json == '-':
+        json.dump(to_json(results), sys.stdout, indent=2)
+        print()
+    elif args.json:
+        with open(args.json, 'w') as file:
+            json.dump(to_json(results), file, indent=2)
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.threshold)
+        for regression in regressions:
+            print('regression:', regression, file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
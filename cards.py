@@ -1,14 +1,53 @@
 from __future__ import annotations
 from enum import Enum
+from typing import Dict, Iterable, List, Tuple
 
 
 CardType = Enum('CardType', ['NUMBER', 'KING', 'KNIGHT', 'POTION', 'DRAGON', 'WAND'])
 
+queen_info = {"Rose Queen": 5, "Cake Queen": 5, "Rainbow Queen": 5, "Starfish Queen": 5,
+              "Moon Queen": 10, "Peacock Queen": 10, "Ladybug Queen": 10, "Sunflower Queen": 10,
+              "Pancake Queen": 15, "Cat Queen": 15, "Dog Queen": 15, "Heart Queen": 20}
+
+
+def encode(card_type: CardType, value: int = 0) -> int:
+    """
+    Packs type and value of a card into one small int, type in the high nibble and value in the low one.
+    Every card of the standard deck fits into a single byte.
+    """
+    return card_type.value << 4 | value
+
 
 class Card:
-    def __init__(self, card_type: CardType, value: int = 0) -> None:
-        self.type = card_type
-        self._value = value
+    """
+    Interned card, there is only one instance for every (type, value) pair,
+    so identity comparison is comparison by value (copies and unpickled cards are interned again).
+    """
+    __slots__ = ('type', '_value', 'code')
+    _interned: Dict[Tuple[CardType, int], Card] = {}
+    _by_code: Dict[int, Card] = {}
+
+    def __new__(cls, card_type: CardType, value: int = 0) -> Card:
+        card = cls._interned.get((card_type, value))
+        if card is None:
+            card = object.__new__(cls)
+            card.type = card_type
+            card._value = value
+            card.code = encode(card_type, value)
+            cls._interned[(card_type, value)] = card
+            if 0 <= value < 16:
+                cls._by_code[card.code] = card
+        return card
+
+    @classmethod
+    def from_code(cls, code: int) -> Card:
+        return cls._by_code[code]
+
+    def __reduce__(self):
+        return Card, (self.type, self._value)
+
+    def __hash__(self) -> int:
+        return self.code
 
     def __repr__(self) -> str:
         return self.type.name + ' ' + str(self._value)
@@ -21,12 +60,50 @@ class Card:
 
 
 class Queen:
-    def __init__(self, name: str, value: int) -> None:
-        self.name = name
-        self._value = value
+    """
+    Interned queen, there is only one instance for every (name, value) pair.
+    Queens from queen_info get codes 0 - 11 in the order of the table.
+    """
+    __slots__ = ('name', '_value', 'code')
+    _interned: Dict[Tuple[str, int], Queen] = {}
+    _by_code: List[Queen] = []
+
+    def __new__(cls, name: str, value: int) -> Queen:
+        queen = cls._interned.get((name, value))
+        if queen is None:
+            queen = object.__new__(cls)
+            queen.name = name
+            queen._value = value
+            queen.code = len(cls._by_code)
+            cls._interned[(name, value)] = queen
+            cls._by_code.append(queen)
+        return queen
+
+    @classmethod
+    def from_code(cls, code: int) -> Queen:
+        return cls._by_code[code]
+
+    def __reduce__(self):
+        return Queen, (self.name, self._value)
+
+    def __hash__(self) -> int:
+        return self.code
 
     def get_points(self) -> int:
         return self._value
 
     def __repr__(self) -> str:
         return self.name + ' ' + str(self._value)
+
+
+queens: Tuple[Queen, ...] = tuple(Queen(name, value) for name, value in queen_info.items())
+EMPTY_QUEEN = Queen('', 0)      # stands for an empty slot, not a queen of the game
+
+
+def encode_cards(cards: Iterable[Card]) -> bytearray:
+    return bytearray(card.code for card in cards)
+
+
+def decode_cards(codes: Iterable[int]) -> List[Card]:
+    by_code = Card._by_code
+    return [by_code[code] for code in codes]
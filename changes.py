@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+from typing import Callable, NamedTuple, Optional, Tuple, Union
+
+from cards import Card, Queen
+
+
+OUTSIDE = -1        # source of a queen added to the game, destination of a queen removed from it
+
+
+class QueenMoved(NamedTuple):
+    queen: Queen
+    source: Optional[int]           # playerID of the collection, None for sleeping queens
+    destination: Optional[int]
+
+
+class HandRedrawn(NamedTuple):
+    playerID: int
+    discarded: Tuple[Card, ...]
+    drawn: Tuple[Card, ...]
+
+
+class TurnAdvanced(NamedTuple):
+    on_turn: int
+
+
+Change = Union[QueenMoved, HandRedrawn, TurnAdvanced]
+ChangeListener = Callable[[Change], None]
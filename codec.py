@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import struct
+from typing import Iterable, Iterator, Optional, Sequence, Union, TYPE_CHECKING
+
+from adaptor import GameAdaptor
+from cards import decode_cards, queens as all_queens
+from piles import Strategy1, Strategy2, deck
+from positions import EMPTY_SLOT
+
+if TYPE_CHECKING:
+    from game import Game
+
+MAGIC = b'SQ'
+VERSION = 1
+HAND_SIZE = 5
+QUEEN_SLOTS = len(all_queens)       # a collection never has more slots than there are queens
+
+strategies = (Strategy1, Strategy2)
+
+# magic, version, number of players, on turn, winner, strategy, draw pile size, trash pile size, sleeping slots
+HEADER = struct.Struct('<2sBBBBBBBB')
+# draw pile from the bottom followed by the trash pile from the bottom, padded to the size of the deck
+CARDS = HEADER.size
+SLEEPING = CARDS + len(deck)
+PLAYERS = SLEEPING + QUEEN_SLOTS
+# every player: hand size, hand, awoken queen slots, awoken queens
+PLAYER = struct.Struct(f'<B{HAND_SIZE}sB{QUEEN_SLOTS}s')
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+def record_size(number_of_players: int) -> int:
+    """
+    Every game with the same number of players is encoded into the same number of bytes (179 for 5 players).
+    """
+    return PLAYERS + number_of_players * PLAYER.size
+
+
+def _padded(codes: bytes, size: int) -> bytes:
+    if len(codes) > size:
+        raise ValueError(f'{len(codes)} items do not fit into {size} bytes')
+    return codes + bytes([EMPTY_SLOT]) * (size - len(codes))
+
+
+def encode_into(game: Game, buffer: Union[bytearray, memoryview], offset: int = 0) -> int:
+    """
+    Writes the game into the buffer at offset and returns the offset after it.
+    """
+    players = game.players
+    draw, trash = game.pile.encode()
+    sleeping = game.sleeping_queens.encode()
+    strategy = next((i for i, cls in enumerate(strategies) if type(game.pile.strategy) is cls), None)
+    if strategy is None:
+        raise ValueError(f'strategy {type(game.pile.strategy).__name__} can not be encoded')
+    winner = players.index(game.winner) if game.winner is not None else EMPTY_SLOT
+    HEADER.pack_into(buffer, offset, MAGIC, VERSION, len(players), game.game_state.on_turn, winner, strategy,
+                     len(draw), len(trash), len(sleeping))
+    buffer[offset + CARDS:offset + SLEEPING] = _padded(bytes(draw + trash), len(deck))
+    buffer[offset + SLEEPING:offset + PLAYERS] = _padded(bytes(sleeping), QUEEN_SLOTS)
+    position = offset + PLAYERS
+    for player in players:
+        hand = bytes(player.hand.encode())
+        awoken = bytes(player.awoken_queens.encode())
+        PLAYER.pack_into(buffer, position, len(hand), _padded(hand, HAND_SIZE),
+                         len(awoken), _padded(awoken, QUEEN_SLOTS))
+        position += PLAYER.size
+    return position
+
+
+def encode(game: Game) -> bytearray:
+    buffer = bytearray(record_size(game.get_number_of_players()))
+    encode_into(game, buffer)
+    return buffer
+
+
+def encode_many(games: Sequence[Game]) -> bytearray:
+    """
+    Encodes games one after another into a single buffer.
+    """
+    buffer = bytearray(sum(record_size(game.get_number_of_players()) for game in games))
+    offset = 0
+    for game in games:
+        offset = encode_into(game, buffer, offset)
+    return buffer
+
+
+def decode_into(game: Game, data: Buffer, offset: int = 0) -> int:
+    """
+    Overwrites the game with a game encoded at offset and returns the offset after it.
+    The game has to have the same number of players. Cards and queens are read from memoryview slices,
+    existing piles, hands and queen collections are reused.
+    """
+    view = memoryview(data)
+    magic, version, number_of_players, on_turn, winner, strategy, draw_size, trash_size, sleeping_size = \
+        HEADER.unpack_from(view, offset)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f'not a game record of version {VERSION}')
+    if number_of_players != game.get_number_of_players():
+        raise ValueError(f'record has {number_of_players} players, the game has {game.get_number_of_players()}')
+    cards = view[offset + CARDS:offset + SLEEPING]
+    pile = game.pile
+    pile.draw_pile.clear()
+    pile.draw_pile.extend(decode_cards(cards[:draw_size]))
+    pile.trash_pile.clear()
+    pile.trash_pile.extend(decode_cards(cards[draw_size:draw_size + trash_size]))
+    pile.strategy = strategies[strategy]()
+    game.sleeping_queens.decode(view[offset + SLEEPING:offset + SLEEPING + sleeping_size])
+    position = offset + PLAYERS
+    for player in game.players:
+        hand_size, _, awoken_size, _ = PLAYER.unpack_from(view, position)
+        start = position + 1
+        player.hand.set_cards(decode_cards(view[start:start + hand_size]))
+        start += HAND_SIZE + 1
+        player.awoken_queens.decode(view[start:start + awoken_size])
+        position += PLAYER.size
+    game.restore(on_turn, winner if winner != EMPTY_SLOT else None)
+    return position
+
+
+def number_of_players(data: Buffer, offset: int = 0) -> int:
+    return HEADER.unpack_from(data, offset)[2]
+
+
+def decode(data: Buffer, offset: int = 0) -> Game:
+    """
+    Creates a new game composed by GameAdaptor and overwrites it with the encoded one.
+    """
+    game = GameAdaptor(number_of_players(data, offset)).game
+    decode_into(game, data, offset)
+    return game
+
+
+def decode_many(data: Buffer, games: Optional[Iterable[Game]] = None) -> Iterator[Game]:
+    """
+    Decodes all games from a buffer made by encode_many. Given games are overwritten one by one
+    (they have to match the records), new games are created when there are no more of them.
+    """
+    view = memoryview(data)
+    targets = iter(games) if games is not None else None
+    offset = 0
+    while offset < len(view):
+        game = next(targets, None) if targets is not None else None
+        if game is None:
+            game = decode(view, offset)
+        else:
+            decode_into(game, view, offset)
+        offset += record_size(game.get_number_of_players())
+        yield game
+
@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, NamedTuple, Optional, Tuple
+
+from adaptor import GameObservable, GameObserver, Message
+
+DROP_OLDEST = 'drop-oldest'
+COALESCE = 'coalesce'
+BLOCK = 'block'
+policies = (DROP_OLDEST, COALESCE, BLOCK)
+
+
+class LazyMessage:
+    """
+    Message shared by all queues, it is made at most once, by the first delivery.
+    """
+    __slots__ = ('_message',)
+
+    def __init__(self, message: Message) -> None:
+        self._message = message
+
+    def text(self) -> str:
+        if callable(self._message):
+            self._message = self._message()
+        return self._message
+
+
+class ObserverStats(NamedTuple):
+    observer: GameObserver
+    pending: int
+    delivered: int
+    dropped: int
+    coalesced: int
+    lag: float              # seconds the oldest pending message waits
+    max_lag: float          # longest wait of a delivered message
+
+
+class ObserverQueue:
+    """
+    Bounded queue of messages for one observer. When it is full, drop-oldest drops the oldest message,
+    coalesce replaces the newest pending message (observers get the latest news, the wait of the replaced one
+    is kept) and block makes the producer wait.
+    """
+    def __init__(self, observer: GameObserver, capacity: int, policy: str) -> None:
+        self.observer = observer
+        self.capacity = capacity
+        self.policy = policy
+        self.messages: Deque[Tuple[float, LazyMessage]] = deque()
+        self.delivered = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.max_lag = 0.0
+
+    def push(self, message: LazyMessage, now: float) -> bool:
+        """
+        Returns False when the message has to wait for space.
+        """
+        if len(self.messages) < self.capacity:
+            self.messages.append((now, message))
+        elif self.policy == DROP_OLDEST:
+            self.messages.popleft()
+            self.messages.append((now, message))
+            self.dropped += 1
+        elif self.policy == COALESCE:
+            self.messages[-1] = (self.messages[-1][0], message)
+            self.coalesced += 1
+        else:
+            return False
+        return True
+
+    def stats(self, now: float) -> ObserverStats:
+        lag = now - self.messages[0][0] if self.messages else 0.0
+        return ObserverStats(self.observer, len(self.messages), self.delivered, self.dropped, self.coalesced,
+                             lag, self.max_lag)
+
+
+class DispatchingObservable(GameObservable):
+    """
+    GameObservable whose notify_all only puts the message into a bounded queue of every observer,
+    a worker thread (mode 'thread', started by the first queued message and stopped by clear and close)
+    or an asyncio task (mode 'asyncio', started by start in a running loop) calls the observers.
+    A slow observer delays other observers of this observable, never the move. Messages given as functions
+    are made only when they are delivered. In asyncio mode the producer runs in the loop, so it cannot block.
+    """
+    def __init__(self, number_of_players: int, capacity: int = 64, policy: str = DROP_OLDEST,
+                 mode: str = 'thread') -> None:
+        super().__init__(number_of_players)
+        if policy not in policies:
+            raise ValueError(f'policy has to be one of {", ".join(policies)}')
+        if mode == 'asyncio' and policy == BLOCK:
+            raise ValueError('producers in the event loop cannot block')
+        self.capacity = capacity
+        self.policy = policy
+        self.mode = mode
+        self._queues: Dict[int, ObserverQueue] = {}        # by id of the observer
+        self._condition = threading.Condition()
+        self._closed = False
+        self._in_flight = 0             # taken from queues, not delivered yet
+        self._worker: Optional[threading.Thread] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def start(self) -> None:
+        if self.mode == 'thread':
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run_thread, daemon=True)
+                self._worker.start()
+        else:
+            self._loop = asyncio.get_running_loop()
+            self._wakeup = asyncio.Event()
+            self._task = self._loop.create_task(self._run_task())
+
+    def _queue(self, observer: GameObserver) -> ObserverQueue:
+        queue = self._queues.get(id(observer))
+        if queue is None:
+            queue = self._queues[id(observer)] = ObserverQueue(observer, self.capacity, self.policy)
+        return queue
+
+    def clear(self) -> None:
+        """
+        Removes observers with their pending messages and stops the worker thread, the next message starts it again.
+        """
+        super().clear()
+        with self._condition:
+            self._queues.clear()
+            worker, self._worker = self._worker, None
+            self._condition.notify_all()
+        if worker is not None and worker is not threading.current_thread():
+            worker.join()
+
+    def remove(self, observer: GameObserver) -> None:
+        super().remove(observer)
+        with self._condition:
+            self._queues.pop(id(observer), None)
+
+    def notify_all(self, message: Message) -> None:
+        observers = [x for x in self.observers if x]
+        if not observers:
+            return
+        lazy = LazyMessage(message)
+        with self._condition:
+            now = time.perf_counter()
+            for observer in observers:
+                queue = self._queue(observer)
+                while not queue.push(lazy, now):
+                    self._condition.notify_all()
+                    self._condition.wait()
+            if self.mode == 'thread' and self._worker is None and not self._closed:
+                self.start()
+            self._condition.notify_all()
+        if self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def _take(self) -> List[Tuple[ObserverQueue, float, LazyMessage]]:
+        """
+        Takes the oldest message of every queue, the caller holds the lock.
+        """
+        batch = [(queue, *queue.messages.popleft()) for queue in self._queues.values() if queue.messages]
+        if batch:
+            self._in_flight += len(batch)
+            self._condition.notify_all()        # blocked producers have space now
+        return batch
+
+    def _deliver(self, batch: List[Tuple[ObserverQueue, float, LazyMessage]]) -> None:
+        for queue, queued, message in batch:
+            queue.observer.notify(message.text())
+            queue.delivered += 1
+            queue.max_lag = max(queue.max_lag, time.perf_counter() - queued)
+        with self._condition:
+            self._in_flight -= len(batch)
+            self._condition.notify_all()        # for flush
+
+    def _run_thread(self) -> None:
+        worker = threading.current_thread()
+        while True:
+            with self._condition:
+                while True:
+                    if self._worker is not worker:      # stopped by clear
+                        return
+                    batch = self._take()
+                    if batch or self._closed:
+                        break
+                    self._condition.wait()
+                if not batch:
+                    return
+            self._deliver(batch)
+
+    async def _run_task(self) -> None:
+        while True:
+            with self._condition:
+                batch = self._take()
+            if batch:
+                self._deliver(batch)
+                await asyncio.sleep(0)
+                continue
+            if self._closed:
+                return
+            await self._wakeup.wait()
+            self._wakeup.clear()
+
+    def pending(self) -> int:
+        with self._condition:
+            return sum(len(queue.messages) for queue in self._queues.values())
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Waits in thread mode until all messages are delivered, returns False on timeout.
+        """
+        deadline = time.perf_counter() + timeout if timeout is not None else None
+        with self._condition:
+            while self._in_flight or any(queue.messages for queue in self._queues.values()):
+                remaining = deadline - time.perf_counter() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def close(self) -> None:
+        """
+        Delivers the remaining messages and stops the worker.
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if self._worker is not None:
+            self._worker.join()
+            self._worker = None
+        if self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def stats(self) -> List[ObserverStats]:
+        with self._condition:
+            now = time.perf_counter()
+            return [queue.stats(now) for queue in self._queues.values()]
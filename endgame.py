@@ -0,0 +1,348 @@
+from __future__ import annotations
+
+import random
+import time
+from collections import Counter
+from math import comb
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from beliefs import BeliefTracker, kinds
+from cards import Card
+from game import Game
+from moves import Move
+from simulator import MovePolicy, RandomPolicy
+from snapshot import GameSnapshot, defense_card
+from zobrist import DRAW, TRASH, TranspositionTable, feature_key, state_hash
+
+EXACT, LOWER, UPPER = range(3)
+ENTRY_BYTES = 200           # estimated size of one memo entry with its value tuple
+SOLVED = 255                # depth of entries whose subtree reached the end of the game everywhere
+
+Values = Tuple[float, ...]      # win probability of every player
+
+
+class Entry(NamedTuple):
+    values: Values
+    bound: int
+    exact: bool
+    move: Optional[Move]
+
+
+class SolveResult(NamedTuple):
+    values: Values
+    move: Optional[Move]
+    depth: int                  # plies of the deepest finished iteration
+    exact: bool                 # every line ended the game within depth, values are exact probabilities
+    nodes: int
+    seconds: float
+
+    def nodes_per_second(self) -> float:
+        return self.nodes / self.seconds if self.seconds else 0.0
+
+
+class _Timeout(Exception):
+    pass
+
+
+class _Arranger:
+    """
+    Stands for the random generator of a reshuffle: puts the cards the outcome draws on the top.
+    """
+    def __init__(self, top: List[Card]) -> None:
+        self.top = top          # from the first drawn card
+        self.pool: Optional[List[Card]] = None
+
+    def shuffle(self, cards: List[Card]) -> None:
+        self.pool = list(cards)
+        rest = Counter(cards)
+        rest.subtract(self.top)
+        cards[:] = list(rest.elements()) + self.top[::-1]
+
+
+def multisets(counts: Dict[Card, int], k: int) -> Iterator[Tuple[Counter, float]]:
+    """
+    Every multiset of k cards drawn without replacement from counts, with its probability.
+    """
+    cards = [card for card, count in counts.items() if count > 0]
+    total = comb(sum(counts[card] for card in cards), k)
+
+    def choose(i: int, left: int, chosen: Counter, ways: int) -> Iterator[Tuple[Counter, float]]:
+        if left == 0:
+            yield Counter(chosen), ways / total
+            return
+        if i == len(cards):
+            return
+        card = cards[i]
+        for m in range(min(left, counts[card]), -1, -1):
+            chosen[card] = m
+            yield from choose(i + 1, left - m, chosen, ways * comb(counts[card], m))
+        del chosen[card]
+
+    if total:
+        yield from choose(0, k, Counter(), 1)
+
+
+def draw_groups(state: GameSnapshot, move: Move) -> List[int]:
+    """
+    Numbers of cards drawn by the move in order: a victim who defends draws first.
+    """
+    player = state.on_turn
+    if move.awoken is not None:
+        attack = state.hands[player][move.hand[0]].type
+        victim = move.awoken[0]
+        if any(card.type == defense_card.get(attack) for card in state.hands[victim]):
+            return [1, 1]
+    return [len(move.hand)]
+
+
+def iter_outcomes(state: GameSnapshot, move: Move) -> Iterator[Tuple[float, GameSnapshot]]:
+    """
+    Every distinct result of a move with its probability. The order of the draw pile and of a reshuffled
+    pile is unknown, so cards are drawn uniformly from the multiset of the pile. Rules are those
+    of GameSnapshot.play, the draws are arranged by ordering the draw pile and by the reshuffle generator.
+    Results are made one at a time, a search can stop before all of them are made.
+    """
+    groups = draw_groups(state, move)
+    probe = _Arranger([])
+    if state.play(move, probe) is None:
+        return
+    draw = Counter(state.draw_pile[:state.draw_size])
+
+    def expand(g: int, pile: Counter, probability: float, from_draw: List[List[Card]],
+               from_pool: List[List[Card]]) -> Iterator[Tuple[float, GameSnapshot]]:
+        if g == len(groups):
+            rest = Counter(draw)
+            for part in from_draw:
+                rest.subtract(part)
+            arranged = list(rest.elements())
+            for part in reversed(from_draw):
+                arranged.extend(part)
+            top = [card for part in from_pool for card in part]
+            child = state._replace(draw_pile=tuple(arranged), draw_size=len(arranged)).play(move, _Arranger(top))
+            yield probability, child
+            return
+        count = groups[g]
+        size = sum(pile.values())
+        if from_pool or count < size:       # no reshuffle, or the pile is already the reshuffled one
+            for chosen, p in multisets(pile, count):
+                rest = pile - chosen
+                if from_pool:
+                    yield from expand(g + 1, rest, probability * p, from_draw,
+                                      from_pool + [list(chosen.elements())])
+                else:
+                    yield from expand(g + 1, rest, probability * p, from_draw + [list(chosen.elements())],
+                                      from_pool)
+            return
+        if probe.pool is None:
+            raise ValueError('the move draws from a reshuffled pile twice')
+        pool = Counter(probe.pool)          # the rest of the draw pile is taken, the remaining cards come from it
+        for chosen, p in multisets(pool, count - size):
+            yield from expand(g + 1, pool - chosen, probability * p, from_draw + [list(pile.elements())],
+                              [list(chosen.elements())])
+
+    yield from expand(0, draw, 1.0, [], [])
+
+
+def outcomes(state: GameSnapshot, move: Move) -> List[Tuple[float, GameSnapshot]]:
+    return list(iter_outcomes(state, move))
+
+
+def state_key(state: GameSnapshot) -> int:
+    """
+    Hash of the state where only the contents of the piles matter, not their order.
+    """
+    key = state_hash(state.on_turn, state.hands, state.sleeping_queens, state.awoken_queens)
+    for kind, cards in ((DRAW, state.draw_pile[:state.draw_size]), (TRASH, state.get_trash_pile())):
+        for card, count in Counter(cards).items():
+            key ^= feature_key(kind, card.code, count, 1)
+    return key
+
+
+def estimate(state: GameSnapshot) -> Values:
+    """
+    Win probabilities of a state that is not searched to the end, shares of points of awoken queens.
+    """
+    points = [sum(queen.get_points() for queen in queens if queen) + 5 for queens in state.awoken_queens]
+    total = sum(points)
+    return tuple(p / total for p in points)
+
+
+class EndgameSolver:
+    """
+    Expectiminimax over GameSnapshot: players choose moves, draws are chance nodes. Every player maximizes
+    their own win probability. With two players this is minimax with alpha-beta pruning, chance nodes
+    are pruned by Star1 (bounds from the probability mass that is not searched yet).
+    Iterative deepening runs until the time limit or until the whole game tree is solved, results are memoized
+    in a TranspositionTable sized by the memory budget.
+    """
+    def __init__(self, memory_bytes: int = 64 << 20, time_limit: float = 1.0, max_depth: int = 40) -> None:
+        bits = max((memory_bytes // (2 * ENTRY_BYTES)).bit_length() - 1, 4)
+        self.table: TranspositionTable[Entry] = TranspositionTable(bits)
+        self.time_limit = time_limit
+        self.max_depth = max_depth
+        self.nodes = 0
+        self._deadline = 0.0
+        self._root: Optional[GameSnapshot] = None
+        self._root_move: Optional[Move] = None
+
+    def solve(self, state: Union[Game, GameSnapshot]) -> SolveResult:
+        if isinstance(state, Game):
+            state = state.fork()
+        start = time.perf_counter()
+        self._deadline = start + self.time_limit
+        self._root = state
+        self.nodes = 0
+        best = SolveResult(estimate(state), None, 0, False, 0, 0.0)
+        for depth in range(1, self.max_depth + 1):
+            try:
+                values, exact = self._search(state, depth, 0.0, 1.0)
+            except _Timeout:
+                break
+            best = SolveResult(values, self._root_move, depth, exact, self.nodes, time.perf_counter() - start)
+            if exact:
+                break
+        self._root = None
+        return best._replace(nodes=self.nodes, seconds=time.perf_counter() - start)
+
+    def _search(self, state: GameSnapshot, depth: int, alpha: float, beta: float) -> Tuple[Values, bool]:
+        self.nodes += 1
+        if time.perf_counter() > self._deadline:        # a node takes far longer than reading the clock
+            raise _Timeout
+        n = len(state.hands)
+        if state.winner is not None:
+            return tuple(1.0 if i == state.winner else 0.0 for i in range(n)), True
+        key = state_key(state)
+        root = state is self._root
+        entry = self.table.get(key, depth)
+        if entry is not None and not root:
+            if entry.bound == EXACT:
+                return entry.values, entry.exact
+            if entry.bound == LOWER:
+                alpha = max(alpha, entry.values[0])
+            else:
+                beta = min(beta, entry.values[0])
+            if alpha >= beta:
+                return entry.values, entry.exact
+        moves = state.legal_moves()
+        if depth == 0 or not moves:
+            return estimate(state), False
+
+        hint = entry or self.table.get(key)
+        if hint is not None and hint.move in moves:      # the best move of a shallower search first
+            moves.remove(hint.move)
+            moves.insert(0, hint.move)
+        player = state.on_turn
+        original_alpha, original_beta = alpha, beta
+        best: Optional[Values] = None
+        best_move = None
+        exact = True
+        for move in moves:
+            if n == 2:
+                value, move_exact = self._chance(state, move, depth, alpha, beta)
+                values: Values = (value, 1.0 - value)
+            else:
+                values, move_exact = self._expectation(state, move, depth)
+            exact = exact and move_exact
+            if best is None or values[player] > best[player]:
+                best, best_move = values, move
+            if n == 2:      # player 0 maximizes the win probability of player 0, player 1 minimizes it
+                if player == 0:
+                    alpha = max(alpha, best[0])
+                else:
+                    beta = min(beta, best[0])
+                if alpha >= beta:
+                    break
+        if n == 2 and best[0] <= original_alpha:
+            bound = UPPER
+        elif n == 2 and best[0] >= original_beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        self.table.put(key, Entry(best, bound, exact, best_move), SOLVED if exact and bound == EXACT else depth)
+        if root:
+            self._root_move = best_move
+        return best, exact
+
+    def _chance(self, state: GameSnapshot, move: Move, depth: int, alpha: float, beta: float) -> Tuple[float, bool]:
+        """
+        Win probability of player 0 after a move of a two-player game. Stops when the searched outcomes
+        already decide that the value is outside (alpha, beta), the result is then a bound.
+        """
+        searched = 0.0          # probability weighted values of searched outcomes
+        remaining = 1.0
+        exact = True
+        for probability, child in iter_outcomes(state, move):
+            remaining -= probability
+            child_alpha = max(0.0, (alpha - searched - remaining) / probability)
+            child_beta = min(1.0, (beta - searched) / probability)
+            values, child_exact = self._search(child, depth - 1, child_alpha, child_beta)
+            exact = exact and child_exact
+            searched += probability * values[0]
+            if searched >= beta:
+                return searched, exact
+            if searched + remaining <= alpha:
+                return searched + remaining, exact
+        return searched, exact
+
+    def _expectation(self, state: GameSnapshot, move: Move, depth: int) -> Tuple[Values, bool]:
+        values = [0.0] * len(state.hands)
+        exact = True
+        for probability, child in iter_outcomes(state, move):
+            child_values, child_exact = self._search(child, depth - 1, 0.0, 1.0)
+            exact = exact and child_exact
+            for i, value in enumerate(child_values):
+                values[i] += probability * value
+        return tuple(values), exact
+
+
+def sample_hidden(state: GameSnapshot, tracker: BeliefTracker, rng: Optional[random.Random] = None) -> GameSnapshot:
+    """
+    The state with the cards the tracker's player has not seen dealt at random to the other players' hands
+    and the draw pile, the player's own hand, the trash pile and the queens stay.
+    """
+    cards = [card for card, count in zip(kinds, tracker.counts()) for _ in range(count)]
+    (rng or random).shuffle(cards)
+    hands = list(state.hands)
+    for player, hand in enumerate(hands):
+        if player != tracker.playerID:
+            hands[player], cards = tuple(cards[:len(hand)]), cards[len(hand):]
+    return state._replace(hands=tuple(hands), draw_pile=tuple(cards), draw_size=len(cards))
+
+
+def is_endgame(game: Game, max_sleeping: int = 2, max_draw: int = 12) -> bool:
+    """
+    True when few sleeping queens and few cards in the draw pile are left.
+    """
+    return (game.game_state.sleeping_count <= max_sleeping and len(game.pile.draw_pile) <= max_draw
+            and game.winner is None)
+
+
+class EndgamePolicy(MovePolicy):
+    """
+    Plays the solver's move in the endgame, otherwise asks the fallback policy. The player does not see
+    the other hands: the solver solves samples of the hidden cards dealt by sample_hidden
+    from what the player's BeliefTracker counts as unseen, the move chosen for most samples is played.
+    """
+    def __init__(self, fallback: Optional[MovePolicy] = None, solver: Optional[EndgameSolver] = None,
+                 max_sleeping: int = 2, max_draw: int = 12, samples: int = 4,
+                 rng: Optional[random.Random] = None) -> None:
+        self.fallback = fallback if fallback is not None else RandomPolicy()
+        self.solver = solver if solver is not None else EndgameSolver(time_limit=0.05)
+        self.max_sleeping = max_sleeping
+        self.max_draw = max_draw
+        self.samples = samples
+        self.rng = rng          # deals the samples, None for the random module
+
+    def choose(self, game: Game, player_id: int) -> Optional[str]:
+        if is_endgame(game, self.max_sleeping, self.max_draw):
+            state = game.fork()
+            tracker = BeliefTracker(game, player_id)
+            try:
+                votes = Counter(self.solver.solve(sample_hidden(state, tracker, self.rng)).move
+                                for _ in range(self.samples))
+            finally:
+                tracker.close()
+            votes.pop(None, None)
+            if votes:
+                return votes.most_common(1)[0][0].command()
+        return self.fallback.choose(game, player_id)
@@ -3,6 +3,7 @@ from __future__ import annotations
 from typing import List, Optional, TYPE_CHECKING
 
 from cards import Queen, CardType
+from changes import OUTSIDE, ChangeListener, QueenMoved
 from positions import HandPosition, AwokenQueenPosition, Position, QueenCollectionInterface, SleepingQueenPosition
 
 if TYPE_CHECKING:
@@ -52,11 +53,18 @@ class MoveQueenInterface:
     def put_to_sleep(self, position: AwokenQueenPosition) -> Optional[bool]:
         pass
 
+    def add(self, queen: Queen, destination: QueenCollectionInterface) -> None:
+        pass
+
+    def remove(self, queen: Queen, source: QueenCollectionInterface) -> Optional[bool]:
+        pass
+
 
 class MoveQueen(MoveQueenInterface):
     def __init__(self, awoken_queens: QueenCollectionInterface, sleeping_queens: QueenCollectionInterface) -> None:
         self.awoken_queens = awoken_queens
         self.sleeping_queens = sleeping_queens
+        self.on_change: Optional[ChangeListener] = None
 
     def move_awoken(self, position: AwokenQueenPosition, destination: QueenCollectionInterface) -> Optional[bool]:
         """
@@ -76,8 +84,27 @@ class MoveQueen(MoveQueenInterface):
         """
         return self._move(position.get_card(), self.awoken_queens, self.sleeping_queens)
 
-    @staticmethod
-    def _move(card: Queen, source: QueenCollectionInterface, destination: QueenCollectionInterface) -> Optional[bool]:
+    def add(self, queen: Queen, destination: QueenCollectionInterface) -> None:
+        """
+        Puts a queen that was in no collection into destination.
+        """
+        destination.add_queen(queen)
+        if self.on_change:
+            self.on_change(QueenMoved(queen, OUTSIDE, destination.get_playerID()))
+
+    def remove(self, queen: Queen, source: QueenCollectionInterface) -> Optional[bool]:
+        """
+        Takes a queen out of the game.
+        """
+        if queen not in source:
+            return None
+        source.remove_queen(queen)
+        if self.on_change:
+            self.on_change(QueenMoved(queen, source.get_playerID(), OUTSIDE))
+        return True
+
+    def _move(self, card: Queen, source: QueenCollectionInterface,
+              destination: QueenCollectionInterface) -> Optional[bool]:
         """
         Moves queen from one QueenCollection to another.
         """
@@ -85,4 +112,6 @@ class MoveQueen(MoveQueenInterface):
             return None
         source.remove_queen(card)
         destination.add_queen(card)
+        if self.on_change:
+            self.on_change(QueenMoved(card, source.get_playerID(), destination.get_playerID()))
         return True
@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import argparse
+import math
+import time
+from multiprocessing import Pool
+from statistics import NormalDist
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from adaptor import GameFinishedStrategy, GameFinished, GameFinishedAt
+from piles import StrategyInterface, Strategy1, Strategy2
+from simulator import GameResult, play_game, policies
+
+DIFFERENT = 'different'
+EQUIVALENT = 'equivalent'
+INCONCLUSIVE = 'inconclusive'
+
+
+class Variant(NamedTuple):
+    """
+    One arm of an experiment: rules of the game and bots for the seats (repeated for more seats).
+    """
+    name: str
+    strategy: StrategyInterface = Strategy1()
+    game_finished: GameFinishedStrategy = GameFinished()
+    policy_names: Tuple[str, ...] = ('random',)
+
+
+def play_variant(variant: Variant, number_of_players: int, seed: int, max_moves: int = 1000) -> GameResult:
+    """
+    Plays a game of the variant. Deck and queens are shuffled by the game's generator seeded by seed
+    and bots draw from the random module seeded by seed, so both arms of a pair start from the same deal
+    and bots make the same random choices as long as the games do not differ.
+    """
+    seat_policies = [policies[name]() for name in variant.policy_names]
+    return play_game(number_of_players, seat_policies, seed, max_moves, game_seed=seed, strategy=variant.strategy,
+                     game_finished=variant.game_finished)
+
+
+def _play_pair(args: Tuple[Variant, Variant, int, int, int]) -> Tuple[GameResult, GameResult]:
+    a, b, number_of_players, seed, max_moves = args
+    return play_variant(a, number_of_players, seed, max_moves), play_variant(b, number_of_players, seed, max_moves)
+
+
+# a metric turns the result of a game into a number, experiments compare means of the metric
+metrics: Dict[str, Callable[[GameResult], float]] = {
+    'first-seat-wins': lambda result: 1.0 if result.winner == 0 else 0.0,
+    'moves': lambda result: float(result.moves),
+    'unfinished': lambda result: 1.0 if result.winner is None else 0.0,
+}
+
+
+class RunningStats:
+    """
+    Mean and variance updated one value at a time (Welford).
+    """
+    def __init__(self) -> None:
+        self.n = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, value: float) -> None:
+        self.n += 1
+        delta = value - self.mean
+        self.mean += delta / self.n
+        self._m2 += delta * (value - self.mean)
+
+    def variance(self) -> float:
+        return self._m2 / (self.n - 1) if self.n > 1 else 0.0
+
+
+class ExperimentResult:
+    def __init__(self, a: Variant, b: Variant, metric: str) -> None:
+        self.a = a
+        self.b = b
+        self.metric = metric
+        self.arm_a = RunningStats()
+        self.arm_b = RunningStats()
+        self.difference = RunningStats()        # of pairs, a - b
+        self.decision = INCONCLUSIVE
+        self.interval: Tuple[float, float] = (-math.inf, math.inf)
+        self.seconds = 0.0
+
+    @property
+    def pairs(self) -> int:
+        return self.difference.n
+
+    def variance_reduction(self) -> float:
+        """
+        How many times more pairs independent games would need for the same precision.
+        """
+        paired = self.difference.variance()
+        unpaired = self.arm_a.variance() + self.arm_b.variance()
+        return unpaired / paired if paired else math.inf
+
+    def __repr__(self) -> str:
+        low, high = self.interval
+        return (f'{self.a.name}: {self.arm_a.mean:.4f}, {self.b.name}: {self.arm_b.mean:.4f} ({self.metric})\n'
+                f'difference: {self.difference.mean:+.4f}, interval [{low:+.4f}, {high:+.4f}]\n'
+                f'{self.decision} after {self.pairs} pairs, variance reduction by pairing: '
+                f'{self.variance_reduction():.1f}x, time: {self.seconds:.2f} s')
+
+
+def run_experiment(a: Variant, b: Variant, number_of_players: int = 2, metric: str = 'first-seat-wins',
+                   margin: float = 0.0, alpha: float = 0.05, batch: int = 100, max_pairs: int = 10000,
+                   seed: int = 0, max_moves: int = 1000, processes: int = 1) -> ExperimentResult:
+    """
+    Plays pairs of games, both arms of a pair with the same seed, and looks at the paired differences
+    of the metric after every batch. It stops when the confidence interval of the mean difference excludes 0
+    (different) or lies within (-margin, margin) (equivalent), or after max_pairs.
+    The error alpha is split evenly among all looks, so stopping early does not inflate it.
+    """
+    if metric not in metrics:
+        raise ValueError(f'unknown metric: {metric}')
+    value = metrics[metric]
+    result = ExperimentResult(a, b, metric)
+    looks = math.ceil(max_pairs / batch)
+    z = NormalDist().inv_cdf(1 - alpha / looks / 2)
+    start = time.perf_counter()
+    pool = Pool(processes) if processes > 1 else None
+    try:
+        for first in range(seed, seed + max_pairs, batch):
+            tasks = [(a, b, number_of_players, game_seed, max_moves)
+                     for game_seed in range(first, min(first + batch, seed + max_pairs))]
+            pairs = pool.map(_play_pair, tasks) if pool is not None else map(_play_pair, tasks)
+            for result_a, result_b in pairs:
+                x, y = value(result_a), value(result_b)
+                result.arm_a.add(x)
+                result.arm_b.add(y)
+                result.difference.add(x - y)
+            mean = result.difference.mean
+            half_width = z * math.sqrt(result.difference.variance() / result.pairs)
+            result.interval = (mean - half_width, mean + half_width)
+            if result.pairs < 2 * batch:
+                continue            # the variance of one batch is not reliable
+            if abs(mean) > half_width:
+                result.decision = DIFFERENT
+                break
+            if abs(mean) + half_width < margin:
+                result.decision = EQUIVALENT
+                break
+    finally:
+        if pool is not None:
+            pool.close()
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def parse_variant(text: str) -> Variant:
+    """
+    Variant from 'name:strategy=2,goal=40/4,policy=greedy+random', every setting is optional.
+    """
+    name, _, settings = text.partition(':')
+    variant = Variant(name)
+    for setting in filter(None, settings.split(',')):
+        key, _, value = setting.partition('=')
+        if key == 'strategy' and value in ('1', '2'):
+            variant = variant._replace(strategy=Strategy1() if value == '1' else Strategy2())
+        elif key == 'goal':
+            points, queens = value.split('/')
+            variant = variant._replace(game_finished=GameFinishedAt(int(points), int(queens)))
+        elif key == 'policy' and all(policy in policies for policy in value.split('+')):
+            variant = variant._replace(policy_names=tuple(value.split('+')))
+        else:
+            raise ValueError(f'unknown setting: {setting}')
+    return variant
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description='Compares two variants of rules or bots on paired games.')
+    parser.add_argument('a', help="variant, e.g. 'shuffle1:strategy=1' or 'short:goal=40/4,policy=greedy'")
+    parser.add_argument('b')
+    parser.add_argument('-p', '--players', type=int, default=2, choices=range(2, 6))
+    parser.add_argument('--metric', default='first-seat-wins', choices=sorted(metrics))
+    parser.add_argument('--margin', type=float, default=0.0, help='differences below it are negligible')
+    parser.add_argument('--alpha', type=float, default=0.05)
+    parser.add_argument('--batch', type=int, default=100)
+    parser.add_argument('--max-pairs', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-j', '--processes', type=int, default=1)
+    args = parser.parse_args(argv)
+    print(run_experiment(parse_variant(args.a), parse_variant(args.b), args.players, args.metric, args.margin,
+                         args.alpha, args.batch, args.max_pairs, args.seed, processes=args.processes))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,53 +1,207 @@
 from __future__ import annotations
 
-from typing import Set, List, Optional, TYPE_CHECKING
-from random import shuffle
+import random
+from typing import Dict, Set, List, Optional, Tuple, TYPE_CHECKING
 
-from cards import Queen
+from cards import Card, Queen, queen_info, queens as all_queens
+from changes import OUTSIDE, Change, ChangeListener, QueenMoved, HandRedrawn, TurnAdvanced
+from moves import Move, legal_moves
+from snapshot import GameSnapshot, SnapshotCache
 from player import Player
 from positions import SleepingQueenPosition, AwokenQueenPosition, Position, QueenCollection
 from piles import DrawingAndTrashPile
+from zobrist import ZobristHash
+
+__all__ = ['GameState', 'Game', 'queen_info']     # queen_info moved to cards, it is still importable from here
 
 if TYPE_CHECKING:
     from adaptor import GameObservable, GameFinishedStrategy
 
-queen_info = {"Rose Queen": 5, "Cake Queen": 5, "Rainbow Queen": 5, "Starfish Queen": 5,
-              "Moon Queen": 10, "Peacock Queen": 10, "Ladybug Queen": 10, "Sunflower Queen": 10,
-              "Pancake Queen": 15, "Cat Queen": 15, "Dog Queen": 15, "Heart Queen": 20}
-
 
 class GameState:
-    def __init__(self, number_of_players: int, sleeping_queens: List[Queen]):
+    """
+    Public state of the game, kept up to date by changes emitted during moves.
+    """
+    def __init__(self, number_of_players: int, sleeping_queens: List[Queen],
+                 awoken_queens: Optional[List[List[Optional[Queen]]]] = None):
         self.number_of_players = number_of_players
         self.on_turn: int = 0
         self.awoken_queens: dict[AwokenQueenPosition, Queen] = {}
         self.sleeping_queens: Set[SleepingQueenPosition] = set()
+        self._positions: Dict[Queen, Position] = {}         # current position of every queen
+        self.turn_changes: List[Change] = []                # changes made by the move in progress
+        self.last_changes: List[Change] = []                # changes made by the last finished move
+        self.points: List[int] = [0] * number_of_players        # points of awoken queens of every player
+        self.queen_counts: List[int] = [0] * number_of_players
+        self.sleeping_count: int = 0
+        self.changed_players: Set[int] = set()      # players whose points or queens changed since the last check
+        self.reset(sleeping_queens, awoken_queens)
+
+    def reset(self, sleeping_queens: List[Queen], awoken_queens: Optional[List[List[Optional[Queen]]]] = None,
+              on_turn: int = 0) -> None:
+        self.on_turn = on_turn
+        self.awoken_queens.clear()
+        self.sleeping_queens.clear()
+        self._positions.clear()
+        self.turn_changes.clear()
+        self.last_changes.clear()
+        self.points[:] = [0] * self.number_of_players
+        self.queen_counts[:] = [0] * self.number_of_players
+        self.sleeping_count = 0
         for queen in sleeping_queens:
-            self.sleeping_queens.add(SleepingQueenPosition(queen))
+            self._put(queen, None)
+        for playerID, queens in enumerate(awoken_queens or []):
+            for queen in queens:
+                if queen is not None:
+                    self._put(queen, playerID)
+        self.changed_players.update(range(self.number_of_players))
+
+    def apply(self, change: Change) -> None:
+        """
+        Updates the state by one change, every change is applied in O(1).
+        """
+        if type(change) == QueenMoved:
+            self._take(change.queen)
+            self._put(change.queen, change.destination)
+        if type(change) == TurnAdvanced:
+            self.on_turn = change.on_turn
+            self.turn_changes.append(change)
+            self.last_changes, self.turn_changes = self.turn_changes, []
+            return
+        self.turn_changes.append(change)
+
+    def get_changes(self) -> List[Change]:
+        """
+        Returns what changed during the last move, the last change is always TurnAdvanced.
+        """
+        return self.last_changes
+
+    def _put(self, queen: Queen, playerID: Optional[int]) -> None:
+        if playerID == OUTSIDE:
+            return
+        if playerID is None:
+            position: Position = SleepingQueenPosition(queen)
+            self.sleeping_queens.add(position)
+            self.sleeping_count += 1
+        else:
+            position = AwokenQueenPosition(queen, playerID)
+            self.awoken_queens[position] = queen
+            self.points[playerID] += queen.get_points()
+            self.queen_counts[playerID] += 1
+            self.changed_players.add(playerID)
+        self._positions[queen] = position
+
+    def _take(self, queen: Queen) -> None:
+        position = self._positions.pop(queen, None)
+        if type(position) == SleepingQueenPosition:
+            self.sleeping_queens.discard(position)
+            self.sleeping_count -= 1
+        elif type(position) == AwokenQueenPosition:
+            del self.awoken_queens[position]
+            playerID = position.get_playerID()
+            self.points[playerID] -= queen.get_points()
+            self.queen_counts[playerID] -= 1
+            self.changed_players.add(playerID)
 
 
 class Game:
     def __init__(self, number_of_players: int, observable: GameObservable, pile: DrawingAndTrashPile,
-                 sleeping_queens: QueenCollection, players: List[Player], game_finished: GameFinishedStrategy) -> None:
+                 sleeping_queens: QueenCollection, players: List[Player], game_finished: GameFinishedStrategy,
+                 rng: Optional[random.Random] = None) -> None:
         self.observable: GameObservable = observable
         self.pile: DrawingAndTrashPile = pile
         self.sleeping_queens: QueenCollection = sleeping_queens
         self.players: List[Player] = players
+        self.rng = rng          # shuffles queens, None for the random module
+        self._queen_order: List[Queen] = list(all_queens)
         queens: List[Queen] = self.generate_queens()
         self.game_state: GameState = GameState(number_of_players, queens)
         self.winner: Optional[Player] = None
+        self.game_finished = game_finished
         self.is_finished = game_finished.is_finished
+        self._legal_moves: Dict[int, Tuple[Tuple[Card, ...], List[Move]]] = {}
+        self._snapshots = SnapshotCache()
+        self.listeners: List[ChangeListener] = []       # notified after the game's own state is updated
+        for player in players:      # moves report their changes to the game state
+            player.move_queen.on_change = self.on_change
+            player.hand.on_change = self.on_change
+        self.zobrist = ZobristHash(self)
+
+    def on_change(self, change: Change) -> None:
+        self.game_state.apply(change)
+        self.zobrist.apply(change)
+        if type(change) == QueenMoved:
+            self._legal_moves.clear()
+        elif type(change) == HandRedrawn:
+            self._legal_moves.pop(change.playerID, None)
+        if self.listeners:
+            for listener in self.listeners:
+                listener(change)
+
+    def legal_moves(self, playerID: int) -> List[Move]:
+        """
+        Lists valid plays of a player, the list is cached until the player's hand or some queen moves.
+        """
+        cards = tuple(self.players[playerID].hand.get_cards())
+        cached = self._legal_moves.get(playerID)
+        if cached is not None and cached[0] == cards:       # the hand could have been replaced by set_cards
+            return cached[1]
+        moves = legal_moves(playerID, cards, self.sleeping_queens.get_queens(),
+                            [player.awoken_queens.get_queens() for player in self.players])
+        self._legal_moves[playerID] = (cards, moves)
+        return moves
+
+    def restore(self, on_turn: int, winner: Optional[int]) -> None:
+        """
+        Rebuilds state derived from the piles, hands and queen collections after they were overwritten.
+        """
+        self.game_state.reset([queen for queen in self.sleeping_queens.get_queens() if queen is not None],
+                              [player.awoken_queens.get_queens() for player in self.players], on_turn)
+        self.winner = self.players[winner] if winner is not None else None
+        self._legal_moves.clear()
+        self.zobrist.rehash()
+
+    def reset(self, seed: Optional[int] = None) -> None:
+        """
+        Starts a new game with the same objects: the deck is put back and shuffled, hands are dealt again
+        and queens are shuffled in place. After reset with a seed the game is the same as a new game with the seed.
+        Listeners of the previous game are removed.
+        """
+        self.listeners.clear()
+        if seed is not None:
+            if self.rng is None:
+                self.rng = random.Random(seed)
+            else:
+                self.rng.seed(seed)
+            self.pile.rng = self.rng
+        self.pile.reset()
+        for player in self.players:
+            player.hand.draw_new_cards()
+            player.awoken_queens.clear()
+            player.update_player_state()
+        self.sleeping_queens.clear()
+        self.generate_queens()
+        self.restore(0, None)
+
+    def hash(self) -> int:
+        """
+        64-bit Zobrist hash of the whole game, equivalent states (copies of a card, queens with equal points)
+        hash the same.
+        """
+        return self.zobrist.key
+
+    def fork(self) -> GameSnapshot:
+        """
+        Immutable snapshot of the game for search, moves are played on it with GameSnapshot.play.
+        Parts that did not change since the previous fork are shared with it.
+        """
+        return self._snapshots.snapshot(self)
 
     def update_game_state(self):
-        self.game_state.on_turn = (self.game_state.on_turn + 1) % self.get_number_of_players()
-        for queen in self.sleeping_queens.get_queens():
-            if queen:
-                self.game_state.sleeping_queens.add(SleepingQueenPosition(queen))
-        for i in range(self.get_number_of_players()):
-            queens: List[Optional[Queen]] = self.players[i].awoken_queens.get_queens()
-            for queen in queens:
-                if queen:
-                    self.game_state.awoken_queens[AwokenQueenPosition(queen, i)] = queen
+        """
+        Queens and hands were already updated by changes emitted during the move, only the turn advances.
+        """
+        self.on_change(TurnAdvanced((self.game_state.on_turn + 1) % self.get_number_of_players()))
 
     def play(self, playerId: int, cards: List[Position]) -> Optional[bool]:
         if playerId != self.game_state.on_turn:
@@ -61,17 +215,19 @@ class Game:
 
     def add_queen(self, queen: Queen) -> None:
         self.sleeping_queens.add_queen(queen)
+        self.on_change(QueenMoved(queen, OUTSIDE, None))
 
     def remove_queen(self, queen: Queen) -> None:
-        self.sleeping_queens.remove_queen(queen)
+        if queen in self.sleeping_queens:
+            self.sleeping_queens.remove_queen(queen)
+            self.on_change(QueenMoved(queen, None, OUTSIDE))
 
     def generate_queens(self) -> List[Queen]:
-        queens: List[Queen] = []
-        for name, value in queen_info.items():
-            queens.append(Queen(name, value))
-        shuffle(queens)
-        for q in queens:
-            self.add_queen(q)
+        queens: List[Queen] = self._queen_order      # queens are interned, only the order is new
+        queens[:] = all_queens
+        (self.rng or random).shuffle(queens)
+        for q in queens:            # the game state is built from the collection afterwards
+            self.sleeping_queens.add_queen(q)
         return queens
 
     def get_number_of_players(self):
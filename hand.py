@@ -1,5 +1,7 @@
-from typing import List, Optional
-from cards import Card, CardType
+from collections import Counter
+from typing import Iterable, List, Optional
+from cards import Card, CardType, encode_cards
+from changes import ChangeListener, HandRedrawn
 from positions import HandPosition
 from piles import DrawingAndTrashPile
 
@@ -27,6 +29,112 @@ class HandInterface:
         return False
 
 
+class CardList(list):
+    """
+    List of cards that keeps count of every card and every card type,
+    so membership and type queries do not scan the list. The order of cards is kept.
+    """
+    def __init__(self, cards: Iterable[Card] = ()) -> None:
+        super().__init__(cards)
+        self.version: int = 0           # changes with every modification
+        self.counts: Counter[Card] = Counter(self)
+        self.type_counts: Counter[CardType] = Counter(card.type for card in self)
+
+    def _added(self, cards: Iterable[Card]) -> None:
+        self.version += 1
+        for card in cards:
+            self.counts[card] += 1
+            self.type_counts[card.type] += 1
+
+    def _removed(self, cards: Iterable[Card]) -> None:
+        self.version += 1
+        for card in cards:
+            self.counts[card] -= 1
+            self.type_counts[card.type] -= 1
+
+    def __contains__(self, item: object) -> bool:
+        return self.counts[item] > 0 if isinstance(item, Card) else False
+
+    def __setitem__(self, index, value) -> None:
+        old = self[index]
+        new = list(value) if isinstance(index, slice) else [value]     # an iterator can be read only once
+        super().__setitem__(index, new if isinstance(index, slice) else value)
+        self._removed(old if isinstance(index, slice) else [old])
+        self._added(new)
+
+    def __delitem__(self, index) -> None:
+        old = self[index]
+        super().__delitem__(index)
+        self._removed(old if isinstance(index, slice) else [old])
+
+    def __iadd__(self, cards: Iterable[Card]) -> 'CardList':
+        self.extend(cards)
+        return self
+
+    def __imul__(self, times: int) -> 'CardList':
+        cards = list(self)
+        super().__imul__(times)
+        if times <= 0:
+            self._removed(cards)
+        else:
+            self._added(cards * (times - 1))
+        return self
+
+    def append(self, card: Card) -> None:
+        super().append(card)
+        self._added([card])
+
+    def extend(self, cards: Iterable[Card]) -> None:
+        cards = list(cards)
+        super().extend(cards)
+        self._added(cards)
+
+    def insert(self, index, card: Card) -> None:
+        super().insert(index, card)
+        self._added([card])
+
+    def remove(self, card: Card) -> None:
+        super().remove(card)
+        self._removed([card])
+
+    def pop(self, index=-1) -> Card:
+        card = super().pop(index)
+        self._removed([card])
+        return card
+
+    def sort(self, *args, **kwargs) -> None:
+        super().sort(*args, **kwargs)
+        self.version += 1
+
+    def reverse(self) -> None:
+        super().reverse()
+        self.version += 1
+
+    def clear(self) -> None:
+        super().clear()
+        self.version += 1
+        self.counts.clear()
+        self.type_counts.clear()
+
+    def remove_all(self, cards: List[Card]) -> None:
+        """
+        Removes the first occurrence of every card in one pass, like calling remove for each of them.
+        Raises ValueError and keeps the list when a card is not in it.
+        """
+        to_remove = Counter(cards)
+        for card, count in to_remove.items():
+            if self.counts[card] < count:
+                raise ValueError(f'{card} not in list')
+        kept = []
+        for card in self:
+            if to_remove[card]:
+                to_remove[card] -= 1
+            else:
+                kept.append(card)
+        super().__setitem__(slice(None), kept)
+        self._removed(cards)
+
+
 class Hand(HandInterface):
     """
     Stores cards, draws and discards.
@@ -34,18 +142,29 @@ class Hand(HandInterface):
     def __init__(self, player_id: int, pile: DrawingAndTrashPile) -> None:
         self.playerID: int = player_id
         self.pile: DrawingAndTrashPile = pile
-        self.cards: List[Card] = []
+        self._cards: CardList = CardList()
         self.picked_cards: List[Card] = []
+        self.on_change: Optional[ChangeListener] = None
+
+    @property
+    def cards(self) -> 'CardList':
+        return self._cards
+
+    @cards.setter
+    def cards(self, cards: Iterable[Card]) -> None:
+        self._cards = CardList(cards)
 
     def pick_cards(self, positions: List[HandPosition]) -> Optional[List[Card]]:
         """
         Takes list of positions and creates list of cards that are in hand.
         This list is temporarily stored in self.picked_cards and returned.
+        A card can be picked only as many times as it is in hand.
         """
         self.picked_cards.clear()
+        counts = self._cards.counts
         for hand_pos in positions:
             card = hand_pos.get_card()
-            if card in self.cards:
+            if counts[card] > self.picked_cards.count(card):
                 self.picked_cards.append(card)
             else:
                 self.picked_cards.clear()
@@ -53,30 +172,39 @@ class Hand(HandInterface):
         return self.picked_cards
 
     def remove_picked_cards_and_redraw(self) -> None:
-        for card in self.picked_cards:
-            self.cards.remove(card)
-        self.cards.extend(self.pile.discard_and_redraw(self.picked_cards))
+        self._cards.remove_all(self.picked_cards)
+        drawn = self.pile.discard_and_redraw(self.picked_cards)
+        self.cards.extend(drawn)
+        if self.on_change:
+            self.on_change(HandRedrawn(self.playerID, tuple(self.picked_cards), tuple(drawn)))
         self.picked_cards.clear()
 
     def draw_new_cards(self) -> None:
         """
-        Used at the beginning of game, draws 5 cards.
+        Used at the beginning of game, draws 5 cards. The list of cards is reused.
         """
-        self.cards = self.pile.deal_cards(5)
+        self.picked_cards.clear()
+        self._cards.clear()
+        self._cards.extend(self.pile.deal_cards(5))
 
     def has_card_of_type(self, card_type: CardType) -> Optional[HandPosition]:
         self.picked_cards.clear()
-        for card in self.cards:
+        if not self._cards.type_counts[card_type]:
+            return None
+        for card in self._cards:
             if card_type == card.type:
                 self.picked_cards.append(card)
                 return HandPosition(card, self.playerID)
         return None
 
     def get_cards(self) -> List[Card]:
-        return self.cards
+        return self._cards
 
     def set_cards(self, cards: List[Card]) -> None:
-        self.cards = cards[:]
+        self.cards = cards
 
     def __contains__(self, item: Card) -> bool:
-        return item in self.cards
+        return item in self._cards
+
+    def encode(self) -> bytearray:
+        return encode_cards(self.cards)
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import time
+from typing import List, Optional
+
+from server import GameServer
+
+
+class LoadReport:
+    def __init__(self) -> None:
+        self.moves = 0
+        self.games = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.latencies: List[int] = []          # ns of round trips of play commands
+
+    def percentile(self, q: float) -> float:
+        """
+        Round trip latency in microseconds.
+        """
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)] / 1000
+
+    def moves_per_second(self) -> float:
+        return self.moves / self.seconds if self.seconds else 0.0
+
+    def __repr__(self) -> str:
+        return (f'moves: {self.moves}, games: {self.games}, errors: {self.errors}, '
+                f'{self.moves_per_second():.0f} moves/s\n'
+                f'round trip p50: {self.percentile(0.5):.0f} us, p99: {self.percentile(0.99):.0f} us')
+
+
+class Client:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.reader = reader
+        self.writer = writer
+
+    async def request(self, line: str) -> str:
+        self.writer.write(line.encode() + b'\n')
+        while True:
+            response = (await self.reader.readline()).decode().rstrip('\n')
+            if not response:
+                raise ConnectionError('server closed the connection')
+            if not response.startswith('event '):       # notifications may come before the response
+                return response
+
+
+async def _drive(client: Client, tables: int, players: int, moves: int, rng: random.Random,
+                 report: LoadReport) -> None:
+    """
+    Plays random moves round robin on the client's tables, a finished game is replaced by a new one.
+    """
+    ids = []
+    for _ in range(tables):
+        ids.append((await client.request(f'new {players} {rng.getrandbits(32)}')).split()[1])
+        await client.request(f'watch {ids[-1]}')
+    turn = {table: 1 for table in ids}
+    for i in range(moves):
+        table = ids[i % tables]
+        response = await client.request(f'moves {table} {turn[table]}')
+        commands = [command for command in response[3:].split(',') if command]
+        if not commands:
+            report.games += 1
+            await client.request(f'close {table}')
+            new = (await client.request(f'new {players} {rng.getrandbits(32)}')).split()[1]
+            ids[i % tables] = new
+            turn[new] = 1
+            continue
+        start = time.perf_counter_ns()
+        response = await client.request(f'play {table} {turn[table]} {rng.choice(commands)}')
+        report.latencies.append(time.perf_counter_ns() - start)
+        if response.startswith('ok'):
+            report.moves += 1
+            turn[table] = turn[table] % players + 1
+        else:
+            report.errors += 1
+
+
+async def run_load(host: str, port: int, connections: int = 50, tables: int = 20, players: int = 2,
+                   moves: int = 200, seed: int = 0, unix: Optional[str] = None) -> LoadReport:
+    """
+    Opens connections, every one creates its tables and plays moves on them.
+    """
+    report = LoadReport()
+    rng = random.Random(seed)
+    clients = []
+    for _ in range(connections):
+        if unix:
+            streams = await asyncio.open_unix_connection(unix)
+        else:
+            streams = await asyncio.open_connection(host, port)
+        clients.append(Client(*streams))
+    start = time.perf_counter()
+    await asyncio.gather(*(_drive(client, tables, players, moves, random.Random(rng.getrandbits(32)), report)
+                           for client in clients))
+    report.seconds = time.perf_counter() - start
+    for client in clients:
+        client.writer.close()
+        await client.writer.wait_closed()
+    return report
+
+
+async def _local(args: argparse.Namespace) -> None:
+    game_server = GameServer(max_tables=args.connections * args.tables + args.connections)
+    server = await game_server.start(args.host, 0)
+    port = server.sockets[0].getsockname()[1]
+    print(await run_load(args.host, port, args.connections, args.tables, args.players, args.moves, args.seed))
+    print('server:', game_server.stats())
+    await game_server.close()
+    await asyncio.sleep(0)          # lets handlers of closed connections finish
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description='Plays random moves on a game server and measures latency.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=7070)
+    parser.add_argument('--unix', default=None)
+    parser.add_argument('--local', action='store_true', help='start a server in this process')
+    parser.add_argument('-c', '--connections', type=int, default=50)
+    parser.add_argument('-t', '--tables', type=int, default=20, help='tables per connection')
+    parser.add_argument('-p', '--players', type=int, default=2, choices=range(2, 6))
+    parser.add_argument('-m', '--moves', type=int, default=200, help='moves per connection')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    if args.local:
+        asyncio.run(_local(args))
+    else:
+        print(asyncio.run(run_load(args.host, args.port, args.connections, args.tables, args.players,
+                                   args.moves, args.seed, args.unix)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+from __future__ import annotations
+
+import math
+import random
+import time
+from collections import Counter
+from multiprocessing import Pool
+from typing import Dict, List, Optional, Tuple
+
+from adaptor import GameAdaptor, GamePlayerInterface
+from cards import Card
+from moves import Move
+from piles import deck
+from snapshot import GameSnapshot
+
+# moves are identified by the cards they use, not by their positions, positions differ between determinizations
+MoveKey = Tuple[Tuple[int, ...], Optional[int], Optional[Tuple[int, int]]]
+
+
+def move_key(cards: Tuple[Card, ...], move: Move) -> MoveKey:
+    return tuple(sorted(cards[i].code for i in move.hand)), move.sleeping, move.awoken
+
+
+class Node:
+    __slots__ = ('parent', 'key', 'player', 'children', 'visits', 'availability', 'wins')
+
+    def __init__(self, parent: Optional[Node], key: Optional[MoveKey], player: Optional[int]) -> None:
+        self.parent = parent
+        self.key = key
+        self.player = player            # the player who made the move leading to this node
+        self.children: Dict[MoveKey, Node] = {}
+        self.visits = 0
+        self.availability = 0
+        self.wins = 0.0
+
+    def ucb(self, exploration: float) -> float:
+        return self.wins / self.visits + exploration * math.sqrt(math.log(self.availability) / self.visits)
+
+
+def determinize(snapshot: GameSnapshot, observer: int, rng: random.Random) -> GameSnapshot:
+    """
+    Deals cards the observer has not seen (everything except his hand and the trash pile)
+    to the other players' hands and the draw pile at random.
+    """
+    unseen = Counter(deck)
+    unseen.subtract(snapshot.hands[observer])
+    unseen.subtract(snapshot.get_trash_pile())
+    cards = list(unseen.elements())
+    rng.shuffle(cards)
+    hands = list(snapshot.hands)
+    for player, hand in enumerate(hands):
+        if player != observer:
+            hands[player], cards = tuple(cards[:len(hand)]), cards[len(hand):]
+    return snapshot._replace(hands=tuple(hands), draw_pile=tuple(cards), draw_size=len(cards))
+
+
+def rollout(snapshot: GameSnapshot, rng: random.Random, max_moves: int) -> GameSnapshot:
+    for _ in range(max_moves):
+        moves = snapshot.legal_moves()
+        if not moves:
+            break
+        snapshot = snapshot.play(rng.choice(moves), rng)
+    return snapshot
+
+
+class Search:
+    """
+    Single observer information set MCTS: every iteration samples a determinization
+    and walks the tree only through moves that are legal in it.
+    """
+    def __init__(self, observer: int, exploration: float = 0.7, max_rollout: int = 200,
+                 rng: Optional[random.Random] = None) -> None:
+        self.observer = observer
+        self.exploration = exploration
+        self.max_rollout = max_rollout
+        self.rng = rng or random.Random()
+        self.root = Node(None, None, None)
+
+    def iterate(self, snapshot: GameSnapshot) -> None:
+        rng = self.rng
+        state = determinize(snapshot, self.observer, rng)
+        node = self.root
+        while state.winner is None:
+            moves = state.legal_moves()
+            if not moves:
+                break
+            hand = state.hands[state.on_turn]
+            by_key = {move_key(hand, move): move for move in moves}
+            untried = [key for key in by_key if key not in node.children]
+            for key in by_key:
+                if key in node.children:
+                    node.children[key].availability += 1
+            if untried:
+                key = rng.choice(untried)
+                child = node.children[key] = Node(node, key, state.on_turn)
+                child.availability = 1
+                state = state.play(by_key[key], rng)
+                node = child
+                break
+            node = max((node.children[key] for key in by_key), key=lambda n: n.ucb(self.exploration))
+            state = state.play(by_key[node.key], rng)
+        state = rollout(state, rng, self.max_rollout)
+        share = 1 / state.get_number_of_players()       # unfinished games are a draw
+        while node is not None:
+            node.visits += 1
+            if node.player is not None:
+                node.wins += share if state.winner is None else float(state.winner == node.player)
+            node = node.parent
+
+    def run(self, snapshot: GameSnapshot, rollouts: Optional[int], deadline: Optional[float]) -> int:
+        done = 0
+        while (rollouts is None or done < rollouts) and (deadline is None or time.perf_counter() < deadline):
+            self.iterate(snapshot)
+            done += 1
+        return done
+
+    def descend(self, keys: List[MoveKey]) -> bool:
+        """
+        Moves the root along moves that were played, returns False if the subtree does not exist.
+        """
+        node = self.root
+        for key in keys:
+            if key not in node.children:
+                return False
+            node = node.children[key]
+        node.parent = None
+        self.root = node
+        return True
+
+
+def _search_task(args: Tuple[GameSnapshot, int, Optional[int], Optional[float], int]) -> Tuple[Dict, int]:
+    snapshot, observer, rollouts, seconds, seed = args
+    search = Search(observer, rng=random.Random(seed))
+    deadline = time.perf_counter() + seconds if seconds is not None else None
+    done = search.run(snapshot, rollouts, deadline)
+    return {key: (child.visits, child.wins) for key, child in search.root.children.items()}, done
+
+
+class MCTSStats:
+    def __init__(self) -> None:
+        self.searches = 0
+        self.rollouts = 0
+        self.seconds = 0.0
+        self.reused_searches = 0        # searches that started from a subtree of the previous one
+        self.reused_visits = 0          # visits inherited from the previous search
+
+    def rollouts_per_second(self) -> float:
+        return self.rollouts / self.seconds if self.seconds else 0.0
+
+    def __repr__(self) -> str:
+        return (f'searches: {self.searches}, rollouts: {self.rollouts}, {self.rollouts_per_second():.0f} rollouts/s, '
+                f'reused searches: {self.reused_searches}, reused visits: {self.reused_visits}')
+
+
+class MCTSPlayer(GamePlayerInterface):
+    """
+    Plays for the bot seats of a game. A command with no cards for a bot seat lets the bot choose the move,
+    other commands are passed to the adaptor. Budget is a number of rollouts or milliseconds per move.
+    With more processes every process searches its own tree and root statistics are summed (root parallelism),
+    a single process keeps its tree between moves.
+    """
+    def __init__(self, adaptor: GameAdaptor, bots: List[int], rollouts: Optional[int] = 1000,
+                 time_ms: Optional[int] = None, processes: int = 1, seed: Optional[int] = None) -> None:
+        self.adaptor = adaptor
+        self.bots = bots                # indices of seats played by the bot, from 0
+        self.rollouts = rollouts if time_ms is None else None
+        self.time_ms = time_ms
+        self.processes = processes
+        self.rng = random.Random(seed)
+        self.stats = MCTSStats()
+        self._pool = None
+        self._searches: Dict[int, Search] = {}
+        self._history: Dict[int, List[MoveKey]] = {bot: [] for bot in bots}
+
+    def play(self, player: str, cards: str):
+        game = self.adaptor.game
+        player_index = int(player) - 1
+        if not cards.strip() and player_index in self.bots:
+            move = self.choose(player_index)
+            if move is None:
+                return None
+            return self._play(player_index, move)
+        hand = tuple(game.players[player_index].hand.get_cards())
+        result = self.adaptor.play(player, cards)
+        if result is not None:
+            move = Move.parse(cards)
+            self._record(move_key(hand, move) if move else None)
+        return result
+
+    def _play(self, player_index: int, move: Move):
+        game = self.adaptor.game
+        key = move_key(tuple(game.players[player_index].hand.get_cards()), move)
+        result = game.play(player_index, move.positions(game, player_index))
+        if result is not None:
+            self._record(key)
+        return result
+
+    def _record(self, key: Optional[MoveKey]) -> None:
+        for bot, history in self._history.items():
+            if key is None:
+                self._searches.pop(bot, None)       # unknown move, the tree cannot be reused
+                history.clear()
+            else:
+                history.append(key)
+
+    def choose(self, player_index: int) -> Optional[Move]:
+        game = self.adaptor.game
+        moves = game.legal_moves(player_index)
+        if not moves:
+            return None
+        snapshot = game.fork()
+        start = time.perf_counter()
+        seconds = self.time_ms / 1000 if self.time_ms is not None else None
+        if self.processes > 1:
+            visits, done = self._parallel(snapshot, player_index, seconds)
+        else:
+            visits, done = self._serial(snapshot, player_index, seconds)
+        self.stats.searches += 1
+        self.stats.rollouts += done
+        self.stats.seconds += time.perf_counter() - start
+        hand = tuple(game.players[player_index].hand.get_cards())
+        return max(moves, key=lambda move: visits.get(move_key(hand, move), 0))
+
+    def _serial(self, snapshot: GameSnapshot, player_index: int, seconds: Optional[float]) -> Tuple[Dict, int]:
+        search = self._searches.get(player_index)
+        if search is not None and search.descend(self._history[player_index]):
+            self.stats.reused_searches += 1
+            self.stats.reused_visits += sum(child.visits for child in search.root.children.values())
+        else:
+            search = self._searches[player_index] = Search(player_index, rng=self.rng)
+        self._history[player_index].clear()
+        deadline = time.perf_counter() + seconds if seconds is not None else None
+        done = search.run(snapshot, self.rollouts, deadline)
+        return {key: child.visits for key, child in search.root.children.items()}, done
+
+    def _parallel(self, snapshot: GameSnapshot, player_index: int, seconds: Optional[float]) -> Tuple[Dict, int]:
+        if self._pool is None:
+            self._pool = Pool(self.processes)
+        rollouts = -(-self.rollouts // self.processes) if self.rollouts is not None else None
+        tasks = [(snapshot, player_index, rollouts, seconds, self.rng.getrandbits(32)) for _ in range(self.processes)]
+        visits: Counter = Counter()
+        done = 0
+        for children, count in self._pool.map(_search_task, tasks):
+            for key, (child_visits, _) in children.items():
+                visits[key] += child_visits
+            done += count
+        return visits, done
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+from functools import lru_cache
+from itertools import combinations
+from typing import List, NamedTuple, Optional, Sequence, Tuple, TYPE_CHECKING
+
+from cards import Card, CardType, Queen
+from positions import Position, HandPosition, SleepingQueenPosition, AwokenQueenPosition
+
+if TYPE_CHECKING:
+    from game import Game
+
+
+# indices of cards in hand, indices of sleeping queens and (playerID, index) of awoken queens, all from 0
+Command = Tuple[Tuple[int, ...], Tuple[int, ...], Tuple[Tuple[int, int], ...]]
+
+
+@lru_cache(maxsize=4096)
+def compile_command(command: str) -> Optional[Command]:
+    """
+    Parses a command like 'h3 a21 s8' once, later calls with the same string are answered from the cache.
+    Indices can have more digits, the player of an awoken queen has one ('a312' is 12. queen of playerID 3).
+    Returns None for a malformed command.
+    """
+    hand: List[int] = []
+    sleeping: List[int] = []
+    awoken: List[Tuple[int, int]] = []
+    for part in command.split():
+        kind, digits = part[0], part[1:]
+        if not digits or not all('0' <= digit <= '9' for digit in digits):
+            return None
+        if kind == 'h':
+            hand.append(int(digits) - 1)
+        elif kind == 's':
+            sleeping.append(int(digits) - 1)
+        elif kind == 'a' and len(digits) > 1:
+            awoken.append((int(digits[0]) - 1, int(digits[1:]) - 1))
+        else:
+            return None
+    if any(i < 0 for i in hand + sleeping) or any(p < 0 or i < 0 for p, i in awoken):
+        return None
+    return tuple(hand), tuple(sleeping), tuple(awoken)
+
+
+class Move(NamedTuple):
+    hand: Tuple[int, ...]                       # indices of cards in hand, from 0
+    sleeping: Optional[int] = None              # index of sleeping queen woken by a king
+    awoken: Optional[Tuple[int, int]] = None    # playerID and index of attacked awoken queen
+
+    def command(self) -> str:
+        """
+        Command for GameAdaptor.play, e.g. 'h1 s3' or 'h2 a21'.
+        """
+        parts = [f'h{i + 1}' for i in self.hand]
+        if self.sleeping is not None:
+            parts.append(f's{self.sleeping + 1}')
+        if self.awoken is not None:
+            parts.append(f'a{self.awoken[0] + 1}{self.awoken[1] + 1}')
+        return ' '.join(parts)
+
+    @classmethod
+    def parse(cls, command: str) -> Optional[Move]:
+        """
+        Inverse of command, None for malformed commands and commands with no card from hand.
+        """
+        compiled = compile_command(command)
+        if compiled is None or not compiled[0]:
+            return None
+        hand, sleeping, awoken = compiled
+        return cls(hand, sleeping[0] if sleeping else None, awoken[0] if awoken else None)
+
+    def positions(self, game: Game, playerID: int) -> List[Position]:
+        cards = game.players[playerID].hand.get_cards()
+        positions: List[Position] = [HandPosition(cards[i], playerID) for i in self.hand]
+        if self.sleeping is not None:
+            positions.append(SleepingQueenPosition(game.sleeping_queens[self.sleeping]))
+        if self.awoken is not None:
+            victim, index = self.awoken
+            positions.append(AwokenQueenPosition(game.players[victim].awoken_queens[index], victim))
+        return positions
+
+
+# subset_table[n] lists all non-empty subsets of n positions with their size
+subset_table: List[Tuple[Tuple[int, ...], ...]] = [
+    tuple(subset for size in range(1, n + 1) for subset in combinations(range(n), size)) for n in range(6)]
+
+
+def is_valid_numbered(values: Sequence[int]) -> bool:
+    """
+    One card, a pair or an equation where the biggest card is the sum of the others.
+    """
+    return len(values) == 1 or 2 * max(values) == sum(values)
+
+
+@lru_cache(maxsize=4096)
+def numbered_subsets(values: Tuple[int, ...]) -> Tuple[Tuple[int, ...], ...]:
+    """
+    Valid sets of numbered cards for a hand, values has 0 at positions of other cards.
+    Sets with the same values are listed only once, equal cards are taken from the first positions.
+    """
+    found = []
+    for subset in subset_table[len(values)]:
+        picked = [values[i] for i in subset]
+        if 0 in picked or not is_valid_numbered(picked):
+            continue
+        if all(j in subset for i in subset for j in range(i) if values[j] == values[i]):
+            found.append(subset)
+    return tuple(found)
+
+
+def legal_moves(playerID: int, cards: Sequence[Card], sleeping_queens: Sequence[Optional[Queen]],
+                awoken_queens: Sequence[Sequence[Optional[Queen]]]) -> List[Move]:
+    """
+    Lists every valid play of a player, identical cards are played only from their first position.
+    Attacks target only queens of other players.
+    """
+    moves: List[Move] = []
+    values = tuple(card.get_points() if card.type == CardType.NUMBER else 0 for card in cards)
+    seen_types = set()
+    for i, card in enumerate(cards):
+        if card.type in seen_types:
+            continue
+        seen_types.add(card.type)
+        if card.type == CardType.KING:
+            moves.extend(Move((i,), sleeping=s) for s, queen in enumerate(sleeping_queens) if queen)
+        elif card.type in (CardType.KNIGHT, CardType.POTION):
+            moves.extend(Move((i,), awoken=(p, q)) for p, queens in enumerate(awoken_queens) if p != playerID
+                         for q, queen in enumerate(queens) if queen)
+    moves.extend(Move(subset) for subset in numbered_subsets(values))
+    return moves
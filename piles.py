@@ -1,73 +1,190 @@
-from random import shuffle
-from typing import List, Callable
+from __future__ import annotations
 
-from cards import Card, CardType
+import random
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+
+from cards import Card, CardType, encode_cards
 
 number_of_cards = {
     CardType.NUMBER: 4, CardType.KING: 8, CardType.KNIGHT: 4, CardType.POTION: 4, CardType.DRAGON: 3, CardType.WAND: 3
 }
 
+# the whole deck in a fixed order, cards are interned so every game shares the same instances
+deck: Tuple[Card, ...] = tuple(
+    [Card(CardType.NUMBER, i) for i in range(1, 11) for _ in range(number_of_cards[CardType.NUMBER])] +
+    [Card(card_type) for card_type in CardType if card_type != CardType.NUMBER
+     for _ in range(number_of_cards[card_type])])
+
+
+class CardBuffer:
+    """
+    Stack of cards in a preallocated list, the top of the stack is at the cursor.
+    Taking and putting k cards costs O(k), slots above the cursor are never read.
+    Supports the list operations that are used on piles (indexing, slicing, comparing with lists).
+    Counter writes changes whenever a slot is written, rewrites whenever cards are removed or reordered,
+    snapshots use them to find out whether their copy of the pile is still valid.
+    """
+    __slots__ = ('_cards', '_size', 'writes', 'rewrites')
+
+    def __init__(self, capacity: int, cards: Iterable[Card] = ()) -> None:
+        self._cards: List[Optional[Card]] = [None] * capacity
+        self._size: int = 0
+        self.writes: int = 0
+        self.rewrites: int = 0
+        self.extend(cards)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[Card]:
+        return iter(self._cards[:self._size])
+
+    def __getitem__(self, index: Union[int, slice]):
+        if isinstance(index, slice):
+            if index.step is not None and index.step < 0:
+                return self._cards[:self._size][index]
+            return self._cards[slice(*index.indices(self._size))]       # copies only the sliced cards
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError('pile index out of range')
+        return self._cards[index]
+
+    def __setitem__(self, index: Union[int, slice], value) -> None:
+        cards = self._cards[:self._size]
+        cards[index] = value
+        self._size = 0
+        self.rewrites += 1
+        self.extend(cards)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, CardBuffer):
+            other = other[:]
+        return self._cards[:self._size] == other
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return ', '.join(map(str, self))
+
+    def append(self, card: Card) -> None:
+        self.extend((card,))
+
+    def extend(self, cards: Iterable[Card]) -> None:
+        if not isinstance(cards, (list, tuple)):
+            cards = list(cards)
+        end = self._size + len(cards)
+        if end > len(self._cards):
+            self._cards.extend([None] * (end - len(self._cards)))
+        self._cards[self._size:end] = cards
+        self._size = end
+        self.writes += 1
+
+    def take(self, n: int) -> List[Card]:
+        """
+        Removes n cards from the top and returns them in the order they were in the pile.
+        """
+        start = max(self._size - n, 0)
+        taken = self._cards[start:self._size]
+        self._size = start
+        self.rewrites += 1
+        return taken
+
+    def clear(self) -> None:
+        self._size = 0
+        self.rewrites += 1
+
+    def shuffle(self, rng: Optional[random.Random] = None) -> None:
+        """
+        Shuffles the cards in place, the permutation is the same as random.shuffle would make with rng
+        (the random module when rng is None).
+        """
+        self.writes += 1
+        self.rewrites += 1
+        cards = self._cards[:self._size]
+        (rng or random).shuffle(cards)
+        self._cards[:self._size] = cards
+
 
 class StrategyInterface:
     @staticmethod
-    def not_enough_cards(to_discard: List[Card], draw_pile: List[Card], trash_pile: List[Card],
-                         discard: Callable, draw: Callable) -> List[Card]:
+    def not_enough_cards(pile: DrawingAndTrashPile, to_discard: List[Card]) -> List[Card]:
         return [Card(CardType.NUMBER)]
 
 
 class Strategy1(StrategyInterface):
     @staticmethod
-    def not_enough_cards(to_discard: List[Card], draw_pile: List[Card], trash_pile: List[Card],
-                         discard: Callable, draw: Callable) -> List[Card]:
+    def not_enough_cards(pile: DrawingAndTrashPile, to_discard: List[Card]) -> List[Card]:
         """
         Version 1:
         When there are not enough cards, the playerID throws his cards,
         draws what he can and then shuffles the discard pile and draw remaining cards.
         """
-        in_draw_pile = len(draw_pile)
-        discard(to_discard)
-        to_draw = draw(in_draw_pile)
-        shuffle(trash_pile)
-        draw_pile[:] = trash_pile[:]
-        trash_pile.clear()
-        to_draw.extend(draw(len(to_discard) - in_draw_pile))
+        in_draw_pile = len(pile.draw_pile)
+        pile.discard(to_discard)
+        to_draw = pile.draw(in_draw_pile)
+        pile.trash_pile.shuffle(pile.rng)
+        pile.draw_pile, pile.trash_pile = pile.trash_pile, pile.draw_pile       # the empty buffer becomes trash
+        to_draw.extend(pile.draw(len(to_discard) - in_draw_pile))
         return to_draw
 
 
 class Strategy2(StrategyInterface):
     @staticmethod
-    def not_enough_cards(to_discard: List[Card], draw_pile: List[Card], trash_pile: List[Card],
-                         discard: Callable, draw: Callable) -> List[Card]:
+    def not_enough_cards(pile: DrawingAndTrashPile, to_discard: List[Card]) -> List[Card]:
         """
         Version 2:
         If there are not enough cards in the deck, shuffle the discard pile and put it under the deck,
         then discard used cards and draw cards.
         """
-        shuffle(trash_pile)
-        draw_pile[:] = trash_pile[:] + draw_pile[:]
-        trash_pile.clear()
-        discard(to_discard)
-        return draw(len(to_discard))
+        pile.trash_pile.shuffle(pile.rng)
+        pile.trash_pile.extend(pile.draw(len(pile.draw_pile)))     # only the few remaining cards are moved
+        pile.draw_pile, pile.trash_pile = pile.trash_pile, pile.draw_pile
+        pile.discard(to_discard)
+        return pile.draw(len(to_discard))
 
 
 class DrawingAndTrashPile:
-    def __init__(self, strategy: StrategyInterface) -> None:
-        self.draw_pile: List[Card] = []         # cards will be drawn from the end of list
-        self.trash_pile: List[Card] = []
+    def __init__(self, strategy: StrategyInterface, rng: Optional[random.Random] = None) -> None:
+        self.draw_pile: CardBuffer = CardBuffer(len(deck), deck)         # cards will be drawn from the end
+        self.trash_pile: CardBuffer = CardBuffer(len(deck))
         self.strategy = strategy
+        self.rng = rng              # used for all shuffles, None for the random module
+        self.draw_pile.shuffle(rng)
 
-        for card_type in CardType:      # generating the deck of cards
-            if card_type == CardType.NUMBER:
-                self.draw_pile += [Card(card_type, i) for i in range(1, 11) for _ in range(number_of_cards[card_type])]
-            else:
-                self.draw_pile += [Card(card_type) for _ in range(number_of_cards[card_type])]
-        shuffle(self.draw_pile)
+    @classmethod
+    def from_cards(cls, strategy: StrategyInterface, draw_pile: Iterable[Card],
+                   trash_pile: Iterable[Card], rng: Optional[random.Random] = None) -> DrawingAndTrashPile:
+        """
+        Creates pile with given cards without shuffling.
+        """
+        pile = cls.__new__(cls)
+        pile.draw_pile = CardBuffer(len(deck), draw_pile)
+        pile.trash_pile = CardBuffer(len(deck), trash_pile)
+        pile.strategy = strategy
+        pile.rng = rng
+        return pile
+
+    def reset(self) -> None:
+        """
+        Puts the whole deck back into the existing draw pile and shuffles it, like a new pile.
+        """
+        self.trash_pile.clear()
+        self.draw_pile.clear()
+        self.draw_pile.extend(deck)
+        self.draw_pile.shuffle(self.rng)
 
     def __repr__(self):
-        return ', '.join(map(str, self.draw_pile))
+        return repr(self.draw_pile)
+
+    def encode(self) -> Tuple[bytearray, bytearray]:
+        """
+        Returns codes of cards in draw pile and trash pile.
+        """
+        return encode_cards(self.draw_pile), encode_cards(self.trash_pile)
 
     def deal_cards(self, n: int) -> List[Card]:
-        return self._draw(n)
+        return self.draw(n)
 
     def discard_and_redraw(self, to_discard: List[Card]) -> List[Card]:
         """
@@ -75,14 +192,14 @@ class DrawingAndTrashPile:
         """
         in_draw_pile = len(self.draw_pile)
         if len(to_discard) >= in_draw_pile:         # there are not enough cards in the draw pile
-            return self.strategy.not_enough_cards(to_discard, self.draw_pile, self.trash_pile, self._draw, self.discard)
+            return self.strategy.not_enough_cards(self, to_discard)
         self.discard(to_discard)
-        return self._draw(len(to_discard))
+        return self.draw(len(to_discard))
 
     def discard(self, to_discard: List[Card]):
         self.trash_pile.extend(to_discard)
 
-    def _draw(self, n: int) -> List[Card]:
-        to_draw = self.draw_pile[-n:]
-        self.draw_pile = self.draw_pile[:-n]
-        return to_draw
+    def draw(self, n: int) -> List[Card]:
+        if n <= 0:
+            return []
+        return self.draw_pile.take(n)
@@ -6,6 +6,7 @@ from cards import Card, Queen, CardType
 from positions import HandPosition, SleepingQueenPosition, AwokenQueenPosition, Position, QueenCollectionInterface
 from hand import HandInterface
 from evaluate import EvaluateAttackInterface, MoveQueenInterface
+from moves import is_valid_numbered
 
 
 class PlayerState:
@@ -79,19 +80,15 @@ class Player:
         Checks if current move is valid according to game rules.
         """
         cards = self.picked_numbered_cards
-        count = len(cards)
-        if count == 1 or (count == 2 and cards[0].get_points() == cards[1].get_points()):
-            return True
-        values = sorted(list(map(lambda x: x.get_points(), cards)))
-        if sum(values[:-1], ) == values[-1]:
-            return True
-        return False
+        if not cards:
+            return False
+        return is_valid_numbered([card.get_points() for card in cards])
 
     def remove_queen(self, queen: Queen) -> None:
-        self.awoken_queens.remove_queen(queen)
+        self.move_queen.remove(queen, self.awoken_queens)
 
     def add_queen(self, queen: Queen) -> None:
-        self.awoken_queens.add_queen(queen)
+        self.move_queen.add(queen, self.awoken_queens)
 
     def count_points(self) -> int:
         return self.awoken_queens.count_points()
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import weakref
+from typing import Dict, List, Optional
+
+from adaptor import GameAdaptor
+
+
+class PoolStats:
+    def __init__(self) -> None:
+        self.created = 0        # games built by GameAdaptor
+        self.reused = 0         # games reset instead of being built
+        self.released = 0
+        self.discarded = 0      # released games that did not fit into the pool
+
+    def reuse_rate(self) -> float:
+        acquired = self.created + self.reused
+        return self.reused / acquired if acquired else 0.0
+
+    def __repr__(self) -> str:
+        return (f'created: {self.created}, reused: {self.reused}, released: {self.released}, '
+                f'discarded: {self.discarded}, reuse rate: {self.reuse_rate():.3f}')
+
+
+class GamePool:
+    """
+    Hands out games and takes them back. A released game is kept (at most max_size games for every number
+    of players) and the next acquire resets it in place instead of building a new one.
+    Only games that are checked out can be released, so a game is never handed out twice.
+    Checked out games are referenced weakly, a game that is never released is freed when it is dropped.
+    """
+    def __init__(self, max_size: int = 64) -> None:
+        self.max_size = max_size
+        self._free: Dict[int, List[GameAdaptor]] = {}
+        self._checked_out: weakref.WeakSet[GameAdaptor] = weakref.WeakSet()
+        self.stats = PoolStats()
+
+    def acquire(self, number_of_players: int, seed: Optional[int] = None) -> GameAdaptor:
+        free = self._free.get(number_of_players)
+        if free:
+            adaptor = free.pop()
+            adaptor.reset(seed)
+            self.stats.reused += 1
+        else:
+            adaptor = GameAdaptor(number_of_players, seed)
+            self.stats.created += 1
+        self._checked_out.add(adaptor)
+        return adaptor
+
+    def release(self, adaptor: GameAdaptor) -> None:
+        if adaptor not in self._checked_out:
+            raise ValueError('the game is not checked out from this pool')
+        self._checked_out.remove(adaptor)
+        self.stats.released += 1
+        free = self._free.setdefault(adaptor.game.get_number_of_players(), [])
+        if len(free) >= self.max_size:
+            self.stats.discarded += 1
+            return
+        free.append(adaptor)
+
+    def __len__(self) -> int:
+        return sum(len(free) for free in self._free.values())
+
+    def clear(self) -> None:
+        self._free.clear()
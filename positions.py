@@ -1,21 +1,56 @@
 from __future__ import annotations
 
-from typing import Union, Optional, List
-from cards import Card, Queen
+from heapq import heappop, heappush
+from typing import Dict, Union, Optional, List, Tuple
+from cards import EMPTY_QUEEN, Card, Queen
+
+EMPTY_SLOT = 0xFF       # code of an empty slot in encoded queen collection
 
 
 class SleepingQueenPosition:
-    def __init__(self, card: Queen, playerID: Optional[int] = None) -> None:
-        self._card = card
+    """
+    Positions are interned like cards, there is one object for every (card, playerID),
+    so equal positions are identical and hash by value. There are at most a few hundred of them.
+    """
+    __slots__ = ('_card',)
+    _interned: Dict[Queen, SleepingQueenPosition] = {}
+
+    def __new__(cls, card: Queen, playerID: Optional[int] = None) -> SleepingQueenPosition:
+        position = cls._interned.get(card)
+        if position is None:
+            position = object.__new__(cls)
+            position._card = card
+            cls._interned[card] = position
+        return position
+
+    def __reduce__(self):
+        return SleepingQueenPosition, (self._card,)
+
+    def __hash__(self) -> int:
+        return hash(self._card)
 
     def get_card(self) -> Queen:
         return self._card
 
 
 class AwokenQueenPosition:
-    def __init__(self, card: Queen, playerID: int) -> None:
-        self._card = card
-        self._playerID = playerID
+    __slots__ = ('_card', '_playerID')
+    _interned: Dict[Tuple[Queen, int], AwokenQueenPosition] = {}
+
+    def __new__(cls, card: Queen, playerID: int) -> AwokenQueenPosition:
+        position = cls._interned.get((card, playerID))
+        if position is None:
+            position = object.__new__(cls)
+            position._card = card
+            position._playerID = playerID
+            cls._interned[(card, playerID)] = position
+        return position
+
+    def __reduce__(self):
+        return AwokenQueenPosition, (self._card, self._playerID)
+
+    def __hash__(self) -> int:
+        return hash((self._card, self._playerID))
 
     def get_card(self) -> Queen:
         return self._card
@@ -25,9 +60,23 @@ class AwokenQueenPosition:
 
 
 class HandPosition:
-    def __init__(self, card: Card, playerID: int) -> None:
-        self._card = card
-        self._playerID = playerID
+    __slots__ = ('_card', '_playerID')
+    _interned: Dict[Tuple[Card, int], HandPosition] = {}
+
+    def __new__(cls, card: Card, playerID: int) -> HandPosition:
+        position = cls._interned.get((card, playerID))
+        if position is None:
+            position = object.__new__(cls)
+            position._card = card
+            position._playerID = playerID
+            cls._interned[(card, playerID)] = position
+        return position
+
+    def __reduce__(self):
+        return HandPosition, (self._card, self._playerID)
+
+    def __hash__(self) -> int:
+        return hash((self._card, self._playerID))
 
     def get_card(self) -> Card:
         return self._card
@@ -49,15 +98,24 @@ class QueenCollectionInterface:
     def remove_queen(self, queen: Queen) -> Optional[Queen]:
         pass
 
+    def clear(self) -> None:
+        pass
+
     def __contains__(self, item: Union[Card, Queen]) -> bool:
         return False
 
     def __getitem__(self, index: int) -> Optional[Queen]:
-        return Queen('', 0)
+        return EMPTY_QUEEN
 
     def get_queens(self) -> List[Optional[Queen]]:
         return []
 
+    def get_playerID(self) -> Optional[int]:
+        return None
+
+    def index_of(self, queen: Queen) -> Optional[int]:
+        return None
+
     def count_queens(self) -> int:
         return 0
 
@@ -69,26 +127,48 @@ class QueenCollectionInterface:
 
 
 class QueenCollection(QueenCollectionInterface):
+    """
+    Queens stay at their index until they are removed (commands address them by index),
+    an added queen takes the lowest free index. Every operation is O(1) or O(log n).
+    """
     def __init__(self, playerID: Optional[int] = None) -> None:
         self.queens: List[Optional[Queen]] = []
         self.playerID = playerID
+        self._free: List[int] = []              # heap of indices of empty slots
+        self._index: Dict[Queen, int] = {}
+        self._points: int = 0
+        self.version: int = 0           # changes with every modification
 
     def add_queen(self, queen: Queen) -> None:
-        for i in range(len(self.queens)):
-            if self.queens[i] is None:
-                self.queens[i] = queen
-                return
-        self.queens.append(queen)
+        if self._free:
+            index = heappop(self._free)
+            self.queens[index] = queen
+        else:
+            index = len(self.queens)
+            self.queens.append(queen)
+        self._index[queen] = index
+        self._points += queen.get_points()
+        self.version += 1
 
     def remove_queen(self, queen: Queen) -> Optional[Queen]:
-        if queen in self.queens:
-            index: int = self.queens.index(queen)
-            self.queens[index] = None
-            return queen
-        return None
+        index = self._index.pop(queen, None)
+        if index is None:
+            return None
+        self.queens[index] = None
+        heappush(self._free, index)
+        self._points -= queen.get_points()
+        self.version += 1
+        return queen
+
+    def clear(self) -> None:
+        self.queens.clear()
+        self._free.clear()
+        self._index.clear()
+        self._points = 0
+        self.version += 1
 
     def __contains__(self, item: Union[Card, Queen]) -> bool:
-        return item in self.queens
+        return item in self._index
 
     def __getitem__(self, index: int) -> Optional[Queen]:
         return self.queens[index]
@@ -96,11 +176,32 @@ class QueenCollection(QueenCollectionInterface):
     def get_queens(self) -> List[Optional[Queen]]:
         return self.queens
 
+    def get_playerID(self) -> Optional[int]:
+        return self.playerID
+
+    def index_of(self, queen: Queen) -> Optional[int]:
+        return self._index.get(queen)
+
     def count_queens(self) -> int:
-        return sum(map(lambda x: x is not None, self.queens))
+        return len(self._index)
 
     def count_points(self) -> int:
-        return sum([queen.get_points() for queen in self.queens if queen])
+        return self._points
 
     def is_empty(self):
-        return self.queens == [None for _ in range(len(self.queens))]
+        return not self._index
+
+    def encode(self) -> bytearray:
+        return bytearray(EMPTY_SLOT if queen is None else queen.code for queen in self.queens)
+
+    def decode(self, codes: bytes) -> None:
+        self.clear()
+        for index, code in enumerate(codes):
+            if code == EMPTY_SLOT:
+                self.queens.append(None)
+                self._free.append(index)        # indices are increasing, the list is a valid heap
+            else:
+                queen = Queen.from_code(code)
+                self.queens.append(queen)
+                self._index[queen] = index
+                self._points += queen.get_points()
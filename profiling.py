@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+import argparse
+import functools
+import json
+import random
+import sys
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, IO, List, Optional, Tuple, Union
+
+from adaptor import GameAdaptor
+from bench import play_random_game
+from evaluate import MoveQueen
+from game import Game
+from hand import Hand
+from piles import Strategy1, Strategy2
+from player import Player
+
+BUCKETS = 40        # bucket i counts calls that took from 2**i to 2**(i + 1) - 1 ns, the first one also 0 ns
+
+# methods instrumented by default, a name in the report is Class.method
+# Player.evaluate is bound to EvaluateAttack.evaluate in Player.__init__, it is wrapped as an instance attribute
+default_targets: List[Tuple[type, str]] = [
+    (Game, 'play'), (Player, 'play'), (Player, 'evaluate'), (MoveQueen, '_move'),
+    (Hand, 'remove_picked_cards_and_redraw'), (Strategy1, 'not_enough_cards'), (Strategy2, 'not_enough_cards'),
+]
+
+_active: Optional[Profiler] = None
+
+
+def _call(function: Callable, *args, **kwargs):
+    return function(*args, **kwargs)
+
+
+class _InstanceAttribute:
+    """
+    Stands on the class for a method that every object keeps in its own attribute. A data descriptor
+    of the class is found before the attribute of the object, so calls go through the timed wrapper.
+    """
+    def __init__(self, attribute: str, wrapper: Callable) -> None:
+        self.attribute = attribute
+        self.wrapper = wrapper          # takes the method of the object as the first argument
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        return functools.partial(self.wrapper, instance.__dict__[self.attribute])
+
+    def __set__(self, instance, value) -> None:
+        instance.__dict__[self.attribute] = value
+
+
+class CallStats:
+    """
+    Calls of one method: count, total and maximal time, a log2 histogram of times and the net number
+    of memory blocks the calls left allocated (counted only with allocations=True).
+    """
+    __slots__ = ('name', 'calls', 'total_ns', 'max_ns', 'histogram', 'blocks')
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.calls = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.histogram: List[int] = [0] * BUCKETS
+        self.blocks = 0
+
+    def add(self, ns: int, blocks: int = 0) -> None:
+        self.calls += 1
+        self.total_ns += ns
+        if ns > self.max_ns:
+            self.max_ns = ns
+        self.histogram[min(ns.bit_length() - 1, BUCKETS - 1) if ns else 0] += 1
+        self.blocks += blocks
+
+    def mean_ns(self) -> float:
+        return self.total_ns / self.calls if self.calls else 0.0
+
+    def percentile_ns(self, q: float) -> int:
+        """
+        Upper bound of the histogram bucket that holds the q-quantile.
+        """
+        rank = q * self.calls
+        seen = 0
+        for i, count in enumerate(self.histogram):
+            seen += count
+            if count and seen >= rank:
+                return min((1 << i + 1) - 1, self.max_ns)
+        return self.max_ns
+
+    def as_dict(self) -> dict:
+        return {'calls': self.calls, 'total_ns': self.total_ns, 'max_ns': self.max_ns,
+                'histogram': self.histogram, 'blocks': self.blocks}
+
+
+class Profiler:
+    """
+    Opt-in instrumentation of the engine. enable replaces the target methods on their classes with wrappers
+    that count calls and time them, disable puts the original methods back, so a disabled profiler leaves
+    no code in the game. A target that objects set in their own attribute gets a descriptor on the class
+    for the time the profiler is enabled. Only one profiler can be enabled at a time.
+    With trace=True the last max_events calls are kept for a Chrome trace (chrome://tracing, Perfetto).
+    With allocations=True every call also reads sys.getallocatedblocks, which makes calls slower.
+    """
+    def __init__(self, targets: Optional[List[Tuple[type, str]]] = None, trace: bool = False,
+                 allocations: bool = False, max_events: int = 1 << 20) -> None:
+        self.targets = list(targets if targets is not None else default_targets)
+        self.trace = trace
+        self.allocations = allocations
+        self.stats: Dict[str, CallStats] = {}
+        self.events: Deque[Tuple[str, int, int, int]] = deque(maxlen=max_events)    # name, start, ns, thread
+        self._originals: List[Tuple[type, str, Optional[object]]] = []      # None for instance attributes
+        self._origin = time.perf_counter_ns()
+
+    def __enter__(self) -> Profiler:
+        self.enable()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.disable()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._originals)
+
+    def enable(self) -> None:
+        global _active
+        if _active is self:
+            return
+        if _active is not None:
+            raise RuntimeError('another profiler is enabled')
+        _active = self
+        for cls, attribute in self.targets:
+            original = cls.__dict__.get(attribute)
+            name = f'{cls.__name__}.{attribute}'
+            stats = self.stats.get(name)
+            if stats is None:
+                stats = self.stats[name] = CallStats(name)
+            if original is None:
+                wrapper = _InstanceAttribute(attribute, self._wrap(_call, stats))
+            elif isinstance(original, staticmethod):
+                wrapper = staticmethod(self._wrap(original.__func__, stats))
+            else:
+                wrapper = self._wrap(original, stats)
+            self._originals.append((cls, attribute, original))
+            setattr(cls, attribute, wrapper)
+
+    def disable(self) -> None:
+        global _active
+        for cls, attribute, original in reversed(self._originals):
+            if original is None:
+                delattr(cls, attribute)
+            else:
+                setattr(cls, attribute, original)
+        self._originals.clear()
+        if _active is self:
+            _active = None
+
+    def _wrap(self, function: Callable, stats: CallStats) -> Callable:
+        clock = time.perf_counter_ns
+        add = stats.add
+        name = stats.name
+        events = self.events if self.trace else None
+        blocks = sys.getallocatedblocks if self.allocations else None
+        get_ident = threading.get_ident
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            before = blocks() if blocks is not None else 0
+            start = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                ns = clock() - start
+                add(ns, blocks() - before if blocks is not None else 0)
+                if events is not None:
+                    events.append((name, start, ns, get_ident()))
+        return wrapper
+
+    def reset(self) -> None:
+        for stats in self.stats.values():
+            stats.__init__(stats.name)
+        self.events.clear()
+        self._origin = time.perf_counter_ns()
+
+    def report(self) -> str:
+        lines = [f'{"method":40} {"calls":>9} {"mean us":>9} {"p50 us":>9} {"p99 us":>9} {"max us":>9} {"blocks":>8}']
+        for stats in sorted(self.stats.values(), key=lambda s: -s.total_ns):
+            lines.append(f'{stats.name:40} {stats.calls:9} {stats.mean_ns() / 1000:9.2f} '
+                         f'{stats.percentile_ns(0.5) / 1000:9.2f} {stats.percentile_ns(0.99) / 1000:9.2f} '
+                         f'{stats.max_ns / 1000:9.2f} {stats.blocks:8}')
+        return '\n'.join(lines)
+
+    def trace_events(self) -> List[dict]:
+        """
+        Recorded calls as complete events of the Chrome trace event format, times in microseconds.
+        """
+        origin = self._origin
+        return [{'name': name, 'cat': name.split('.')[0], 'ph': 'X', 'ts': (start - origin) / 1000,
+                 'dur': ns / 1000, 'pid': 1, 'tid': thread} for name, start, ns, thread in self.events]
+
+    def write_trace(self, file: Union[str, IO[str]]) -> None:
+        data = {'traceEvents': self.trace_events(), 'displayTimeUnit': 'ns',
+                'otherData': {name: stats.as_dict() for name, stats in self.stats.items()}}
+        if isinstance(file, str):
+            with open(file, 'w') as stream:
+                json.dump(data, stream)
+        else:
+            json.dump(data, file)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description='Plays random games with instrumented engine methods.')
+    parser.add_argument('-n', '--games', type=int, default=100)
+    parser.add_argument('-p', '--players', type=int, default=2, choices=range(2, 6))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--trace', default=None, help='file for the Chrome trace')
+    parser.add_argument('--allocations', action='store_true')
+    args = parser.parse_args(argv)
+    adaptor = GameAdaptor(args.players, args.seed)
+    with Profiler(trace=args.trace is not None, allocations=args.allocations) as profiler:
+        for seed in range(args.seed, args.seed + args.games):
+            adaptor.reset(seed)
+            play_random_game(adaptor, random.Random(seed))
+    print(profiler.report())
+    if args.trace:
+        profiler.write_trace(args.trace)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import struct
+from bisect import bisect_right
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+import codec
+from adaptor import GameAdaptor, GameFinished, GameFinishedAt, GamePlayerInterface
+from game import Game
+from moves import Move
+from snapshot import Goals, standard_goals
+
+MAGIC = b'SQM'
+VERSION = 2
+NONE = 0xFF
+
+# magic, version, number of players, pile strategy (index in codec.strategies), points and queens that win, seed
+HEADER = struct.Struct('<3sBBBHBQ')
+# player and number of cards in the high and low nibble, indices of cards in nibbles, sleeping queen,
+# attacked player and queen in the high and low nibble
+RECORD = struct.Struct('<B3sBB')
+
+_moves: Dict[bytes, Tuple[int, Move]] = {}
+
+
+def pack_move(player: int, move: Move) -> bytes:
+    hand = 0
+    for i, index in enumerate(move.hand):
+        hand |= index << 4 * i
+    sleeping = move.sleeping if move.sleeping is not None else NONE
+    awoken = move.awoken[0] << 4 | move.awoken[1] if move.awoken is not None else NONE
+    return RECORD.pack(player << 4 | len(move.hand), hand.to_bytes(3, 'little'), sleeping, awoken)
+
+
+def unpack_move(record: bytes) -> Tuple[int, Move]:
+    """
+    Decoded records are cached, a game uses only a few hundred different ones.
+    """
+    decoded = _moves.get(record)
+    if decoded is None:
+        head, hand_bytes, sleeping, awoken = RECORD.unpack(record)
+        hand = int.from_bytes(hand_bytes, 'little')
+        move = Move(tuple(hand >> 4 * i & 0xF for i in range(head & 0xF)),
+                    sleeping if sleeping != NONE else None,
+                    (awoken >> 4, awoken & 0xF) if awoken != NONE else None)
+        decoded = _moves[record] = (head >> 4, move)
+    return decoded
+
+
+class MoveLog:
+    """
+    Writes the seed and the rules of a game and its moves to a binary stream, every move takes RECORD.size bytes.
+    """
+    def __init__(self, stream: BinaryIO, number_of_players: int, seed: int, strategy: int = 0,
+                 goals: Optional[Goals] = None) -> None:
+        if not 0 <= seed < 1 << 64:
+            raise ValueError('only seeds from 0 to 2**64 - 1 can be logged')
+        points, queens = goals if goals is not None else standard_goals(number_of_players)
+        self.stream = stream
+        self.moves = 0
+        stream.write(HEADER.pack(MAGIC, VERSION, number_of_players, strategy, points, queens, seed))
+
+    def write(self, player: int, move: Move) -> None:
+        self.stream.write(pack_move(player, move))
+        self.moves += 1
+
+
+class GameRecorder(GamePlayerInterface):
+    """
+    Passes commands to a seeded GameAdaptor and logs every command that changed the game
+    (invalid commands leave the game as it was). The pile strategy has to be one of codec.strategies
+    and the game has to be decided by GameFinished or GameFinishedAt.
+    """
+    def __init__(self, adaptor: GameAdaptor, stream: BinaryIO) -> None:
+        if adaptor.seed is None:
+            raise ValueError('only games created with a seed can be recorded')
+        game = adaptor.game
+        strategy = next((i for i, cls in enumerate(codec.strategies) if type(game.pile.strategy) is cls), None)
+        if strategy is None:
+            raise ValueError(f'strategy {type(game.pile.strategy).__name__} can not be recorded')
+        if type(game.game_finished) not in (GameFinished, GameFinishedAt):
+            raise ValueError(f'{type(game.game_finished).__name__} can not be recorded')
+        goals = game.game_finished.goals(game.get_number_of_players())
+        self.adaptor = adaptor
+        self.log = MoveLog(stream, game.get_number_of_players(), adaptor.seed, strategy, goals)
+
+    def play(self, player: str, cards: str):
+        result = self.adaptor.play(player, cards)
+        if result is not None:
+            self.log.write(int(player) - 1, Move.parse(cards))
+        return result
+
+
+def read_header(stream: BinaryIO) -> Tuple[int, int, int, Goals]:
+    """
+    Number of players, seed, pile strategy and goals of a logged game.
+    """
+    magic, version, number_of_players, strategy, points, queens, seed = HEADER.unpack(stream.read(HEADER.size))
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f'not a move log of version {VERSION}')
+    if strategy >= len(codec.strategies):
+        raise ValueError(f'unknown pile strategy {strategy}')
+    return number_of_players, seed, strategy, (points, queens)
+
+
+def read_moves(stream: BinaryIO, chunk: int = 4096) -> Iterator[Tuple[int, Move]]:
+    """
+    Generator of (player, move) from the current position of the stream to its end,
+    the stream is read in chunks of the given number of records.
+    """
+    size = RECORD.size
+    while True:
+        data = stream.read(size * chunk)
+        if len(data) % size:
+            raise ValueError('move log ends with an incomplete record')
+        for start in range(0, len(data), size):
+            yield unpack_move(data[start:start + size])
+        if len(data) < size * chunk:
+            return
+
+
+class Checkpoint:
+    def __init__(self, moves: int, game: Game) -> None:
+        self.moves = moves
+        self.state = codec.encode(game)
+        self.random_state = game.pile.rng.getstate()
+
+
+class ReplayEngine:
+    """
+    Re-executes a move log on a fresh game created from the logged seed and rules. Moves are played by positions,
+    without parsing commands, and the game has no observers. Every checkpoint_interval moves the state
+    is saved, seek restores the nearest checkpoint and plays only the moves after it.
+    The stream has to support seek.
+    """
+    def __init__(self, stream: BinaryIO, checkpoint_interval: int = 256) -> None:
+        self.stream = stream
+        self.checkpoint_interval = checkpoint_interval
+        stream.seek(0)
+        self.number_of_players, self.seed, strategy, goals = read_header(stream)
+        game_finished = GameFinished() if goals == standard_goals(self.number_of_players) else GameFinishedAt(*goals)
+        self.game: Game = GameAdaptor(self.number_of_players, self.seed, strategy=codec.strategies[strategy](),
+                                      game_finished=game_finished).game
+        self.moves = 0          # number of moves played on the game
+        self.checkpoints: List[Checkpoint] = [Checkpoint(0, self.game)]
+
+    def run(self, until: Optional[int] = None) -> int:
+        """
+        Plays moves from the current one until the given move number or the end of the log,
+        returns the number of moves played on the game.
+        """
+        game = self.game
+        interval = self.checkpoint_interval
+        last_checkpoint = self.checkpoints[-1].moves
+        self.stream.seek(HEADER.size + self.moves * RECORD.size)
+        for player, move in read_moves(self.stream):
+            if until is not None and self.moves >= until:
+                break
+            if game.play(player, move.positions(game, player)) is None:
+                raise ValueError(f'move {self.moves} of the log is not valid')
+            self.moves += 1
+            if self.moves % interval == 0 and self.moves > last_checkpoint:
+                self.checkpoints.append(Checkpoint(self.moves, game))
+                last_checkpoint = self.moves
+        return self.moves
+
+    def seek(self, n: int) -> Game:
+        """
+        Returns the game after n moves.
+        """
+        checkpoint = self.checkpoints[bisect_right([c.moves for c in self.checkpoints], n) - 1]
+        if n < self.moves or checkpoint.moves > self.moves:
+            codec.decode_into(self.game, checkpoint.state)
+            self.game.pile.rng.setstate(checkpoint.random_state)
+            self.moves = checkpoint.moves
+        self.run(n)
+        return self.game
@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set
+
+from adaptor import GameAdaptor, GameObserver
+
+HELP = ('new <players> [seed] | join <table> <player> | watch <table> | play <table> <player> <commands> | '
+        'moves <table> <player> | close <table> | stats')
+
+
+class Connection:
+    """
+    Lines for one client are buffered by the transport. A client that reads too slowly is disconnected,
+    so a connection never holds more than max_buffer bytes.
+    """
+    def __init__(self, writer: asyncio.StreamWriter, max_buffer: int) -> None:
+        self.writer = writer
+        self.max_buffer = max_buffer
+        self.observers: List[TableObserver] = []
+
+    def send(self, line: str) -> None:
+        if self.writer.is_closing():
+            return
+        self.writer.write(line.encode() + b'\n')
+        if self.writer.transport.get_write_buffer_size() > self.max_buffer:
+            self.writer.close()
+
+
+class TableObserver(GameObserver):
+    """
+    Pushes notifications of a game to a client as 'event <table> <message>'.
+    """
+    def __init__(self, connection: Connection, table: Table) -> None:
+        self.connection = connection
+        self.table = table
+
+    def notify(self, message: str):
+        self.connection.send(f'event {self.table.id} {message}')
+
+
+class Table:
+    __slots__ = ('id', 'adaptor', 'observers')
+
+    def __init__(self, table_id: int, adaptor: GameAdaptor) -> None:
+        self.id = table_id
+        self.adaptor = adaptor
+        self.observers: Set[TableObserver] = set()
+
+
+class ServerError(Exception):
+    pass
+
+
+class GameServer:
+    """
+    Hosts games in one event loop. Every table holds one GameAdaptor and at most max_observers observers,
+    there are at most max_tables tables. Commands are answered with 'ok ...' or 'error ...'.
+    """
+    def __init__(self, max_tables: int = 10000, max_observers: int = 8, max_buffer: int = 1 << 16,
+                 latency_window: int = 100000) -> None:
+        self.max_tables = max_tables
+        self.max_observers = max_observers
+        self.max_buffer = max_buffer
+        self.tables: Dict[int, Table] = {}
+        self._next_id = 1
+        self.moves = 0
+        self.latencies: Deque[int] = deque(maxlen=latency_window)     # ns of the last moves
+        self._servers: List[asyncio.AbstractServer] = []
+
+    def handle(self, line: str, connection: Optional[Connection] = None) -> str:
+        words = line.split()
+        if not words:
+            return 'error empty command'
+        command, args = words[0], words[1:]
+        try:
+            if command == 'new':
+                return self._new(args)
+            if command == 'play':
+                return self._play(args)
+            if command == 'moves':
+                table, player = self._table(args), self._player(args)
+                game = table.adaptor.game
+                moves = game.legal_moves(player) if game.winner is None else []
+                return 'ok ' + ','.join(move.command() for move in moves)
+            if command in ('join', 'watch'):
+                return self._observe(args, connection, command == 'join')
+            if command == 'close':
+                self._close(self._table(args))
+                return 'ok'
+            if command == 'stats':
+                return 'ok ' + self.stats()
+        except ServerError as error:
+            return f'error {error}'
+        return f'error unknown command, use {HELP}'
+
+    def _table(self, args: List[str]) -> Table:
+        try:
+            return self.tables[int(args[0])]
+        except (IndexError, ValueError, KeyError):
+            raise ServerError('no such table')
+
+    def _player(self, args: List[str]) -> int:
+        try:
+            player = int(args[1]) - 1
+        except (IndexError, ValueError):
+            raise ServerError('player expected')
+        if not 0 <= player < self.tables[int(args[0])].adaptor.game.get_number_of_players():
+            raise ServerError('no such player')
+        return player
+
+    def _new(self, args: List[str]) -> str:
+        if len(self.tables) >= self.max_tables:
+            raise ServerError('too many tables')
+        try:
+            number_of_players = int(args[0])
+            seed = int(args[1]) if len(args) > 1 else None
+        except (IndexError, ValueError):
+            raise ServerError('number of players expected')
+        if number_of_players not in range(2, 6):
+            raise ServerError('2 - 5 players')
+        table = Table(self._next_id, GameAdaptor(number_of_players, seed))
+        self.tables[table.id] = table
+        self._next_id += 1
+        return f'ok {table.id}'
+
+    def _play(self, args: List[str]) -> str:
+        table, player = self._table(args), self._player(args)
+        if table.adaptor.game.winner is not None:
+            raise ServerError('game finished')
+        start = time.perf_counter_ns()
+        try:
+            result = table.adaptor.play(str(player + 1), ' '.join(args[2:]))
+        except (IndexError, ValueError):
+            result = None
+        self.latencies.append(time.perf_counter_ns() - start)
+        if result is None:
+            raise ServerError('invalid move')
+        self.moves += 1
+        return f'ok {result}'
+
+    def _observe(self, args: List[str], connection: Optional[Connection], as_player: bool) -> str:
+        table = self._table(args)
+        if connection is None:
+            raise ServerError('no connection')
+        if len(table.observers) >= self.max_observers:
+            raise ServerError('too many observers')
+        observer = TableObserver(connection, table)
+        observable = table.adaptor.observable
+        if as_player:
+            player = self._player(args)
+            if observable.observers[player] is not None:
+                raise ServerError('player already joined')
+            observable.add_player(player, observer)
+        else:
+            observable.add(observer)
+        table.observers.add(observer)
+        connection.observers.append(observer)
+        return 'ok'
+
+    def _close(self, table: Table) -> None:
+        del self.tables[table.id]
+        for observer in table.observers:
+            observer.connection.observers.remove(observer)
+        table.observers.clear()
+
+    def _disconnect(self, connection: Connection) -> None:
+        for observer in connection.observers:
+            observer.table.observers.discard(observer)
+            observer.table.adaptor.observable.remove(observer)
+        connection.observers.clear()
+
+    def latency_percentile(self, q: float) -> float:
+        """
+        Move latency in microseconds.
+        """
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)] / 1000
+
+    def stats(self) -> str:
+        return (f'tables {len(self.tables)} moves {self.moves} p50_us {self.latency_percentile(0.5):.1f} '
+                f'p99_us {self.latency_percentile(0.99):.1f}')
+
+    async def serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        connection = Connection(writer, self.max_buffer)
+        try:
+            while not writer.is_closing():
+                line = await reader.readline()
+                if not line:
+                    break
+                connection.send(self.handle(line.decode(errors='replace'), connection))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._disconnect(connection)
+            writer.close()
+
+    async def start(self, host: str = '127.0.0.1', port: int = 7070) -> asyncio.AbstractServer:
+        server = await asyncio.start_server(self.serve_client, host, port)
+        self._servers.append(server)
+        return server
+
+    async def start_unix(self, path: str) -> asyncio.AbstractServer:
+        server = await asyncio.start_unix_server(self.serve_client, path)
+        self._servers.append(server)
+        return server
+
+    async def close(self) -> None:
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+        self._servers.clear()
+
+
+async def serve(host: str, port: int, unix: Optional[str], max_tables: int) -> None:
+    game_server = GameServer(max_tables)
+    server = await (game_server.start_unix(unix) if unix else game_server.start(host, port))
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description='Serves Sleeping Queens games over a line protocol.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=7070)
+    parser.add_argument('--unix', default=None, help='path of a unix socket, used instead of TCP')
+    parser.add_argument('--max-tables', type=int, default=10000)
+    args = parser.parse_args(argv)
+    asyncio.run(serve(args.host, args.port, args.unix, args.max_tables))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from multiprocessing import Pool, cpu_count
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from adaptor import GameAdaptor, GameFinishedStrategy
+from changes import ChangeListener
+from game import Game
+from piles import StrategyInterface
+
+
+class MovePolicy:
+    """
+    Chooses the next move of a player, the move is a command for GameAdaptor.play, e.g. 'h1 s3'.
+    None means that the player has no move.
+    """
+    def choose(self, game: Game, player_id: int) -> Optional[str]:
+        pass
+
+
+def candidate_commands(game: Game, player_id: int) -> List[str]:
+    """
+    Lists commands that are valid in the current state of the game.
+    """
+    return [move.command() for move in game.legal_moves(player_id)]
+
+
+class RandomPolicy(MovePolicy):
+    def __init__(self, rng: Optional[random.Random] = None) -> None:
+        self.rng = rng          # None for the random module
+
+    def choose(self, game: Game, player_id: int) -> Optional[str]:
+        commands = candidate_commands(game, player_id)
+        return (self.rng or random).choice(commands) if commands else None
+
+
+class GreedyPolicy(MovePolicy):
+    """
+    Wakes queens when possible, then attacks, otherwise throws away as many numbered cards as possible.
+    """
+    def choose(self, game: Game, player_id: int) -> Optional[str]:
+        commands = candidate_commands(game, player_id)
+        for command in commands:
+            if 's' in command:
+                return command
+        for command in commands:
+            if 'a' in command:
+                return command
+        return max(commands, key=lambda c: c.count('h'), default=None)
+
+
+policies: Dict[str, type] = {'random': RandomPolicy, 'greedy': GreedyPolicy}
+
+
+class GameResult(NamedTuple):
+    seed: int
+    number_of_players: int
+    winner: Optional[int]       # index of the seat, None if the game did not finish
+    moves: int
+
+
+def play_moves(adaptor: GameAdaptor, seat_policies: List[MovePolicy], max_moves: int = 1000) -> int:
+    """
+    Plays the game of the adaptor until it is finished, stuck or max_moves were played,
+    every seat asks its policy for a command (policies are repeated for more seats). Returns the number of moves.
+    """
+    game = adaptor.game
+    moves = 0
+    while game.winner is None and moves < max_moves:
+        on_turn = game.game_state.on_turn
+        command = seat_policies[on_turn % len(seat_policies)].choose(game, on_turn)
+        if command is None or adaptor.play(str(on_turn + 1), command) is None:
+            break       # player has no valid move, the game is stuck
+        moves += 1
+    return moves
+
+
+def play_game(number_of_players: int, seat_policies: List[MovePolicy], seed: int, max_moves: int = 1000,
+              game_seed: Optional[int] = None, strategy: Optional[StrategyInterface] = None,
+              game_finished: Optional[GameFinishedStrategy] = None,
+              listeners: Iterable[ChangeListener] = ()) -> GameResult:
+    """
+    Plays one game to the end. The random module is seeded by seed, the game shuffles with it
+    or with its own generator seeded by game_seed. Listeners get the changes of the game.
+    """
+    random.seed(seed)
+    adaptor = GameAdaptor(number_of_players, game_seed, strategy=strategy, game_finished=game_finished)
+    game = adaptor.game
+    game.listeners.extend(listeners)
+    moves = play_moves(adaptor, seat_policies, max_moves)
+    winner = game.players.index(game.winner) if game.winner is not None else None
+    return GameResult(seed, number_of_players, winner, moves)
+
+
+def _play_chunk(args: Tuple[int, List[str], List[int], int]) -> List[GameResult]:
+    number_of_players, policy_names, seeds, max_moves = args
+    seat_policies = [policies[name]() for name in policy_names]
+    return [play_game(number_of_players, seat_policies, seed, max_moves) for seed in seeds]
+
+
+class SimulationReport:
+    def __init__(self, number_of_players: int) -> None:
+        self.number_of_players = number_of_players
+        self.games = 0
+        self.unfinished = 0
+        self.moves = 0
+        self.wins: List[int] = [0 for _ in range(number_of_players)]
+        self.seconds = 0.0
+
+    def add(self, result: GameResult) -> None:
+        self.games += 1
+        self.moves += result.moves
+        if result.winner is None:
+            self.unfinished += 1
+        else:
+            self.wins[result.winner] += 1
+
+    def games_per_second(self) -> float:
+        return self.games / self.seconds if self.seconds else 0.0
+
+    def win_rates(self) -> List[float]:
+        return [wins / self.games if self.games else 0.0 for wins in self.wins]
+
+    def __repr__(self) -> str:
+        lines = [f'games: {self.games}, unfinished: {self.unfinished}, moves: {self.moves}',
+                 f'time: {self.seconds:.2f} s, {self.games_per_second():.1f} games/s']
+        lines.extend(f'seat {i + 1}: {rate:.3f}' for i, rate in enumerate(self.win_rates()))
+        return '\n'.join(lines)
+
+
+def _chunks(seeds: List[int], size: int) -> Iterator[List[int]]:
+    for i in range(0, len(seeds), size):
+        yield seeds[i:i + size]
+
+
+def simulate(games: int, number_of_players: int = 2, policy_names: Iterable[str] = ('random',),
+             processes: Optional[int] = None, seed: int = 0, max_moves: int = 1000,
+             chunk_size: int = 50) -> SimulationReport:
+    """
+    Plays games with seeds seed, seed + 1, ... on a pool of processes (all cores by default).
+    With processes == 1 games are played in this process.
+    """
+    policy_names = list(policy_names)
+    for name in policy_names:
+        if name not in policies:
+            raise ValueError(f'unknown policy: {name}')
+    report = SimulationReport(number_of_players)
+    tasks = [(number_of_players, policy_names, chunk, max_moves)
+             for chunk in _chunks(list(range(seed, seed + games)), chunk_size)]
+    start = time.perf_counter()
+    processes = processes or cpu_count()
+    if processes == 1:
+        for task in tasks:
+            for result in _play_chunk(task):
+                report.add(result)
+    else:
+        with Pool(processes) as pool:
+            for results in pool.imap_unordered(_play_chunk, tasks):
+                for result in results:
+                    report.add(result)
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description='Plays Sleeping Queens games without user interface.')
+    parser.add_argument('-n', '--games', type=int, default=1000)
+    parser.add_argument('-p', '--players', type=int, default=2, choices=range(2, 6))
+    parser.add_argument('--policy', nargs='+', default=['random'], choices=sorted(policies),
+                        help='policy for each seat, policies are repeated when there are more seats')
+    parser.add_argument('-j', '--processes', type=int, default=None, help='number of processes, all cores by default')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-moves', type=int, default=1000)
+    args = parser.parse_args(argv)
+    print(simulate(args.games, args.players, args.policy, args.processes, args.seed, args.max_moves))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import random
+from typing import Dict, List, NamedTuple, Optional, Tuple, TYPE_CHECKING
+
+from cards import Card, CardType, Queen
+from moves import Move, is_valid_numbered, legal_moves
+from piles import CardBuffer, DrawingAndTrashPile, StrategyInterface, Strategy1
+
+if TYPE_CHECKING:
+    from game import Game
+
+# persistent stack of cards, the head is the top card and the tail is shared by all later versions
+Trash = Optional[Tuple[Card, 'Trash']]
+
+defense_card = {CardType.KNIGHT: CardType.DRAGON, CardType.POTION: CardType.WAND}
+
+Goals = Tuple[int, int]         # points and queens, the first player who reaches one of them wins
+
+
+def standard_goals(number_of_players: int) -> Goals:
+    return (50, 5) if number_of_players in (2, 3) else (40, 4)
+
+
+def push(trash: Trash, cards) -> Trash:
+    for card in cards:
+        trash = (card, trash)
+    return trash
+
+
+def trash_cards(trash: Trash) -> List[Card]:
+    """
+    Cards of the persistent stack from the bottom to the top.
+    """
+    cards = []
+    while trash is not None:
+        cards.append(trash[0])
+        trash = trash[1]
+    cards.reverse()
+    return cards
+
+
+def _add_queen(queens: Tuple[Optional[Queen], ...], queen: Queen) -> Tuple[Optional[Queen], ...]:
+    """
+    Same as QueenCollection.add_queen, the queen takes the first empty slot.
+    """
+    for i, slot in enumerate(queens):
+        if slot is None:
+            return queens[:i] + (queen,) + queens[i + 1:]
+    return queens + (queen,)
+
+
+def _remove_queen(queens: Tuple[Optional[Queen], ...], index: int) -> Tuple[Optional[Queen], ...]:
+    return queens[:index] + (None,) + queens[index + 1:]
+
+
+class GameSnapshot(NamedTuple):
+    """
+    Immutable state of the whole game. A move creates a new snapshot which shares
+    every unchanged part (other hands, queen collections, the draw pile tuple, the trash stack) with its parent.
+    """
+    on_turn: int
+    draw_pile: Tuple[Card, ...]         # only the first draw_size cards are in the pile, the top is at the end
+    draw_size: int
+    trash_pile: Trash
+    trash_size: int
+    hands: Tuple[Tuple[Card, ...], ...]
+    sleeping_queens: Tuple[Optional[Queen], ...]
+    awoken_queens: Tuple[Tuple[Optional[Queen], ...], ...]
+    winner: Optional[int] = None
+    strategy: StrategyInterface = Strategy1()
+    goals: Optional[Goals] = None       # of the game's GameFinishedStrategy, None for the standard goals
+
+    def get_number_of_players(self) -> int:
+        return len(self.hands)
+
+    def get_draw_pile(self) -> List[Card]:
+        return list(self.draw_pile[:self.draw_size])
+
+    def get_trash_pile(self) -> List[Card]:
+        return trash_cards(self.trash_pile)
+
+    def legal_moves(self) -> List[Move]:
+        """
+        Valid moves of the player on turn, no moves when the game is finished.
+        """
+        if self.winner is not None:
+            return []
+        return legal_moves(self.on_turn, self.hands[self.on_turn], self.sleeping_queens, self.awoken_queens)
+
+    def play(self, move: Move, rng: Optional[random.Random] = None) -> Optional[GameSnapshot]:
+        """
+        Plays a move of the player on turn by the rules of Player.play and returns the new snapshot,
+        None if the move is not valid. This snapshot does not change.
+        rng shuffles the trash pile when the draw pile runs out, None for the random module.
+        """
+        if self.winner is not None or len(set(move.hand)) != len(move.hand):
+            return None
+        player = self.on_turn
+        hand = self.hands[player]
+        if any(not 0 <= i < len(hand) for i in move.hand):
+            return None
+        cards = [hand[i] for i in move.hand]
+        builder = _Builder(self, rng)
+
+        if move.sleeping is not None and move.awoken is None and len(cards) == 1:
+            if cards[0].type != CardType.KING or not 0 <= move.sleeping < len(self.sleeping_queens):
+                return None
+            queen = self.sleeping_queens[move.sleeping]
+            if queen is None:
+                return None
+            builder.sleeping = _remove_queen(builder.sleeping, move.sleeping)
+            builder.awoken[player] = _add_queen(builder.awoken[player], queen)
+        elif move.awoken is not None and move.sleeping is None and len(cards) == 1:
+            if cards[0].type not in defense_card:
+                return None
+            victim, index = move.awoken
+            if not 0 <= victim < len(self.hands) or not 0 <= index < len(self.awoken_queens[victim]):
+                return None
+            queen = self.awoken_queens[victim][index]
+            if queen is None:
+                return None
+            defense = next((card for card in self.hands[victim] if card.type == defense_card[cards[0].type]), None)
+            if defense is not None:         # victim plays a defense card
+                builder.discard_and_redraw(victim, [defense])
+            else:
+                builder.awoken[victim] = _remove_queen(builder.awoken[victim], index)
+                if cards[0].type == CardType.KNIGHT:
+                    builder.awoken[player] = _add_queen(builder.awoken[player], queen)
+                else:
+                    builder.sleeping = _add_queen(builder.sleeping, queen)
+        elif move.sleeping is None and move.awoken is None and cards:
+            if any(card.type != CardType.NUMBER for card in cards):
+                return None
+            if not is_valid_numbered([card.get_points() for card in cards]):
+                return None
+        else:
+            return None
+        builder.discard_and_redraw(player, cards)
+        return builder.build((player + 1) % len(self.hands))
+
+
+class _Builder:
+    """
+    Collects changes of one move, only the changed parts of the snapshot are replaced.
+    """
+    def __init__(self, parent: GameSnapshot, rng: Optional[random.Random]) -> None:
+        self.parent = parent
+        self.rng = rng
+        self.draw_pile = parent.draw_pile
+        self.draw_size = parent.draw_size
+        self.trash_pile = parent.trash_pile
+        self.trash_size = parent.trash_size
+        self.hands = list(parent.hands)
+        self.sleeping = parent.sleeping_queens
+        self.awoken = list(parent.awoken_queens)
+
+    def discard_and_redraw(self, player: int, picked: List[Card]) -> None:
+        remaining = list(self.hands[player])
+        for card in picked:             # the first equal card is removed, like list.remove
+            remaining.remove(card)
+        count = len(picked)
+        if count >= self.draw_size:     # the strategy reshuffles, it works on a temporary mutable pile
+            pile = DrawingAndTrashPile.from_cards(self.parent.strategy, self.draw_pile[:self.draw_size],
+                                                  trash_cards(self.trash_pile), self.rng)
+            drawn = pile.discard_and_redraw(picked)
+            self.draw_pile = tuple(pile.draw_pile)
+            self.draw_size = len(self.draw_pile)
+            self.trash_pile = push(None, pile.trash_pile)
+            self.trash_size = len(pile.trash_pile)
+        else:
+            self.trash_pile = push(self.trash_pile, picked)
+            self.trash_size += count
+            drawn = list(self.draw_pile[self.draw_size - count:self.draw_size])
+            self.draw_size -= count
+        self.hands[player] = tuple(remaining + drawn)
+
+    def build(self, on_turn: int) -> GameSnapshot:
+        return self.parent._replace(
+            on_turn=on_turn, draw_pile=self.draw_pile, draw_size=self.draw_size, trash_pile=self.trash_pile,
+            trash_size=self.trash_size, hands=tuple(self.hands), sleeping_queens=self.sleeping,
+            awoken_queens=tuple(self.awoken), winner=_winner(self.sleeping, self.awoken, self.parent.goals))
+
+
+def _winner(sleeping: Tuple[Optional[Queen], ...], awoken: List[Tuple[Optional[Queen], ...]],
+            goals: Optional[Goals]) -> Optional[int]:
+    """
+    Same rules as GameFinished.finish with the goals of the snapshot.
+    """
+    desired_points, desired_queens = goals if goals is not None else standard_goals(len(awoken))
+    score = [sum(queen.get_points() for queen in queens if queen) for queens in awoken]
+    if all(queen is None for queen in sleeping):
+        return score.index(max(score))
+    for i, queens in enumerate(awoken):
+        if score[i] >= desired_points or sum(queen is not None for queen in queens) >= desired_queens:
+            return i
+    return None
+
+
+class SnapshotCache:
+    """
+    Remembers parts of the last snapshot of a game together with versions of the objects they were made of.
+    Only parts whose objects changed since then are copied again.
+    """
+    def __init__(self) -> None:
+        self._draw: Tuple[Optional[CardBuffer], int, Tuple[Card, ...]] = (None, -1, ())
+        self._trash: Tuple[Optional[CardBuffer], int, int, Trash] = (None, -1, 0, None)
+        self._parts: Dict[int, Tuple[object, int, tuple]] = {}
+
+    def _part(self, key: int, source, version: Optional[int]) -> tuple:
+        cached = self._parts.get(key)
+        if version is not None and cached is not None and cached[0] is source and cached[1] == version:
+            return cached[2]
+        part = tuple(source)
+        self._parts[key] = (source, version, part)
+        return part
+
+    def snapshot(self, game: Game) -> GameSnapshot:
+        draw_pile, trash_pile = game.pile.draw_pile, game.pile.trash_pile
+        buffer, writes, draw = self._draw
+        if buffer is not draw_pile or writes != draw_pile.writes:       # taking cards does not change the tuple
+            draw = tuple(draw_pile)
+            self._draw = (draw_pile, draw_pile.writes, draw)
+
+        buffer, rewrites, size, trash = self._trash
+        if buffer is not trash_pile or rewrites != trash_pile.rewrites or size > len(trash_pile):
+            size, trash = 0, None
+        if size != len(trash_pile):     # only cards discarded since the last snapshot are pushed
+            trash = push(trash, trash_pile[size:])
+            self._trash = (trash_pile, trash_pile.rewrites, len(trash_pile), trash)
+
+        players = game.players
+        hands = tuple(self._part(i, player.hand.get_cards(), getattr(player.hand.get_cards(), 'version', None))
+                      for i, player in enumerate(players))
+        sleeping = self._part(-1, game.sleeping_queens.get_queens(), getattr(game.sleeping_queens, 'version', None))
+        awoken = tuple(self._part(len(players) + i, player.awoken_queens.get_queens(),
+                                  getattr(player.awoken_queens, 'version', None)) for i, player in enumerate(players))
+        winner = players.index(game.winner) if game.winner is not None else None
+        return GameSnapshot(game.game_state.on_turn, draw, len(draw_pile), trash, len(trash_pile), hands,
+                            sleeping, awoken, winner, game.pile.strategy, game.game_finished.goals(len(players)))
@@ -1,6 +1,12 @@
+import pickle
+import random
+import tracemalloc
 from unittest import TestCase
-from adaptor import GameAdaptor
+from adaptor import GameAdaptor, GameFinished
 from cards import Card, CardType
+from changes import QueenMoved, HandRedrawn, TurnAdvanced
+from moves import compile_command
+from positions import HandPosition, SleepingQueenPosition, AwokenQueenPosition
 
 
 class TestAdaptor(TestCase):
@@ -17,6 +23,21 @@ class TestAdaptor(TestCase):
         self.assertEqual(len(adaptor.game.players[0].awoken_queens.get_queens()), 0)
 
 
+class TestCommands(TestCase):
+    def test_compile(self):
+        self.assertEqual(compile_command('h1 h2'), ((0, 1), (), ()))
+        self.assertEqual(compile_command('h5 s11'), ((4,), (10,), ()))
+        self.assertEqual(compile_command('h4 a312'), ((3,), (), ((2, 11),)))
+        for command in ('hx', 'h0', 'h', 'q1', 'a1', 's-1', 'h1 a0'):
+            self.assertIsNone(compile_command(command))
+
+    def test_cached(self):
+        compile_command('h3 s7')
+        hits = compile_command.cache_info().hits
+        self.assertIs(compile_command('h3 s7'), compile_command('h3 s7'))
+        self.assertEqual(compile_command.cache_info().hits, hits + 2)
+
+
 class TestPlay(TestCase):
     def setUp(self) -> None:
         self.adaptor = GameAdaptor(2)
@@ -83,3 +104,122 @@ class TestPlay(TestCase):
         self.assertEqual(self.player2.hand.get_cards()[:-2], self.cards2[1:4])
         self.assertEqual(self.player1.hand.get_cards()[:-2], self.cards1[1:4])
         self.adaptor.play('1', 'h2 s7')
+
+    def test_game_state_changes(self):
+        game_state = self.adaptor.game.game_state
+        queen = self.adaptor.game.sleeping_queens[6]
+        self.assertTrue(self.adaptor.play('1', 'h5 s7'))
+        self.assertEqual(game_state.get_changes(), [
+            QueenMoved(queen, None, 0), HandRedrawn(0, (self.cards1[4],), (self.to_draw[-1],)), TurnAdvanced(1)])
+        self.assertEqual(len(game_state.sleeping_queens), 11)
+        self.assertEqual(list(game_state.awoken_queens.values()), [queen])
+        self.assertEqual([pos.get_playerID() for pos in game_state.awoken_queens], [0])
+
+        self.assertFalse(self.adaptor.play('2', 'a11 h4'))      # player 1 defends with a dragon
+        self.assertEqual([type(change) for change in game_state.get_changes()],
+                         [HandRedrawn, HandRedrawn, TurnAdvanced])
+        self.assertEqual(game_state.get_changes()[0].discarded, (Card(CardType.DRAGON),))
+        self.assertEqual(game_state.on_turn, 0)
+
+    def test_indices(self):
+        self.assertIsNone(self.adaptor.play('1', 'h9'))
+        self.assertIsNone(self.adaptor.play('1', 'h5 s13'))
+        self.assertIsNone(self.adaptor.play('3', 'h1'))
+        self.assertIsNone(self.adaptor.play('1', 'h1 hx'))
+        queen = self.adaptor.game.sleeping_queens[10]
+        self.assertTrue(self.adaptor.play('1', 'h5 s11'))
+        self.assertEqual(self.player1.awoken_queens.get_queens(), [queen])
+
+    def test_play_many(self):
+        self.assertEqual(self.adaptor.play_many([('1', 'h1 h2'), ('1', 'h1'), ('2', 'h1 h2 h3'), ('2', 'h9')]),
+                         [True, None, True, None])
+        self.assertEqual(self.adaptor.game.game_state.on_turn, 0)
+
+
+class TestGameFinished(TestCase):
+    def test_counters_follow_moves(self):
+        for number_of_players in range(2, 6):
+            adaptor = GameAdaptor(number_of_players, number_of_players)
+            game, state = adaptor.game, adaptor.game.game_state
+            rng = random.Random(number_of_players)
+            while game.winner is None and game.legal_moves(state.on_turn):
+                player = state.on_turn
+                game.play(player, rng.choice(game.legal_moves(player)).positions(game, player))
+                self.assertEqual(state.points, [p.count_points() for p in game.players])
+                self.assertEqual(state.queen_counts, [p.count_queens() for p in game.players])
+                self.assertEqual(state.sleeping_count, game.sleeping_queens.count_queens())
+            desired = (50, 5) if number_of_players < 4 else (40, 4)
+            winner = game.players.index(game.winner)
+            self.assertTrue(state.points[winner] >= desired[0] or state.queen_counts[winner] >= desired[1]
+                            or state.sleeping_count == 0)
+
+    def test_only_changed_players(self):
+        adaptor = GameAdaptor(4, 0)
+        game, state = adaptor.game, adaptor.game.game_state
+        self.assertIsNone(GameFinished.is_finished(game))
+        self.assertEqual(state.changed_players, set())
+        for queen in game.sleeping_queens.get_queens()[:4]:       # moves that are not reported by changes
+            game.sleeping_queens.remove_queen(queen)
+            game.players[2].awoken_queens.add_queen(queen)
+        self.assertIsNone(GameFinished.is_finished(game))
+        game.restore(0, None)           # marks all players as changed
+        self.assertEqual(GameFinished.is_finished(game), state.points[2])
+        self.assertIs(game.winner, game.players[2])
+        self.assertEqual(GameFinished.is_finished(game), state.points[2])       # the decision is kept
+
+    def test_added_queens_are_counted(self):
+        game = GameAdaptor(2, 0).game
+        state = game.game_state
+        queens = [queen for queen in game.sleeping_queens.get_queens() if queen][:5]
+        for queen in queens:
+            game.remove_queen(queen)
+            game.players[1].add_queen(queen)
+        self.assertEqual(state.queen_counts[1], 5)
+        self.assertEqual(state.sleeping_count, 7)
+        key = game.hash()
+        game.zobrist.rehash()
+        self.assertEqual(game.hash(), key)
+        self.assertEqual(GameFinished.is_finished(game), state.points[1])
+        game.players[1].remove_queen(queens[0])
+        self.assertEqual(state.queen_counts[1], 4)
+
+
+class TestGameStateMemory(TestCase):
+    def play(self, adaptor: GameAdaptor, rng: random.Random, turns: int) -> None:
+        game = adaptor.game
+        for _ in range(turns):
+            player = game.game_state.on_turn
+            moves = game.legal_moves(player) if game.winner is None else []
+            if not moves:
+                adaptor.reset(rng.getrandbits(32))
+                continue
+            game.play(player, rng.choice(moves).positions(game, player))
+            self.assertEqual(len(game.game_state.sleeping_queens) + len(game.game_state.awoken_queens), 12)
+
+    def test_memory_stays_flat(self):
+        adaptor = GameAdaptor(3, 0)
+        rng = random.Random(0)
+        self.play(adaptor, rng, 500)
+        # memory allocated by the game state and positions, bounded caches of other modules are left out
+        filters = [tracemalloc.Filter(True, '*' + name) for name in ('game.py', 'positions.py')]
+        tracemalloc.start()
+        try:
+            self.play(adaptor, rng, 500)
+            before = tracemalloc.take_snapshot().filter_traces(filters)
+            self.play(adaptor, rng, 5000)
+            after = tracemalloc.take_snapshot().filter_traces(filters)
+        finally:
+            tracemalloc.stop()
+        growth = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+        self.assertLess(growth, 4096)
+
+    def test_positions_are_interned(self):
+        queen = GameAdaptor(2, 0).game.sleeping_queens[0]
+        self.assertIs(SleepingQueenPosition(queen), SleepingQueenPosition(queen))
+        self.assertIs(AwokenQueenPosition(queen, 1), AwokenQueenPosition(queen, 1))
+        self.assertIsNot(AwokenQueenPosition(queen, 1), AwokenQueenPosition(queen, 0))
+        card = Card(CardType.KING)
+        self.assertEqual(HandPosition(card, 0), pickle.loads(pickle.dumps(HandPosition(card, 0))))
+        self.assertEqual(len({HandPosition(card, 0), HandPosition(Card(CardType.KING), 0)}), 1)
+        with self.assertRaises(AttributeError):
+            HandPosition(card, 0).extra = 1
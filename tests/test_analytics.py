@@ -0,0 +1,55 @@
+import random
+from unittest import TestCase
+
+from analytics import Histogram, QuantileSketch, OutcomeStats, outcomes, analyze, play_outcome
+from simulator import RandomPolicy, play_game
+
+
+class TestSketches(TestCase):
+    def test_quantiles(self):
+        rng = random.Random(0)
+        values = [rng.randint(1, 1000) for _ in range(5000)]
+        sketch = QuantileSketch(0.01)
+        for value in values:
+            sketch.add(value)
+        ordered = sorted(values)
+        for q in (0.0, 0.1, 0.5, 0.9, 0.99, 1.0):
+            exact = ordered[int(q * (len(ordered) - 1))]
+            self.assertLessEqual(abs(sketch.quantile(q) - exact), 0.01 * exact + 1e-9)
+        self.assertLess(len(sketch.buckets), 400)
+
+    def test_merge(self):
+        first, second, whole = QuantileSketch(), QuantileSketch(), QuantileSketch()
+        h1, h2 = Histogram(5, 10), Histogram(5, 10)
+        for value in range(0, 100, 3):
+            (first if value % 2 else second).add(value)
+            (h1 if value % 2 else h2).add(value)
+            whole.add(value)
+        first.merge(second)
+        self.assertEqual((first.buckets, first.zeros, first.count), (whole.buckets, whole.zeros, whole.count))
+        self.assertEqual(h1.merge(h2).total(), 34)
+        self.assertEqual(list(h1.bins())[-1], (45, 19))         # values above the last bin
+        with self.assertRaises(ValueError):
+            h1.merge(Histogram(10, 10))
+
+
+class TestOutcomes(TestCase):
+    def test_outcome_matches_simulator(self):
+        for seed in range(5):
+            outcome = play_outcome(3, [RandomPolicy()], seed)
+            result = play_game(3, [RandomPolicy()], seed)
+            self.assertEqual((outcome.winner, outcome.moves), (result.winner, result.moves))
+            self.assertLessEqual(outcome.knights_blocked, outcome.knight_attacks)
+            self.assertLessEqual(outcome.potions_blocked, outcome.potion_attacks)
+
+    def test_parallel_equals_serial(self):
+        serial = OutcomeStats().consume(outcomes(40, 2, ['greedy', 'random'], seed=3))
+        parallel = analyze(40, 2, ['greedy', 'random'], processes=2, seed=3, chunk_size=7)
+        self.assertEqual(serial.games, parallel.games)
+        self.assertEqual(serial.wins, parallel.wins)
+        self.assertEqual(serial.attacks, parallel.attacks)
+        self.assertEqual(serial.deciding_queens, parallel.deciding_queens)
+        self.assertEqual(serial.lengths[2].counts, parallel.lengths[2].counts)
+        self.assertEqual(serial.length_quantiles[2].quantile(0.5), parallel.length_quantiles[2].quantile(0.5))
+        self.assertAlmostEqual(sum(serial.win_rate(2, seat) for seat in range(2)) + serial.unfinished[2] / 40, 1)
+        self.assertIn('2 players: 40 games', repr(parallel))
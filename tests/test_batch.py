@@ -0,0 +1,23 @@
+from unittest import TestCase, skipIf
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+@skipIf(numpy is None, 'numpy is not installed')
+class TestBatchEngine(TestCase):
+    def test_cross_check(self):
+        from batch import cross_check
+        for number_of_players in range(2, 6):
+            engine = cross_check(number_of_players, range(40))
+            self.assertTrue(engine.done.all())
+
+    def test_fast_shuffle(self):
+        from batch import BatchEngine
+        engine = BatchEngine(3, range(100), compatible=False).run()
+        self.assertTrue(engine.done.all())
+        self.assertTrue(((engine.winner >= 0) | engine.stuck | (engine.moves == engine.max_moves)).all())
+        # every card is in the draw pile, trash pile or in a hand
+        self.assertTrue((engine.pile_size + engine.trash_size + 3 * 5 == 62).all())
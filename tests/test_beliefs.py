@@ -0,0 +1,67 @@
+import random
+from collections import Counter
+from math import comb
+from unittest import TestCase
+
+from adaptor import GameAdaptor
+from beliefs import BeliefTracker, hypergeometric, kinds, BITS
+from cards import Card, CardType
+from piles import deck, Strategy2
+
+
+class TestBeliefs(TestCase):
+    def check(self, tracker: BeliefTracker) -> None:
+        game = tracker.game
+        unseen = Counter(deck)
+        unseen.subtract(game.players[tracker.playerID].hand.get_cards())
+        unseen.subtract(game.pile.trash_pile)
+        self.assertEqual(tracker.counts(), [unseen[card] for card in kinds])
+        self.assertEqual(tracker.total, len(game.pile.draw_pile) + sum(
+            len(player.hand.get_cards()) for i, player in enumerate(game.players) if i != tracker.playerID))
+
+    def test_follows_games(self):
+        for strategy in (None, Strategy2()):
+            adaptor = GameAdaptor(3, 11, strategy=strategy)
+            game = adaptor.game
+            trackers = [BeliefTracker(game, i) for i in range(3)]
+            rng = random.Random(11)
+            reshuffles = 0
+            for _ in range(200):
+                if game.winner is not None:
+                    break
+                player = game.game_state.on_turn
+                move = rng.choice(game.legal_moves(player))
+                trash = game.pile.trash_pile
+                game.play(player, move.positions(game, player))
+                reshuffles += game.pile.trash_pile is not trash
+                for tracker in trackers:
+                    self.check(tracker)
+            self.assertGreater(reshuffles, 0)
+            trackers[0].close()
+            self.assertEqual(len(game.listeners), 2)
+
+    def test_probabilities(self):
+        adaptor = GameAdaptor(2, 3)
+        tracker = BeliefTracker(adaptor.game, 0)
+        total, dragons = tracker.total, tracker.count(CardType.DRAGON)
+        self.assertEqual(total, 62 - 5)
+        expected = 1 - comb(total - dragons, 5) / comb(total, 5)
+        self.assertAlmostEqual(tracker.probability_in_hand(1, CardType.DRAGON), expected)
+        self.assertAlmostEqual(tracker.probability_to_draw(CardType.DRAGON, 5), expected)
+        self.assertEqual(tracker.probability_to_draw(CardType.KING, 0), 0.0)
+        self.assertEqual(tracker.probability_to_draw(CardType.KING, total), 1.0)
+        distribution = tracker.distribution(CardType.KING, 5)
+        self.assertAlmostEqual(sum(distribution), 1.0)
+        self.assertAlmostEqual(1 - distribution[0], tracker.probability_to_draw(CardType.KING, 5))
+        hand = adaptor.game.players[0].hand.get_cards()
+        self.assertEqual(tracker.probability_in_hand(0, hand[0]), 1.0)
+        one = Card(CardType.NUMBER, 1)
+        self.assertEqual(tracker.count(one), 4 - hand.count(one))
+
+    def test_bitset(self):
+        tracker = BeliefTracker(GameAdaptor(2, 3).game, 1)
+        bits = tracker.bitset()
+        self.assertEqual([bin(bits >> BITS * i & (1 << BITS) - 1).count('1') for i in range(len(kinds))],
+                         tracker.counts())
+        self.assertEqual(hypergeometric(10, 0, 3), (1.0,))
+
@@ -0,0 +1,29 @@
+from unittest import TestCase
+
+import bench
+
+
+class TestBench(TestCase):
+    def test_every_benchmark_runs(self):
+        for name, function in bench.benchmarks.items():
+            self.assertGreaterEqual(function(3), 0.0, name)
+
+    def test_run(self):
+        results = bench.run(['pile.*', 'game.full.2p'], min_time=0.001, rounds=2)
+        self.assertEqual([result.name for result in results],
+                         ['pile.discard_and_redraw.strategy1', 'pile.discard_and_redraw.strategy2',
+                          'pile.reshuffle.strategy1', 'pile.reshuffle.strategy2', 'game.full.2p'])
+        self.assertTrue(all(result.ns_per_op > 0 for result in results))
+        self.assertGreater(results[-1].peak_bytes, 0)
+        self.assertIsNone(results[0].peak_bytes)
+        data = bench.to_json(results)
+        self.assertEqual(data['results']['game.full.2p']['ops'], results[-1].ops)
+
+    def test_compare(self):
+        results = [bench.Result('a', 10, 1, 120.0), bench.Result('b', 10, 1, 100.0, 2000),
+                   bench.Result('c', 10, 1, 100.0)]
+        baseline = {'results': {'a': {'ns_per_op': 100.0, 'peak_bytes': None},
+                                'b': {'ns_per_op': 105.0, 'peak_bytes': 1000}}}
+        regressions = bench.compare(results, baseline, threshold=0.1)
+        self.assertEqual([(r.name, r.metric) for r in regressions], [('a', 'ns_per_op'), ('b', 'peak_bytes')])
+        self.assertEqual(bench.compare(results, baseline, threshold=1.5), [])
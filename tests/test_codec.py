@@ -0,0 +1,71 @@
+import pickle
+import random
+from unittest import TestCase
+
+import codec
+from adaptor import GameAdaptor
+from piles import Strategy2
+from zobrist import hash_game
+
+
+def state(game):
+    return (game.game_state.on_turn, list(game.pile.draw_pile), list(game.pile.trash_pile),
+            [list(player.hand.get_cards()) for player in game.players],
+            game.sleeping_queens.get_queens(), [player.awoken_queens.get_queens() for player in game.players],
+            game.players.index(game.winner) if game.winner else None, type(game.pile.strategy))
+
+
+def played(number_of_players: int, seed: int, moves: int):
+    random.seed(seed)
+    game = GameAdaptor(number_of_players).game
+    choices = random.Random(seed)
+    for _ in range(moves):
+        player = game.game_state.on_turn
+        if game.winner is not None or not game.legal_moves(player):
+            break
+        move = choices.choice(game.legal_moves(player))
+        game.play(player, move.positions(game, player))
+    return game
+
+
+class TestCodec(TestCase):
+    def test_round_trip(self):
+        for seed in range(12):
+            game = played(2 + seed % 4, seed, 10 * seed)
+            data = codec.encode(game)
+            self.assertEqual(len(data), codec.record_size(game.get_number_of_players()))
+            self.assertLess(len(data), len(pickle.dumps(game)) // 10)
+            copy = codec.decode(data)
+            self.assertEqual(state(copy), state(game))
+            self.assertEqual(copy.hash(), hash_game(game))
+            self.assertEqual(sorted((position.get_playerID(), queen.code)
+                                    for position, queen in copy.game_state.awoken_queens.items()),
+                             sorted((position.get_playerID(), queen.code)
+                                    for position, queen in game.game_state.awoken_queens.items()))
+
+    def test_decoded_game_plays_on(self):
+        game = played(3, 4, 30)
+        game.pile.strategy = Strategy2()
+        copy = codec.decode(codec.encode(game))
+        self.assertIs(type(copy.pile.strategy), Strategy2)
+        player = copy.game_state.on_turn
+        move = copy.legal_moves(player)[0]
+        self.assertIsNotNone(copy.play(player, move.positions(copy, player)))
+
+    def test_bulk(self):
+        games = [played(2 + i % 4, i, 5 * i) for i in range(8)]
+        data = codec.encode_many(games)
+        decoded = list(codec.decode_many(data))
+        self.assertEqual([state(game) for game in decoded], [state(game) for game in games])
+        targets = [GameAdaptor(2 + i % 4).game for i in range(8)]
+        reused = list(codec.decode_many(data, targets))
+        self.assertTrue(all(a is b for a, b in zip(reused, targets)))
+        self.assertEqual([state(game) for game in reused], [state(game) for game in games])
+
+    def test_invalid_record(self):
+        data = codec.encode(GameAdaptor(2).game)
+        data[0:2] = b'XX'
+        with self.assertRaises(ValueError):
+            codec.decode(data)
+        with self.assertRaises(ValueError):
+            codec.decode_into(GameAdaptor(3).game, codec.encode(GameAdaptor(2).game))
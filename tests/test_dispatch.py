@@ -0,0 +1,116 @@
+import asyncio
+import random
+import threading
+from typing import List
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+from adaptor import GameAdaptor, GameObserver
+from dispatch import BLOCK, COALESCE, DROP_OLDEST, DispatchingObservable
+
+
+class SlowObserver(GameObserver):
+    def __init__(self) -> None:
+        self.messages: List[str] = []
+        self.gate = threading.Event()
+
+    def notify(self, message: str):
+        self.gate.wait()
+        self.messages.append(message)
+
+
+class TestDispatch(TestCase):
+    def test_lazy_messages(self):
+        observable = DispatchingObservable(2)
+        made = []
+        observable.notify_all(lambda: made.append(1) or 'x')        # nobody listens
+        observer = SlowObserver()
+        observer.gate.set()
+        observable.add_player(0, observer)
+        observable.add(observer)
+        observable.notify_all(lambda: made.append(1) or 'y')
+        self.assertTrue(observable.flush(1))
+        self.assertEqual(made, [1])
+        self.assertEqual(observer.messages, ['y', 'y'])
+        observable.close()
+
+    def test_policies(self):
+        for policy, expected in ((DROP_OLDEST, ['0', '3', '4']), (COALESCE, ['0', '1', '4'])):
+            observable = DispatchingObservable(1, capacity=2, policy=policy)
+            observer = SlowObserver()
+            observable.add_player(0, observer)
+            observable.notify_all('0')
+            while observable.pending():         # the worker waits in notify with the first message
+                pass
+            for i in range(1, 5):
+                observable.notify_all(str(i))       # does not wait for the slow observer
+            stats = observable.stats()[0]
+            self.assertEqual(stats.pending, 2)
+            self.assertGreater(stats.lag, 0)
+            observer.gate.set()
+            observable.close()
+            self.assertEqual(observer.messages, expected)
+            stats = observable.stats()[0]
+            self.assertEqual((stats.delivered, stats.dropped, stats.coalesced),
+                             (3, 2 if policy == DROP_OLDEST else 0, 2 if policy == COALESCE else 0))
+
+    def test_block(self):
+        observable = DispatchingObservable(1, capacity=1, policy=BLOCK)
+        observer = SlowObserver()
+        observable.add_player(0, observer)
+        producer = threading.Thread(target=lambda: [observable.notify_all(str(i)) for i in range(4)])
+        producer.start()
+        producer.join(0.1)
+        self.assertTrue(producer.is_alive())
+        observer.gate.set()
+        producer.join(1)
+        observable.close()
+        self.assertEqual(observer.messages, ['0', '1', '2', '3'])
+
+    def test_game_notifications(self):
+        observable = DispatchingObservable(2)
+        adaptor = GameAdaptor(2, 1, observable)
+        observer = SlowObserver()
+        observer.gate.set()
+        observable.add_player(0, observer)
+        game = adaptor.game
+        choices = random.Random(1)
+        while game.winner is None:
+            player = game.game_state.on_turn
+            game.play(player, choices.choice(game.legal_moves(player)).positions(game, player))
+        observable.close()
+        self.assertEqual(observer.messages, [f'Game finished, winner: {game.players.index(game.winner) + 1}'])
+
+    def test_worker_threads(self):
+        threads = threading.active_count()
+        adaptors = [GameAdaptor(2, seed, DispatchingObservable(2)) for seed in range(20)]
+        self.assertEqual(threading.active_count(), threads)         # nobody listens, no workers
+        observable = adaptors[0].observable
+        observer = SlowObserver()
+        observer.gate.set()
+        observable.add_player(0, observer)
+        observable.notify_all('a')
+        self.assertEqual(threading.active_count(), threads + 1)
+        adaptors[0].reset(1)        # clears the observable
+        self.assertEqual(threading.active_count(), threads)
+        observable.add_player(0, observer)
+        observable.notify_all('b')
+        observable.close()
+        self.assertEqual(threading.active_count(), threads)
+        self.assertEqual(observer.messages[-1], 'b')
+
+
+class TestAsyncDispatch(IsolatedAsyncioTestCase):
+    async def test_asyncio_mode(self):
+        with self.assertRaises(ValueError):
+            DispatchingObservable(1, policy=BLOCK, mode='asyncio')
+        observable = DispatchingObservable(1, mode='asyncio')
+        observable.start()
+        observer = SlowObserver()
+        observer.gate.set()
+        observable.add_player(0, observer)
+        observable.notify_all('a')
+        observable.notify_all('b')
+        self.assertEqual(observer.messages, [])
+        await asyncio.sleep(0.01)
+        self.assertEqual(observer.messages, ['a', 'b'])
+        observable.close()
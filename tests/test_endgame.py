@@ -0,0 +1,102 @@
+import random
+from collections import Counter
+from unittest import TestCase
+
+from adaptor import GameAdaptor
+from cards import Card, CardType, queens
+from beliefs import BeliefTracker
+from endgame import EndgameSolver, EndgamePolicy, multisets, outcomes, estimate, is_endgame, sample_hidden
+from piles import Strategy2
+
+N = lambda value: Card(CardType.NUMBER, value)
+KING, KNIGHT, DRAGON = Card(CardType.KING), Card(CardType.KNIGHT), Card(CardType.DRAGON)
+
+
+def small_state(draw, king=False, strategy=None):
+    state = GameAdaptor(2, 1).game.fork()
+    hands = ((N(1), N(2), N(3), KNIGHT, KING if king else N(9)), (N(4), N(5), DRAGON, N(7), N(1)))
+    state = state._replace(hands=hands, draw_pile=tuple(draw), draw_size=len(draw),
+                           sleeping_queens=(queens[0],) + (None,) * 11,
+                           awoken_queens=(tuple(queens[4:8]), tuple(queens[1:4])))
+    return state._replace(strategy=strategy) if strategy is not None else state
+
+
+def expectimax(state, depth):
+    if state.winner is not None:
+        return 1.0 if state.winner == 0 else 0.0
+    moves = state.legal_moves()
+    if depth == 0 or not moves:
+        return estimate(state)[0]
+    values = [sum(p * expectimax(child, depth - 1) for p, child in outcomes(state, move)) for move in moves]
+    return max(values) if state.on_turn == 0 else min(values)
+
+
+class TestEndgame(TestCase):
+    def test_multisets(self):
+        counts = Counter({N(1): 2, N(2): 1, KING: 3})
+        drawn = list(multisets(counts, 2))
+        self.assertEqual(len(drawn), 5)
+        self.assertAlmostEqual(sum(p for _, p in drawn), 1.0)
+        self.assertAlmostEqual(dict((tuple(sorted(c.elements(), key=id)), p) for c, p in drawn)[(KING, KING)],
+                               3 / 15)
+
+    def test_outcomes(self):
+        state = small_state([N(2), KING, N(6), N(6)])
+        move = next(move for move in state.legal_moves() if len(move.hand) == 3)    # 1 + 2 = 3
+        results = outcomes(state, move)
+        self.assertAlmostEqual(sum(p for p, _ in results), 1.0)
+        self.assertEqual(len(results), 3)           # three of the four cards are drawn, 2, KING or 6 is left
+        for strategy in (None, Strategy2()):       # draws more cards than the draw pile has, the trash is reshuffled
+            state = small_state([N(6)], strategy=strategy)._replace(trash_pile=(N(8), (N(8), (KING, None))),
+                                                                     trash_size=3)
+            results = outcomes(state, move)
+            self.assertAlmostEqual(sum(p for p, _ in results), 1.0)
+            for _, child in results:
+                self.assertIn(N(6), child.hands[0])
+                self.assertEqual(len(child.hands[0]), 5)
+
+    def test_forced_win(self):
+        result = EndgameSolver(time_limit=5).solve(small_state([N(2), N(6)], king=True))
+        self.assertEqual(result.values, (1.0, 0.0))
+        self.assertTrue(result.exact)
+        self.assertEqual(result.move.sleeping, 0)
+        self.assertGreater(result.nodes_per_second(), 0)
+
+    def test_pruning_keeps_values(self):
+        state = small_state([N(2), KING, N(6), N(6), N(10)])
+        for depth in (1, 2):
+            result = EndgameSolver(time_limit=60, max_depth=depth).solve(state)
+            self.assertAlmostEqual(result.values[0], expectimax(state, depth))
+            self.assertEqual(result.depth, depth)
+
+    def test_time_limit(self):
+        solver = EndgameSolver(memory_bytes=1 << 16, time_limit=0.05)
+        for seed in range(4):       # moves of these games have hundreds of outcomes
+            result = solver.solve(GameAdaptor(3, seed).game)
+            self.assertLess(result.seconds, 0.06)
+            self.assertAlmostEqual(sum(result.values), 1.0)
+        self.assertEqual(solver.table.capacity(), 2 << 7)
+
+    def test_policy(self):
+        adaptor = GameAdaptor(2, 0)
+        self.assertFalse(is_endgame(adaptor.game))
+        policy = EndgamePolicy(max_sleeping=12, max_draw=62, solver=EndgameSolver(time_limit=0.05))
+        command = policy.choose(adaptor.game, 0)
+        self.assertIsNotNone(adaptor.play('1', command))
+
+    def test_hidden_cards(self):
+        games = [GameAdaptor(2, 0).game, GameAdaptor(2, 0).game]
+        hand, draw = games[1].players[1].hand.get_cards(), games[1].pile.draw_pile
+        hand[:], draw[:5] = draw[:5], hand[:]           # the opponent holds other cards, player 0 cannot tell
+        samples = []
+        for game in games:
+            tracker = BeliefTracker(game, 0)
+            samples.append(sample_hidden(game.fork(), tracker, random.Random(3)))
+            tracker.close()
+            self.assertEqual(Counter(samples[-1].hands[1] + samples[-1].draw_pile),
+                             Counter(game.players[1].hand.get_cards() + list(game.pile.draw_pile)))
+        self.assertEqual((samples[0].hands, samples[0].draw_pile), (samples[1].hands, samples[1].draw_pile))
+        commands = [EndgamePolicy(max_sleeping=12, max_draw=62, solver=EndgameSolver(time_limit=5, max_depth=1),
+                                  samples=2, rng=random.Random(3)).choose(game, 0) for game in games]
+        self.assertEqual(commands[0], commands[1])
+        self.assertEqual(games[0].listeners, [])
@@ -0,0 +1,50 @@
+from unittest import TestCase
+
+from adaptor import GameAdaptor, GameFinishedAt
+from experiment import (Variant, RunningStats, play_variant, run_experiment, parse_variant,
+                        DIFFERENT, EQUIVALENT, INCONCLUSIVE)
+from piles import Strategy2
+
+
+class TestExperiment(TestCase):
+    def test_same_deal(self):
+        a, b = parse_variant('a:strategy=1'), parse_variant('b:strategy=2')
+        self.assertIsInstance(b.strategy, Strategy2)
+        first, second = GameAdaptor(3, 5, strategy=a.strategy), GameAdaptor(3, 5, strategy=b.strategy)
+        self.assertEqual(first.game.pile.draw_pile, second.game.pile.draw_pile)
+        self.assertEqual(first.game.sleeping_queens.get_queens(), second.game.sleeping_queens.get_queens())
+        self.assertEqual(play_variant(a, 3, 5), play_variant(a, 3, 5))
+
+    def test_goal(self):
+        result = play_variant(parse_variant('x:goal=5/1'), 2, 0)
+        self.assertIsNotNone(result.winner)
+        self.assertLess(result.moves, 15)
+
+    def test_stops_early(self):
+        different = run_experiment(Variant('normal'), Variant('short', game_finished=GameFinishedAt(20, 2)),
+                                   metric='moves', batch=50, max_pairs=2000)
+        self.assertEqual(different.decision, DIFFERENT)
+        self.assertLess(different.pairs, 2000)
+        self.assertGreater(different.interval[0], 0)
+
+        same = run_experiment(Variant('a'), Variant('b'), metric='moves', margin=0.5, batch=20, max_pairs=100)
+        self.assertEqual(same.decision, EQUIVALENT)         # identical arms, every difference is 0
+        self.assertEqual(same.pairs, 40)
+
+        unknown = run_experiment(Variant('a'), parse_variant('b:strategy=2'), batch=20, max_pairs=40)
+        self.assertEqual(unknown.decision, INCONCLUSIVE)
+        self.assertEqual(unknown.pairs, 40)
+
+    def test_running_stats(self):
+        stats = RunningStats()
+        for value in (2, 4, 4, 4, 5, 5, 7, 9):
+            stats.add(value)
+        self.assertEqual(stats.mean, 5)
+        self.assertAlmostEqual(stats.variance(), 32 / 7)
+
+    def test_parse(self):
+        variant = parse_variant('bots:policy=greedy+random,goal=40/4')
+        self.assertEqual(variant.policy_names, ('greedy', 'random'))
+        self.assertEqual((variant.game_finished.desired_points, variant.game_finished.desired_queens), (40, 4))
+        with self.assertRaises(ValueError):
+            parse_variant('x:strategy=3')
@@ -1,11 +1,12 @@
+from collections import Counter
 from typing import List, Optional
 from unittest import TestCase
 from unittest.mock import Mock, MagicMock
 
-from hand import Hand
-from cards import Card, CardType, Queen
-from positions import HandPosition, Position
-from piles import DrawingAndTrashPile, Strategy1
+from hand import CardList, Hand
+from cards import Card, CardType, Queen, encode_cards, decode_cards, queens
+from positions import HandPosition, Position, QueenCollectionInterface
+from piles import DrawingAndTrashPile, Strategy1, Strategy2
 
 
 class TestHand(TestCase):
@@ -102,3 +103,83 @@ class TestHand(TestCase):
         from_hand: Optional[HandPosition] = self.hand.has_card_of_type(card.type)
         self.assertEqual(from_hand.get_card().get_type(), card.get_type())
         self.assertEqual(self.hand.get_cards(), cards5)
+
+    def test_interned_cards(self):
+        self.assertIs(Card(CardType.NUMBER, 7), Card(CardType.NUMBER, 7))
+        self.assertEqual(Card(CardType.KING), Card(CardType.KING, 0))
+        self.assertNotEqual(Card(CardType.KING), Card(CardType.KNIGHT))
+        self.assertIs(Queen('Cat Queen', 15), Queen('Cat Queen', 15))
+        self.assertEqual(len({id(card) for card in self.pile.draw_pile}), 15)
+        empty = QueenCollectionInterface()[0]
+        self.assertIs(empty, QueenCollectionInterface()[1])
+        self.assertEqual(empty.code, len(queens))
+
+    def test_encoding(self):
+        codes: bytearray = encode_cards(self.cards)
+        self.assertEqual(len(codes), 5)
+        self.assertEqual(decode_cards(codes), self.cards)
+        self.assertEqual(Card.from_code(Card(CardType.WAND).code), Card(CardType.WAND))
+        draw_codes, trash_codes = self.pile.encode()
+        self.assertEqual(decode_cards(draw_codes), self.pile.draw_pile)
+        self.assertEqual(trash_codes, bytearray())
+
+    def test_hand_indexes(self):
+        self.pile.draw_pile[:] = self.cards_to_draw
+        self.hand.set_cards(self.cards)
+        cards = self.hand.get_cards()
+        cards[0] = Card(CardType.DRAGON)
+        self.assertIsNone(self.hand.has_card_of_type(CardType.KING))
+        self.assertEqual(self.hand.has_card_of_type(CardType.DRAGON).get_card(), Card(CardType.DRAGON))
+        self.assertNotIn(Card(CardType.KING), self.hand)
+        # one card cannot be picked twice
+        self.assertIsNone(self.hand.pick_cards([HandPosition(self.cards[4], 0), HandPosition(self.cards[4], 0)]))
+        self.assertEqual(len(self.hand.pick_cards([HandPosition(self.cards[1], 0)] * 2)), 2)
+        self.hand.remove_picked_cards_and_redraw()
+        self.assertEqual(cards[:3], [Card(CardType.DRAGON), self.cards[3], self.cards[4]])
+        self.assertEqual(cards.counts[Card(CardType.NUMBER, 8)], 0)
+        self.assertEqual(sum(cards.type_counts.values()), 5)
+
+    def test_remove_missing_card(self):
+        cards = CardList(self.cards)
+        dragon = Card(CardType.DRAGON)
+        self.assertRaises(ValueError, cards.remove_all, [self.cards[0], dragon])
+        self.assertRaises(ValueError, cards.remove_all, [self.cards[0]] * 2)
+        self.assertEqual(cards, self.cards)
+        self.assertEqual(cards.counts, CardList(self.cards).counts)
+        self.assertEqual(cards.type_counts[dragon.type], 0)
+        cards.remove_all([self.cards[0]])
+        self.assertEqual(cards, self.cards[1:])
+
+    def test_counts_follow_list_operations(self):
+        cards, dragon = CardList(self.cards), Card(CardType.DRAGON)
+        cards[1:3] = iter([dragon])          # iterators are counted too
+        cards *= 2
+        cards[::2] = (card for card in self.cards[:4])
+        expected = [self.cards[0], dragon, self.cards[1], self.cards[4], self.cards[2], dragon, self.cards[3],
+                    self.cards[4]]
+        self.assertEqual(cards, expected)
+        self.assertEqual(+cards.counts, +CardList(expected).counts)
+        self.assertEqual(+cards.type_counts, +CardList(expected).type_counts)
+        cards *= 0
+        self.assertEqual(+cards.counts, Counter())
+        self.assertFalse(self.cards[0] in cards)
+
+    def test_strategy2(self):
+        pile = DrawingAndTrashPile(Strategy2())
+        pile.discard(pile.deal_cards(50))
+        remaining: List[Card] = pile.draw_pile[:]
+        trash = pile.trash_pile
+        drawn: List[Card] = pile.discard_and_redraw(self.cards[:4] + self.cards_to_draw[:4] + self.cards[:4])
+        # the remaining cards stay on top of the shuffled trash pile, buffers are swapped
+        self.assertEqual(drawn, remaining)
+        self.assertIs(pile.draw_pile, trash)
+        self.assertEqual(len(pile.draw_pile), 50)
+        self.assertEqual(len(pile.trash_pile), 12)
+
+    def test_buffer_reuse(self):
+        draw_pile, trash_pile = self.pile.draw_pile, self.pile.trash_pile
+        self.pile.deal_cards(60)
+        self.pile.discard_and_redraw(self.cards)
+        self.assertIs(self.pile.draw_pile, trash_pile)
+        self.assertIs(self.pile.trash_pile, draw_pile)
+        self.assertEqual(len(self.pile.draw_pile) + len(self.pile.trash_pile), 2)
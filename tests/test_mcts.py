@@ -0,0 +1,45 @@
+import random
+from collections import Counter
+from unittest import TestCase
+
+from adaptor import GameAdaptor
+from mcts import MCTSPlayer, determinize, move_key
+from piles import deck
+
+
+class TestMCTS(TestCase):
+    def setUp(self) -> None:
+        random.seed(3)
+        self.adaptor = GameAdaptor(2)
+
+    def test_determinization_keeps_known_cards(self):
+        snapshot = self.adaptor.game.fork()
+        sample = determinize(snapshot, 0, random.Random(1))
+        self.assertEqual(sample.hands[0], snapshot.hands[0])
+        self.assertEqual(sample.get_trash_pile(), snapshot.get_trash_pile())
+        self.assertEqual([len(hand) for hand in sample.hands], [len(hand) for hand in snapshot.hands])
+        cards = Counter(sample.get_draw_pile())
+        for hand in sample.hands:
+            cards.update(hand)
+        self.assertEqual(cards, Counter(deck))
+
+    def test_bot_plays_legal_move(self):
+        bot = MCTSPlayer(self.adaptor, [0], rollouts=30, seed=1)
+        game = self.adaptor.game
+        legal = {move_key(tuple(game.players[0].hand.get_cards()), move) for move in game.legal_moves(0)}
+        hand = tuple(game.players[0].hand.get_cards())
+        move = bot.choose(0)
+        self.assertIn(move_key(hand, move), legal)
+        self.assertEqual(bot.stats.searches, 1)
+        self.assertEqual(bot.stats.rollouts, 30)
+        self.assertGreater(bot.stats.rollouts_per_second(), 0)
+
+    def test_tree_reuse(self):
+        bot = MCTSPlayer(self.adaptor, [0], rollouts=200, seed=1)
+        self.assertIsNotNone(bot.play('1', ''))
+        reply = self.adaptor.game.legal_moves(1)[0]
+        self.assertIsNotNone(bot.play('2', reply.command()))
+        self.assertIsNotNone(bot.play('1', ''))
+        self.assertEqual(bot.stats.searches, 2)
+        self.assertEqual(bot.stats.reused_searches, 1)
+        self.assertGreater(bot.stats.reused_visits, 0)
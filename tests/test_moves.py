@@ -0,0 +1,40 @@
+import random
+from unittest import TestCase
+
+from adaptor import GameAdaptor
+from cards import Card, CardType
+from moves import Move, numbered_subsets
+
+
+class TestLegalMoves(TestCase):
+    def setUp(self) -> None:
+        self.adaptor = GameAdaptor(2)
+        self.game = self.adaptor.game
+        self.player = self.game.players[0]
+
+    def test_numbered_subsets(self):
+        self.assertEqual(numbered_subsets((2, 3, 0, 5)), ((0,), (1,), (3,), (0, 1, 3)))
+        # the second 4 is never played alone and the pair is listed once
+        self.assertEqual(numbered_subsets((4, 4, 8)), ((0,), (2,), (0, 1), (0, 1, 2)))
+
+    def test_moves(self):
+        self.player.hand.set_cards([Card(CardType.KING), Card(CardType.NUMBER, 3), Card(CardType.KNIGHT),
+                                    Card(CardType.NUMBER, 3), Card(CardType.KING)])
+        moves = self.game.legal_moves(0)
+        self.assertEqual(moves, [Move((0,), sleeping=s) for s in range(12)] + [Move((1,)), Move((1, 3))])
+        self.assertIs(self.game.legal_moves(0), moves)
+
+        self.assertTrue(self.adaptor.play('1', 'h1 s2'))
+        self.assertNotIn(Move((0,), sleeping=1), self.game.legal_moves(0))
+        self.game.players[1].hand.set_cards([Card(CardType.NUMBER, 1), Card(CardType.POTION), Card(CardType.WAND),
+                                             Card(CardType.DRAGON), Card(CardType.DRAGON)])
+        self.assertEqual(self.game.legal_moves(1), [Move((1,), awoken=(0, 0)), Move((0,))])
+
+    def test_every_move_is_valid(self):
+        for seed in range(20):
+            random.seed(seed)
+            moves = GameAdaptor(3).game.legal_moves(0)
+            for move in moves:
+                random.seed(seed)
+                game = GameAdaptor(3).game
+                self.assertIsNotNone(game.play(0, move.positions(game, 0)), move)
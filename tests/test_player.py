@@ -186,3 +186,24 @@ class TestPlayerSociable(TestCase):
         self.assertIsNone(self.player.play(self.numbers_w3))
         self.assertIsNone(self.player.play(self.numbers_w4))
         self.assertEqual(len(self.player.hand.get_cards()), 5)
+
+    def test_queen_collection_slots(self):
+        collection = self.player.awoken_queens
+        queens: List[Queen] = [Queen('Rose Queen', 5), Queen('Moon Queen', 10), Queen('Cat Queen', 15)]
+        for queen in queens:
+            collection.add_queen(queen)
+        collection.remove_queen(queens[1])
+        collection.remove_queen(queens[0])
+        self.assertIsNone(collection.remove_queen(queens[0]))
+        self.assertEqual((collection.count_queens(), collection.count_points()), (1, 15))
+        collection.add_queen(queens[1])         # the lowest free slot is used first
+        self.assertEqual(collection.get_queens(), [queens[1], None, queens[2]])
+        self.assertNotIn(queens[0], collection)
+        collection.decode(collection.encode())
+        self.assertEqual(collection.get_queens(), [queens[1], None, queens[2]])
+        collection.add_queen(queens[0])
+        self.assertEqual(collection.get_queens(), queens[1::-1] + queens[2:])
+        for queen in queens:
+            collection.remove_queen(queen)
+        self.assertTrue(collection.is_empty())
+        self.assertEqual(collection.count_points(), 0)
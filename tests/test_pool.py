@@ -0,0 +1,74 @@
+import gc
+import random
+import weakref
+from unittest import TestCase
+
+import codec
+from adaptor import GameAdaptor, GameObserver
+from pool import GamePool
+
+
+def play_some(adaptor: GameAdaptor, moves: int) -> None:
+    game = adaptor.game
+    choices = random.Random(0)
+    for _ in range(moves):
+        player = game.game_state.on_turn
+        if game.winner is not None or not game.legal_moves(player):
+            return
+        game.play(player, choices.choice(game.legal_moves(player)).positions(game, player))
+
+
+class TestGamePool(TestCase):
+    def test_reset_is_new_game(self):
+        adaptor = GameAdaptor(4, 3)
+        buffers = {id(adaptor.game.pile.draw_pile), id(adaptor.game.pile.trash_pile)}
+        objects = [adaptor.game.sleeping_queens,
+                   adaptor.game.players[2].hand.get_cards(), adaptor.game.players[1].awoken_queens]
+        play_some(adaptor, 60)
+        adaptor.observable.add_player(0, GameObserver())
+        adaptor.game.listeners.append(lambda change: None)
+        adaptor.reset(11)
+        new = GameAdaptor(4, 11)
+        self.assertEqual(codec.encode(adaptor.game), codec.encode(new.game))
+        self.assertEqual(adaptor.game.hash(), new.game.hash())
+        self.assertEqual(len(adaptor.game.game_state.sleeping_queens), 12)
+        self.assertEqual(adaptor.observable.observers, [None] * 4)
+        self.assertEqual(adaptor.game.listeners, [])
+        self.assertEqual({id(adaptor.game.pile.draw_pile), id(adaptor.game.pile.trash_pile)}, buffers)
+        self.assertIs(adaptor.game.sleeping_queens, objects[0])
+        self.assertIs(adaptor.game.players[2].hand.get_cards(), objects[1])
+        self.assertIs(adaptor.game.players[1].awoken_queens, objects[2])
+        play_some(adaptor, 10)
+        play_some(new, 10)
+        self.assertEqual(codec.encode(adaptor.game), codec.encode(new.game))
+
+    def test_pool(self):
+        pool = GamePool(max_size=2)
+        games = [pool.acquire(3, seed) for seed in range(3)]
+        for game in games:
+            play_some(game, 5)
+            pool.release(game)
+        self.assertEqual(len(pool), 2)
+        reused = pool.acquire(3, 9)
+        self.assertIn(reused, games)
+        self.assertEqual(codec.encode(reused.game), codec.encode(GameAdaptor(3, 9).game))
+        self.assertIsNot(pool.acquire(2), reused)
+        self.assertEqual((pool.stats.created, pool.stats.reused, pool.stats.released, pool.stats.discarded),
+                         (4, 1, 3, 1))
+
+    def test_release_twice(self):
+        pool = GamePool()
+        adaptor = pool.acquire(2)
+        pool.release(adaptor)
+        self.assertRaises(ValueError, pool.release, adaptor)
+        self.assertRaises(ValueError, pool.release, GameAdaptor(2))
+        self.assertEqual(len(pool), 1)
+        self.assertIs(pool.acquire(2), adaptor)
+        self.assertIsNot(pool.acquire(2), adaptor)
+
+    def test_dropped_game_is_freed(self):
+        pool = GamePool()
+        dropped = weakref.ref(pool.acquire(2, 0))
+        gc.collect()            # the game refers to itself through bound methods
+        self.assertIsNone(dropped())
+        self.assertEqual(len(pool._checked_out), 0)
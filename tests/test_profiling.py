@@ -0,0 +1,57 @@
+import io
+import json
+import random
+from unittest import TestCase
+
+from adaptor import GameAdaptor
+from bench import play_random_game
+from game import Game
+from piles import Strategy1
+from player import Player
+from profiling import Profiler, CallStats
+
+
+class TestProfiler(TestCase):
+    def test_disabled_leaves_methods(self):
+        play, not_enough_cards = Game.__dict__['play'], Strategy1.__dict__['not_enough_cards']
+        with Profiler() as profiler:
+            self.assertIsNot(Game.__dict__['play'], play)
+            self.assertTrue(profiler.enabled)
+        self.assertIs(Game.__dict__['play'], play)
+        self.assertIs(Strategy1.__dict__['not_enough_cards'], not_enough_cards)
+        self.assertNotIn('evaluate', Player.__dict__)
+        self.assertFalse(profiler.enabled)
+
+    def test_counts(self):
+        adaptor = GameAdaptor(3, 4)
+        with Profiler(trace=True, allocations=True) as profiler:
+            moves = play_random_game(adaptor, random.Random(4))
+        play_random_game(GameAdaptor(3, 5), random.Random(5))      # not counted
+        stats = profiler.stats
+        self.assertEqual(stats['Game.play'].calls, moves)
+        self.assertEqual(stats['Player.play'].calls, moves)
+        self.assertGreaterEqual(stats['Hand.remove_picked_cards_and_redraw'].calls, moves)
+        self.assertGreater(stats['MoveQueen._move'].calls, 0)
+        self.assertGreater(stats['Player.evaluate'].calls, 0)          # players were made before enable
+        self.assertEqual(sum(stats['Game.play'].histogram), moves)
+        self.assertGreaterEqual(stats['Game.play'].total_ns, stats['Player.play'].total_ns)
+        self.assertIn('Game.play', profiler.report())
+
+        file = io.StringIO()
+        profiler.write_trace(file)
+        events = json.loads(file.getvalue())['traceEvents']
+        self.assertEqual(len(events), sum(s.calls for s in stats.values()))
+        self.assertEqual({event['ph'] for event in events}, {'X'})
+
+    def test_one_profiler(self):
+        with Profiler():
+            with self.assertRaises(RuntimeError):
+                Profiler().enable()
+
+    def test_percentile(self):
+        stats = CallStats('x')
+        for ns in (100, 100, 100, 5000):
+            stats.add(ns)
+        self.assertEqual(stats.percentile_ns(0.5), 127)
+        self.assertEqual(stats.percentile_ns(1.0), 5000)
+        self.assertEqual(stats.mean_ns(), 1325)
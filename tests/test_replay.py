@@ -0,0 +1,68 @@
+import io
+import random
+from unittest import TestCase
+
+import codec
+from adaptor import GameAdaptor, GameFinishedAt, GameFinishedStrategy
+from moves import Move
+from piles import Strategy2
+from replay import GameRecorder, ReplayEngine, pack_move, unpack_move
+
+
+def record(seed: int, number_of_players: int, **rules):
+    """
+    Plays a random game through a recorder, returns the log and encoded states after every move.
+    """
+    adaptor = GameAdaptor(number_of_players, seed, **rules)
+    stream = io.BytesIO()
+    recorder = GameRecorder(adaptor, stream)
+    game = adaptor.game
+    choices = random.Random(seed)
+    states = [codec.encode(game)]
+    while game.winner is None:
+        player = game.game_state.on_turn
+        moves = game.legal_moves(player)
+        if not moves:
+            break
+        recorder.play(str(player + 1), 'x')         # invalid commands are not logged
+        if recorder.play(str(player + 1), choices.choice(moves).command()) is not None:
+            states.append(codec.encode(game))
+    return stream, states
+
+
+class TestReplay(TestCase):
+    def test_records(self):
+        for move in (Move((0, 4, 2)), Move((3,), sleeping=11), Move((1,), awoken=(4, 10))):
+            self.assertEqual(unpack_move(pack_move(3, move)), (3, move))
+
+    def test_seeded_games_are_reproducible(self):
+        first, second = GameAdaptor(3, 7).game, GameAdaptor(3, 7).game
+        self.assertEqual(codec.encode(first), codec.encode(second))
+        self.assertNotEqual(codec.encode(first), codec.encode(GameAdaptor(3, 8).game))
+
+    def test_replay(self):
+        for seed in range(4):
+            stream, states = record(seed, 2 + seed)
+            engine = ReplayEngine(stream, checkpoint_interval=8)
+            self.assertEqual(engine.run(), len(states) - 1)
+            self.assertEqual(codec.encode(engine.game), states[-1])
+            for n in (len(states) // 2, 3, len(states) - 1, 0, 17):
+                if n < len(states):
+                    self.assertEqual(codec.encode(engine.seek(n)), states[n])
+            self.assertEqual(len(engine.checkpoints), 1 + (len(states) - 1) // 8)
+
+    def test_rules_are_replayed(self):
+        stream, states = record(5, 3, strategy=Strategy2(), game_finished=GameFinishedAt(15, 2))
+        engine = ReplayEngine(stream)
+        self.assertIs(type(engine.game.pile.strategy), Strategy2)
+        self.assertEqual(engine.game.game_finished.goals(3), (15, 2))
+        engine.run()
+        self.assertEqual(codec.encode(engine.game), states[-1])
+
+    def test_unseeded_game(self):
+        with self.assertRaises(ValueError):
+            GameRecorder(GameAdaptor(2), io.BytesIO())
+
+    def test_unknown_rules(self):
+        with self.assertRaises(ValueError):
+            GameRecorder(GameAdaptor(2, 0, game_finished=GameFinishedStrategy()), io.BytesIO())
@@ -0,0 +1,54 @@
+import asyncio
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+from loadgen import Client, run_load
+from server import GameServer
+
+
+class TestGameServer(TestCase):
+    def test_commands(self):
+        server = GameServer(max_tables=1)
+        self.assertEqual(server.handle('new 3 5'), 'ok 1')
+        self.assertEqual(server.handle('new 2'), 'error too many tables')
+        commands = server.handle('moves 1 1')[3:].split(',')
+        self.assertTrue(commands[0].startswith('h'))
+        self.assertEqual(server.handle('play 1 2 ' + commands[0]), 'error invalid move')        # not on turn
+        self.assertEqual(server.handle('play 1 1 ' + commands[0]), 'ok True')
+        self.assertEqual(server.handle('play 1 2 h9'), 'error invalid move')
+        self.assertEqual(server.handle('play 7 1 h1'), 'error no such table')
+        self.assertEqual(server.handle('moves 1 4'), 'error no such player')
+        self.assertTrue(server.handle('stats').startswith('ok tables 1 moves 1'))
+        self.assertEqual(server.handle('close 1'), 'ok')
+        self.assertEqual(server.tables, {})
+        self.assertTrue(server.handle('hello').startswith('error unknown command'))
+
+
+class TestServerConnection(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.game_server = GameServer()
+        server = await self.game_server.start('127.0.0.1', 0)
+        self.port = server.sockets[0].getsockname()[1]
+
+    async def asyncTearDown(self) -> None:
+        await self.game_server.close()
+
+    async def test_notifications(self):
+        reader, writer = await asyncio.open_connection('127.0.0.1', self.port)
+        client = Client(reader, writer)
+        self.assertEqual(await client.request('new 2 1'), 'ok 1')
+        self.assertEqual(await client.request('join 1 1'), 'ok')
+        self.assertEqual(await client.request('join 1 1'), 'error player already joined')
+        self.game_server.tables[1].adaptor.observable.notify_all('hello')
+        writer.write(b'stats\n')
+        self.assertEqual(await reader.readline(), b'event 1 hello\n')
+        writer.close()
+        await writer.wait_closed()
+        await asyncio.sleep(0.01)
+        self.assertEqual(self.game_server.tables[1].observers, set())
+        self.assertIsNone(self.game_server.tables[1].adaptor.observable.observers[0])
+
+    async def test_load(self):
+        report = await run_load('127.0.0.1', self.port, connections=3, tables=4, moves=60)
+        self.assertEqual(report.errors, 0)
+        self.assertGreater(report.moves, 100)
+        self.assertEqual(self.game_server.moves, report.moves)
@@ -0,0 +1,35 @@
+import random
+from unittest import TestCase
+
+from simulator import play_game, play_moves, simulate, RandomPolicy, GreedyPolicy, candidate_commands
+from adaptor import GameAdaptor, GameFinishedAt
+
+
+class TestSimulator(TestCase):
+    def test_candidates_are_valid(self):
+        for seed in range(10):
+            random.seed(seed)
+            commands = candidate_commands(GameAdaptor(3).game, 0)
+            for command in commands:
+                random.seed(seed)
+                self.assertIsNotNone(GameAdaptor(3).play('1', command))
+
+    def test_play_game_is_reproducible(self):
+        first = play_game(3, [RandomPolicy(), GreedyPolicy()], seed=7)
+        second = play_game(3, [RandomPolicy(), GreedyPolicy()], seed=7)
+        self.assertEqual(first, second)
+        self.assertGreater(first.moves, 0)
+
+    def test_rules_and_limits(self):
+        result = play_game(2, [GreedyPolicy()], seed=3, game_seed=3, game_finished=GameFinishedAt(5, 1))
+        self.assertIsNotNone(result.winner)
+        self.assertLess(result.moves, 15)
+        adaptor = GameAdaptor(4, 2)
+        self.assertEqual(play_moves(adaptor, [RandomPolicy(random.Random(2))], max_moves=3), 3)
+        self.assertIsNone(adaptor.game.winner)
+
+    def test_simulate(self):
+        report = simulate(20, 2, ['greedy', 'random'], processes=1)
+        self.assertEqual(report.games, 20)
+        self.assertEqual(sum(report.wins) + report.unfinished, 20)
+        self.assertAlmostEqual(sum(report.win_rates()), (20 - report.unfinished) / 20)
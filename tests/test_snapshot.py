@@ -0,0 +1,47 @@
+import random
+from unittest import TestCase
+
+from adaptor import GameAdaptor, GameFinishedAt
+from snapshot import GameSnapshot
+
+
+def state(snapshot: GameSnapshot):
+    return (snapshot.on_turn, snapshot.get_draw_pile(), snapshot.get_trash_pile(), snapshot.hands,
+            snapshot.sleeping_queens, snapshot.awoken_queens, snapshot.winner)
+
+
+class TestSnapshot(TestCase):
+    def test_snapshot_follows_game(self):
+        choices = random.Random(1)
+        for seed in range(15):
+            random.seed(seed)
+            game_finished = GameFinishedAt(15, 2) if seed % 3 == 0 else None      # snapshots follow the game's goals
+            game = GameAdaptor(2 + seed % 4, game_finished=game_finished).game
+            snapshot = game.fork()
+            while snapshot.winner is None and game.legal_moves(game.game_state.on_turn):
+                move = choices.choice(game.legal_moves(game.game_state.on_turn))
+                rng_state = random.getstate()       # a reshuffle has to see the same random numbers
+                parent = state(snapshot)
+                child = snapshot.play(move)
+                random.setstate(rng_state)
+                self.assertIsNotNone(game.play(game.game_state.on_turn, move.positions(game, game.game_state.on_turn)))
+                self.assertEqual(state(snapshot), parent)       # parent is untouched
+                snapshot = game.fork()
+                self.assertEqual(state(child), state(snapshot))
+            winner = game.players.index(game.winner) if game.winner else None
+            self.assertEqual(snapshot.winner, winner)
+
+    def test_structural_sharing(self):
+        game = GameAdaptor(3).game
+        first = game.fork()
+        self.assertIs(game.fork().hands[1], first.hands[1])
+        move = game.legal_moves(0)[0]
+        second = first.play(move)
+        self.assertIs(second.hands[1], first.hands[1])
+        self.assertIs(second.awoken_queens[2], first.awoken_queens[2])
+        self.assertIs(second.draw_pile, first.draw_pile)
+        game.play(0, move.positions(game, 0))
+        forked = game.fork()
+        self.assertIs(forked.hands[2], first.hands[2])
+        self.assertIs(forked.draw_pile, first.draw_pile)        # cards were only taken from the top
+        self.assertIsNone(second.play(move._replace(hand=(7,))))
@@ -0,0 +1,44 @@
+import random
+from unittest import TestCase
+
+from adaptor import GameAdaptor
+from cards import Queen
+from zobrist import TranspositionTable, hash_game, hash_snapshot, state_hash
+
+
+class TestZobrist(TestCase):
+    def test_incremental_hash_follows_game(self):
+        choices = random.Random(2)
+        for seed in range(10):
+            random.seed(seed)
+            game = GameAdaptor(2 + seed % 4).game
+            self.assertEqual(game.hash(), hash_game(game))
+            while game.winner is None and game.legal_moves(game.game_state.on_turn):
+                player = game.game_state.on_turn
+                move = choices.choice(game.legal_moves(player))
+                self.assertIsNotNone(game.play(player, move.positions(game, player)))
+                self.assertEqual(game.hash(), hash_game(game))
+                self.assertEqual(game.hash(), hash_snapshot(game.fork()))
+
+    def test_equivalent_states(self):
+        rose, cake, moon = Queen("Rose Queen", 5), Queen("Cake Queen", 5), Queen("Moon Queen", 10)
+        self.assertEqual(state_hash(0, [], [rose, None], [[cake]]), state_hash(0, [], [cake, None], [[rose]]))
+        self.assertNotEqual(state_hash(0, [], [rose, None], [[moon]]), state_hash(0, [], [moon, None], [[rose]]))
+        self.assertNotEqual(state_hash(0, [], [None, rose], [[cake]]), state_hash(0, [], [rose, None], [[cake]]))
+        self.assertNotEqual(state_hash(0, [], [], []), state_hash(1, [], [], []))
+
+    def test_transposition_table(self):
+        table: TranspositionTable[str] = TranspositionTable(bits=2)
+        table.put(1, 'deep', depth=5)
+        table.put(5, 'shallow', depth=1)        # same bucket, goes to the always replaced entry
+        self.assertEqual(table.get(1), 'deep')
+        self.assertEqual(table.get(5), 'shallow')
+        self.assertIsNone(table.get(5, depth=2))
+        table.put(9, 'newer', depth=0)
+        self.assertEqual(table.get(1), 'deep')
+        self.assertIsNone(table.get(5))
+        self.assertEqual(table.replacements, 1)
+        table.put(13, 'deeper', depth=7)
+        self.assertEqual(table.get(13), 'deeper')
+        self.assertEqual(table.get(1), 'deep')
+        self.assertEqual(len(table), 2)
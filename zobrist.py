@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+from collections import Counter
+from typing import Dict, Generic, Iterable, List, Optional, Sequence, Tuple, TypeVar, TYPE_CHECKING
+
+from cards import Card, Queen
+from changes import OUTSIDE, Change, QueenMoved, HandRedrawn, TurnAdvanced
+
+if TYPE_CHECKING:
+    from game import Game
+    from snapshot import GameSnapshot
+
+MASK = (1 << 64) - 1
+
+# kinds of features, a feature is a kind with up to three small numbers
+DRAW, TRASH, HAND, SLEEPING, AWOKEN, TURN = range(1, 7)
+
+_keys: Dict[int, int] = {}
+
+
+def feature_key(kind: int, a: int = 0, b: int = 0, c: int = 0) -> int:
+    """
+    Random 64-bit key of a feature. Keys are made by splitmix64 from the feature itself,
+    so they are the same in every process and do not depend on the order they are asked for.
+    """
+    x = (((kind << 8 | a & 0xFF) << 8 | b & 0xFF) << 8) | c & 0xFF
+    key = _keys.get(x)
+    if key is None:
+        z = (x + 0x9E3779B97F4A7C15) & MASK
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK
+        key = _keys[x] = z ^ (z >> 31)
+    return key
+
+
+def canonical_queen(queen: Queen) -> int:
+    """
+    Queens differ only by points in these rules, queens with equal points (e.g. the four 5-point queens)
+    are interchangeable and hash the same.
+    """
+    return queen.get_points()
+
+
+# Identical cards are one interned object with one code, so the four copies of a numbered card hash the same.
+# Hands and awoken queens are multisets: the n-th copy of a card (or queen of some points) has its own key.
+
+_pile_keys: List[List[List[int]]] = []         # kind, position and card code, made by the first pile_hash
+
+
+def pile_hash(draw: Iterable[Card], trash: Iterable[Card]) -> int:
+    if not _pile_keys:
+        _pile_keys.extend([[feature_key(kind, position, code) for code in range(256)] for position in range(64)]
+                          for kind in (DRAW, TRASH))
+    draw_keys, trash_keys = _pile_keys
+    key = 0
+    for position, card in enumerate(draw):
+        key ^= draw_keys[position][card.code & 0xFF]
+    for position, card in enumerate(trash):
+        key ^= trash_keys[position][card.code & 0xFF]
+    return key
+
+
+def _awoken_counts(queens: Iterable[Optional[Queen]]) -> Counter:
+    return Counter(canonical_queen(queen) for queen in queens if queen is not None)
+
+
+def _counted_hash(on_turn: int, hands: Sequence[Counter], sleeping_queens: Sequence[Optional[Queen]],
+                  awoken_queens: Sequence[Counter]) -> int:
+    key = feature_key(TURN, on_turn)
+    for player, counts in enumerate(hands):
+        for card, count in counts.items():
+            for n in range(1, count + 1):
+                key ^= feature_key(HAND, player, card.code, n)
+    for slot, queen in enumerate(sleeping_queens):
+        if queen is not None:
+            key ^= feature_key(SLEEPING, slot, canonical_queen(queen))
+    for player, counts in enumerate(awoken_queens):
+        for points, count in counts.items():
+            for n in range(1, count + 1):
+                key ^= feature_key(AWOKEN, player, points, n)
+    return key
+
+
+def state_hash(on_turn: int, hands: Sequence[Iterable[Card]], sleeping_queens: Sequence[Optional[Queen]],
+               awoken_queens: Sequence[Sequence[Optional[Queen]]]) -> int:
+    return _counted_hash(on_turn, [Counter(hand) for hand in hands], sleeping_queens,
+                         [_awoken_counts(queens) for queens in awoken_queens])
+
+
+def hash_snapshot(snapshot: GameSnapshot) -> int:
+    """
+    Same hash as ZobristHash.key of the game the snapshot was made of, computed from scratch.
+    """
+    return pile_hash(snapshot.get_draw_pile(), snapshot.get_trash_pile()) ^ state_hash(
+        snapshot.on_turn, snapshot.hands, snapshot.sleeping_queens, snapshot.awoken_queens)
+
+
+def hash_game(game: Game) -> int:
+    return pile_hash(game.pile.draw_pile, game.pile.trash_pile) ^ state_hash(
+        game.game_state.on_turn, [player.hand.get_cards() for player in game.players],
+        game.sleeping_queens.get_queens(), [player.awoken_queens.get_queens() for player in game.players])
+
+
+class ZobristHash:
+    """
+    64-bit hash of the whole game (hands, order of both piles, sleeping queen slots, awoken queens and turn),
+    updated by changes emitted by moves. A queen move, a turn and drawing or discarding k cards cost O(1) or O(k),
+    only a reshuffle rehashes the piles. After the game is modified without changes (e.g. Hand.set_cards),
+    call rehash.
+    """
+    def __init__(self, game: Game) -> None:
+        self.game = game
+        self.key: int = 0
+        self.rehash()
+
+    def rehash(self) -> None:
+        game = self.game
+        self._draw_buffer = game.pile.draw_pile
+        self._trash_buffer = game.pile.trash_pile
+        self._pile = pile_hash(game.pile.draw_pile, game.pile.trash_pile)
+        self._on_turn = game.game_state.on_turn
+        self._hands: List[Counter] = [Counter(player.hand.get_cards()) for player in game.players]
+        self._awoken: List[Counter] = [_awoken_counts(player.awoken_queens.get_queens()) for player in game.players]
+        self._sleeping: Dict[Queen, int] = {queen: slot for slot, queen in enumerate(game.sleeping_queens.get_queens())
+                                            if queen is not None}
+        self.key = self._pile ^ _counted_hash(self._on_turn, self._hands, game.sleeping_queens.get_queens(),
+                                              self._awoken)
+
+    def apply(self, change: Change) -> None:
+        if type(change) == QueenMoved:
+            self._move_queen(change)
+        elif type(change) == HandRedrawn:
+            self._redraw(change)
+        elif type(change) == TurnAdvanced:
+            self.key ^= feature_key(TURN, self._on_turn) ^ feature_key(TURN, change.on_turn)
+            self._on_turn = change.on_turn
+
+    def _move_queen(self, change: QueenMoved) -> None:
+        points = canonical_queen(change.queen)
+        if change.source is None:
+            slot = self._sleeping.pop(change.queen)
+            self.key ^= feature_key(SLEEPING, slot, points)
+        elif change.source != OUTSIDE:
+            counts = self._awoken[change.source]
+            self.key ^= feature_key(AWOKEN, change.source, points, counts[points])
+            counts[points] -= 1
+        if change.destination is None:
+            slot = self.game.sleeping_queens.index_of(change.queen)
+            self._sleeping[change.queen] = slot
+            self.key ^= feature_key(SLEEPING, slot, points)
+        elif change.destination != OUTSIDE:
+            counts = self._awoken[change.destination]
+            counts[points] += 1
+            self.key ^= feature_key(AWOKEN, change.destination, points, counts[points])
+
+    def _redraw(self, change: HandRedrawn) -> None:
+        counts = self._hands[change.playerID]
+        for card in change.discarded:
+            self.key ^= feature_key(HAND, change.playerID, card.code, counts[card])
+            counts[card] -= 1
+        for card in change.drawn:
+            counts[card] += 1
+            self.key ^= feature_key(HAND, change.playerID, card.code, counts[card])
+
+        pile = self.game.pile
+        if pile.draw_pile is not self._draw_buffer or pile.trash_pile is not self._trash_buffer:
+            self._draw_buffer, self._trash_buffer = pile.draw_pile, pile.trash_pile       # reshuffled
+            new = pile_hash(pile.draw_pile, pile.trash_pile)
+        else:       # discarded cards lie on top of the trash pile, drawn cards were on top of the draw pile
+            new = self._pile
+            start = len(pile.trash_pile) - len(change.discarded)
+            for i, card in enumerate(change.discarded):
+                new ^= feature_key(TRASH, start + i, card.code)
+            start = len(pile.draw_pile)
+            for i, card in enumerate(change.drawn):
+                new ^= feature_key(DRAW, start + i, card.code)
+        self.key ^= self._pile ^ new
+        self._pile = new
+
+
+V = TypeVar('V')
+
+
+class TranspositionTable(Generic[V]):
+    """
+    Bounded table of search results addressed by a state hash. Every bucket has two entries,
+    the first keeps the result searched to the greatest depth, the second is always replaced.
+    """
+    def __init__(self, bits: int = 16) -> None:
+        self._mask = (1 << bits) - 1
+        size = 2 << bits
+        self._keys: List[Optional[int]] = [None] * size
+        self._depths: List[int] = [-1] * size
+        self._values: List[Optional[V]] = [None] * size
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.replacements = 0       # stores that overwrote an entry of another state
+
+    def __len__(self) -> int:
+        return sum(key is not None for key in self._keys)
+
+    def capacity(self) -> int:
+        return len(self._keys)
+
+    def get(self, key: int, depth: int = 0) -> Optional[V]:
+        """
+        Returns the value stored for the state if it was searched at least to the given depth.
+        """
+        i = (key & self._mask) << 1
+        for j in (i, i + 1):
+            if self._keys[j] == key and self._depths[j] >= depth:
+                self.hits += 1
+                return self._values[j]
+        self.misses += 1
+        return None
+
+    def put(self, key: int, value: V, depth: int = 0) -> None:
+        i = (key & self._mask) << 1
+        self.stores += 1
+        keys, depths, values = self._keys, self._depths, self._values
+        if keys[i] == key or depth >= depths[i]:
+            if keys[i] != key and keys[i] is not None:      # the deeper entry moves to the second place
+                if keys[i + 1] is not None and keys[i + 1] != key:
+                    self.replacements += 1
+                keys[i + 1], depths[i + 1], values[i + 1] = keys[i], depths[i], values[i]
+            elif keys[i + 1] == key:
+                keys[i + 1], depths[i + 1], values[i + 1] = None, -1, None
+            keys[i], depths[i], values[i] = key, depth, value
+            return
+        if keys[i + 1] is not None and keys[i + 1] != key:
+            self.replacements += 1
+        keys[i + 1], depths[i + 1], values[i + 1] = key, depth, value
+
+    def clear(self) -> None:
+        size = len(self._keys)
+        self._keys = [None] * size
+        self._depths = [-1] * size
+        self._values = [None] * size
+
+    def stats(self) -> Tuple[int, int, int, int]:
+        return self.hits, self.misses, self.stores, self.replacements